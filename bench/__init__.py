@@ -0,0 +1,10 @@
+import os
+import sys
+
+bench_dir = os.path.dirname(os.path.realpath(__file__))
+project_dir = os.path.dirname(bench_dir)
+src_dir = os.path.join(project_dir, "src")
+
+# Benchmarks import the generator modules the same way the tests do.
+if src_dir not in sys.path:
+    sys.path.insert(0, src_dir)
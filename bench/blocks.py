@@ -0,0 +1,63 @@
+import argparse
+import re
+import timeit
+
+import bench  # noqa: F401  (puts src/ on sys.path)
+from markdown_blocks import (
+    block_type_paragraph,
+    block_type_heading,
+    block_type_code,
+    block_type_quote,
+    block_type_unordered_list,
+    block_type_ordered_list,
+    block_to_block_type,
+)
+
+
+# The regex-per-line classifier this benchmark compares against.
+def legacy_block_to_block_type(block) -> str:
+    if re.match(r"^(#{1,6})\s+(.+)", block) is not None:
+        return block_type_heading
+    if block.startswith("```") and block.endswith("```"):
+        return block_type_code
+    lines = block.split("\n")
+    if all(re.match(r"^>.*", line.strip()) for line in lines):
+        return block_type_quote
+    all_star = all(re.match(r"^\* .+", line.strip()) for line in lines)
+    all_dash = all(re.match(r"^- .+", line.strip()) for line in lines)
+    if all_star or all_dash:
+        return block_type_unordered_list
+    for i, line in enumerate(lines, start=1):
+        if not re.match(r"^" + str(i) + r"\. .+", line.strip()):
+            return block_type_paragraph
+    return block_type_ordered_list
+
+
+def sample_blocks(items) -> dict:
+    return {
+        "ordered": "\n".join(f"{i}. item number {i}" for i in range(1, items + 1)),
+        "unordered": "\n".join(f"- item number {i}" for i in range(1, items + 1)),
+        "quote": "\n".join(f"> quoted line {i}" for i in range(1, items + 1)),
+        "paragraph": "\n".join(f"plain line {i} of text" for i in range(1, items + 1)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Block classifier benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 100, 10_000])
+    args = parser.parse_args()
+
+    print(f"{'block':<10} {'items':>6} {'legacy us':>11} {'current us':>11} {'speedup':>8}")
+    for items in args.sizes:
+        for name, block in sample_blocks(items).items():
+            assert block_to_block_type(block) == legacy_block_to_block_type(block)
+            number = max(1, 20_000 // items)
+            legacy = min(timeit.repeat(lambda: legacy_block_to_block_type(block), number=number, repeat=3))
+            current = min(timeit.repeat(lambda: block_to_block_type(block), number=number, repeat=3))
+            legacy_us = legacy / number * 1e6
+            current_us = current / number * 1e6
+            print(f"{name:<10} {items:>6} {legacy_us:>11.1f} {current_us:>11.1f} {legacy_us / current_us:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import time
+
+import bench  # noqa: F401  (puts src/ on sys.path)
+from copystatic import copy_files_recursive, sync_files
+
+
+def make_tree(root, files, per_dir=500, size=512) -> None:
+    payload = os.urandom(size)
+    for i in range(files):
+        dir_path = os.path.join(root, f"dir{i // per_dir:04}")
+        if i % per_dir == 0:
+            os.makedirs(dir_path)
+        with open(os.path.join(dir_path, f"file{i:06}.bin"), 'wb') as f:
+            f.write(payload)
+
+
+def timed(func) -> float:
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        func()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Static copy benchmark")
+    parser.add_argument("--files", type=int, default=50_000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    parser.add_argument("--dir", help="Where to build the trees (e.g. a network mount)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as root:
+        source = os.path.join(root, "static")
+        make_tree(source, args.files)
+
+        def fresh_dest() -> str:
+            dest = os.path.join(root, "public")
+            if os.path.exists(dest):
+                shutil.rmtree(dest)
+            return dest
+
+        dest = fresh_dest()
+        seconds = timed(lambda: copy_files_recursive(source, dest))
+        print(f"{'copy_files_recursive':<24} {seconds:>8.2f}s {args.files / seconds:>10.0f} files/s")
+
+        for workers in args.workers:
+            dest = fresh_dest()
+            seconds = timed(lambda: sync_files(source, dest, workers=workers, progress_interval=3600))
+            print(f"{f'sync_files workers={workers}':<24} {seconds:>8.2f}s {args.files / seconds:>10.0f} files/s")
+
+        seconds = timed(lambda: sync_files(source, dest, workers=args.workers[-1], progress_interval=3600))
+        print(f"{'sync_files (no changes)':<24} {seconds:>8.2f}s {args.files / seconds:>10.0f} files/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+import argparse
+import os
+import random
+
+import bench  # noqa: F401  (puts src/ on sys.path)
+
+
+words = (
+    "static site generator page markdown block inline node render template "
+    "cache build output content section index link image list code quote "
+    "fast slow small large first second third river stone cloud light paper"
+).split()
+
+languages = ("python", "bash", "html", "")
+
+
+class CorpusShape():
+
+    def __init__(
+        self,
+        pages=200,
+        depth=3,
+        sections=4,
+        paragraphs=6,
+        lists=2,
+        code=1,
+        quotes=1,
+        link_density=0.2,
+        images=1,
+        static_files=50,
+        static_size=4096,
+        front_matter=0.5,
+        section_indexes=1,
+    ) -> None:
+        self.pages = pages
+        self.depth = depth
+        self.sections = sections
+        self.paragraphs = paragraphs
+        self.lists = lists
+        self.code = code
+        self.quotes = quotes
+        self.link_density = link_density
+        self.images = images
+        self.static_files = static_files
+        self.static_size = static_size
+        self.front_matter = front_matter
+        self.section_indexes = section_indexes
+
+    def __repr__(self) -> str:
+        return f"CorpusShape({self.as_dict()})"
+
+    def as_dict(self) -> dict:
+        return dict(vars(self))
+
+
+def sentence(rng, shape, page_paths, image_paths) -> str:
+    parts = []
+    for _ in range(rng.randint(6, 16)):
+        word = rng.choice(words)
+        roll = rng.random()
+        if roll < 0.04:
+            word = f"**{word}**"
+        elif roll < 0.08:
+            word = f"*{word}*"
+        elif roll < 0.11:
+            word = f"`{word}`"
+        parts.append(word)
+    if page_paths and rng.random() < shape.link_density:
+        target = rng.choice(page_paths)
+        parts.insert(rng.randrange(len(parts) + 1), f"[{rng.choice(words)}]({target})")
+    if image_paths and rng.random() < shape.link_density / 2:
+        parts.append(f"![{rng.choice(words)}]({rng.choice(image_paths)})")
+    text = " ".join(parts)
+    return text[0].upper() + text[1:] + "."
+
+
+def paragraph(rng, shape, page_paths, image_paths) -> str:
+    lines = [sentence(rng, shape, page_paths, image_paths) for _ in range(rng.randint(2, 5))]
+    return "\n".join(lines)
+
+
+def list_block(rng, shape, page_paths, image_paths) -> str:
+    items = [sentence(rng, shape, page_paths, image_paths) for _ in range(rng.randint(2, 8))]
+    if rng.random() < 0.5:
+        return "\n".join(f"{i}. {item}" for i, item in enumerate(items, start=1))
+    marker = rng.choice("*-")
+    return "\n".join(f"{marker} {item}" for item in items)
+
+
+def code_block(rng) -> str:
+    lines = []
+    for _ in range(rng.randint(3, 12)):
+        # Blank lines inside fences must not split the block.
+        if lines and rng.random() < 0.15:
+            lines.append("")
+        indent = "    " * rng.randint(0, 2)
+        lines.append(indent + " ".join(rng.choice(words) for _ in range(rng.randint(2, 6))))
+    return f"```{rng.choice(languages)}\n" + "\n".join(lines) + "\n```"
+
+
+def quote_block(rng, shape, page_paths, image_paths) -> str:
+    lines = [sentence(rng, shape, page_paths, image_paths) for _ in range(rng.randint(1, 4))]
+    return "\n".join(f"> {line}" for line in lines)
+
+
+def front_matter(rng, title) -> str:
+    tags = ", ".join(sorted({rng.choice(words) for _ in range(rng.randint(1, 4))}))
+    return (
+        f"---\ntitle: {title}\n"
+        f"date: 2024-{rng.randint(1, 12):02}-{rng.randint(1, 28):02}\n"
+        f"tags: {tags}\n---\n"
+    )
+
+
+def page_markdown(rng, shape, title, page_paths, image_paths) -> str:
+    header = front_matter(rng, title) if rng.random() < shape.front_matter else ""
+    blocks = [f"{header}# {title}"]
+    kinds = (
+        ["paragraph"] * shape.paragraphs
+        + ["list"] * shape.lists
+        + ["code"] * shape.code
+        + ["quote"] * shape.quotes
+        + ["image"] * (shape.images if image_paths else 0)
+    )
+    rng.shuffle(kinds)
+    for kind in kinds:
+        if rng.random() < 0.3:
+            blocks.append(f"{'#' * rng.randint(2, 4)} {' '.join(rng.choice(words) for _ in range(3))}")
+        if kind == "paragraph":
+            blocks.append(paragraph(rng, shape, page_paths, image_paths))
+        elif kind == "list":
+            blocks.append(list_block(rng, shape, page_paths, image_paths))
+        elif kind == "code":
+            blocks.append(code_block(rng))
+        elif kind == "quote":
+            blocks.append(quote_block(rng, shape, page_paths, image_paths))
+        else:
+            blocks.append(f"![{rng.choice(words)}]({rng.choice(image_paths)})")
+    return "\n\n".join(blocks) + "\n"
+
+
+def page_paths_for(rng, shape) -> list:
+    paths = []
+    for i in range(shape.pages):
+        sections = [f"section{rng.randrange(shape.sections)}" for _ in range(rng.randint(0, shape.depth))]
+        paths.append("/".join(sections + [f"page{i:05}.md"]))
+    return paths
+
+
+def generate_corpus(root, shape=None, seed=0) -> dict:
+    # The same shape and seed always produce byte-identical trees.
+    shape = shape or CorpusShape()
+    rng = random.Random(seed)
+    content_dir = os.path.join(root, "content")
+    static_dir = os.path.join(root, "static")
+
+    image_paths = []
+    for i in range(shape.static_files):
+        rel_path = os.path.join("images" if i % 2 == 0 else "assets", f"file{i:05}.{'png' if i % 2 == 0 else 'css'}")
+        path = os.path.join(static_dir, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(rng.randbytes(shape.static_size))
+        if i % 2 == 0:
+            image_paths.append(f"/{rel_path}")
+
+    rel_paths = page_paths_for(rng, shape)
+    urls = ["/" + rel_path[:-len(".md")] + ".html" for rel_path in rel_paths]
+    total_bytes = 0
+    for i, rel_path in enumerate(rel_paths):
+        markdown = page_markdown(rng, shape, f"Page {i}", urls, image_paths)
+        path = os.path.join(content_dir, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(markdown)
+        total_bytes += len(markdown)
+
+    # Hand-written index pages, like the real content/; with 0 the build
+    # generates section listings instead.
+    for dir_path, _, filenames in os.walk(content_dir):
+        if shape.section_indexes and "index.md" not in filenames:
+            markdown = f"# {os.path.basename(dir_path)}\n\nSection index.\n"
+            with open(os.path.join(dir_path, "index.md"), 'w') as f:
+                f.write(markdown)
+            total_bytes += len(markdown)
+
+    return {
+        "content": content_dir,
+        "static": static_dir,
+        "markdown_bytes": total_bytes,
+    }
+
+
+def add_shape_arguments(parser) -> None:
+    defaults = CorpusShape()
+    for name, value in defaults.as_dict().items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=type(value), default=value)
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def shape_from_args(args) -> CorpusShape:
+    return CorpusShape(**{name: getattr(args, name) for name in CorpusShape().as_dict()})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic content/ and static/ tree")
+    parser.add_argument("root", help="Directory to write content/ and static/ into")
+    add_shape_arguments(parser)
+    args = parser.parse_args()
+
+    corpus = generate_corpus(args.root, shape_from_args(args), args.seed)
+    print(f"Wrote {corpus['markdown_bytes']} bytes of markdown to {corpus['content']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+import argparse
+import gc
+import random
+import statistics
+import tempfile
+import time
+from contextlib import contextmanager
+
+import bench  # noqa: F401  (puts src/ on sys.path)
+from assets import rewrite_url
+from bench.corpus import add_shape_arguments, generate_corpus, shape_from_args
+from gencontent import find_pages
+import markdown_blocks
+from htmlnode import HTMLNode, LeafNode
+from markdown_blocks import markdown_to_html_node, set_block_cache
+from textnode import (
+    text_type_bold,
+    text_type_code,
+    text_type_image,
+    text_type_italic,
+    text_type_link,
+    text_type_text,
+)
+
+
+def load_pages(content, special_rate, seed) -> list:
+    # special_rate of the words get a character that needs escaping.
+    rng = random.Random(seed)
+    markdowns = []
+    for from_path, _ in find_pages(content, "public"):
+        with open(from_path) as f:
+            markdown = f.read()
+        if special_rate:
+            markdown = " ".join(
+                word + rng.choice(" < & > ") if word.isalpha() and rng.random() < special_rate else word
+                for word in markdown.split(" ")
+            )
+        markdowns.append(markdown)
+    return markdowns
+
+
+# The parser and serializer as they were before escaping, for comparison.
+def raw_text_node_to_html_node(text_node) -> LeafNode:
+    if text_node.text_type == text_type_text:
+        return LeafNode(None, text_node.text)
+    if text_node.text_type == text_type_bold:
+        return LeafNode("b", text_node.text)
+    if text_node.text_type == text_type_italic:
+        return LeafNode("i", text_node.text)
+    if text_node.text_type == text_type_code:
+        return LeafNode("code", text_node.text)
+    if text_node.text_type == text_type_link:
+        return LeafNode("a", text_node.text, {"href": rewrite_url(text_node.url)})
+    if text_node.text_type == text_type_image:
+        return LeafNode("img", "", {"src": rewrite_url(text_node.url), "alt": text_node.text})
+    raise ValueError(f"Invalid text type: {text_node.text_type}")
+
+
+def raw_leaf_to_html(self) -> str:
+    if self.value is None:
+        raise ValueError("Invalid HTML: no value")
+    if self.tag is None:
+        return self.value
+    if self.tag == "img":
+        return f"<{self.tag}{self.props_to_html()} />"
+    return f"<{self.tag}{self.props_to_html()}>{self.value}</{self.tag}>"
+
+
+def raw_props_to_html(self) -> str:
+    attributes = ""
+    if self.props:
+        for attribute, value in self.props.items():
+            attributes += f' {attribute}="{value}"'
+    return attributes
+
+
+@contextmanager
+def unescaped():
+    saved = LeafNode.to_html, HTMLNode.props_to_html, markdown_blocks.text_node_to_html_node
+    LeafNode.to_html, HTMLNode.props_to_html = raw_leaf_to_html, raw_props_to_html
+    markdown_blocks.text_node_to_html_node = raw_text_node_to_html_node
+    try:
+        yield
+    finally:
+        LeafNode.to_html, HTMLNode.props_to_html, markdown_blocks.text_node_to_html_node = saved
+
+
+def serialize(nodes) -> float:
+    start = time.perf_counter()
+    for node in nodes:
+        node.to_html()
+    return time.perf_counter() - start
+
+
+def render(markdowns) -> float:
+    start = time.perf_counter()
+    for markdown in markdowns:
+        markdown_to_html_node(markdown, "div").to_html()
+    return time.perf_counter() - start
+
+
+def overhead(func, raw_pages, escaped_pages, rounds) -> tuple:
+    # Runs with and without escaping alternate, so drift in the machine's
+    # speed affects both alike. Returns the median ratio and best times.
+    escaped = []
+    raw = []
+
+    def run_raw():
+        with unescaped():
+            raw.append(func(raw_pages))
+
+    def run_escaped():
+        escaped.append(func(escaped_pages))
+
+    for i in range(rounds):
+        # Which runs first alternates too, and neither pays for the
+        # other's garbage.
+        for run in (run_raw, run_escaped)[::1 if i % 2 else -1]:
+            gc.collect()
+            run()
+    ratio = statistics.median(after / before for before, after in zip(raw, escaped))
+    return ratio - 1, min(raw), min(escaped)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serialization cost of HTML escaping")
+    add_shape_arguments(parser)
+    parser.add_argument("--rounds", type=int, default=30)
+    parser.add_argument("--rates", type=float, nargs="+", default=[0.0, 0.01, 0.1])
+    args = parser.parse_args()
+
+    # Text is escaped as it is parsed, so serializing alone shows what
+    # escaping costs every write; rendering includes parsing, as a build
+    # without a warm block cache does.
+    set_block_cache(None)
+    print(f"{'stage':<10} {'words escaped':<14} {'raw s':>8} {'escaped s':>10} {'overhead':>9}")
+    with tempfile.TemporaryDirectory() as root:
+        corpus = generate_corpus(root, shape_from_args(args), args.seed)
+        for rate in args.rates:
+            markdowns = load_pages(corpus["content"], rate, args.seed)
+            nodes = [markdown_to_html_node(markdown, "div") for markdown in markdowns]
+            with unescaped():
+                raw_nodes = [markdown_to_html_node(markdown, "div") for markdown in markdowns]
+            for stage, func, raw_pages, pages in (
+                ("serialize", serialize, raw_nodes, nodes),
+                ("render", render, markdowns, markdowns),
+            ):
+                change, raw, escaped = overhead(func, raw_pages, pages, args.rounds)
+                print(f"{stage:<10} {rate:<14.0%} {raw:>8.4f} {escaped:>10.4f} {change:>+9.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import argparse
+import random
+import tempfile
+import timeit
+
+import bench  # noqa: F401  (puts src/ on sys.path)
+from bench.corpus import add_shape_arguments, generate_corpus, shape_from_args
+from gencontent import find_pages
+from markdown_blocks import markdown_to_html_node, set_block_cache, set_block_diagnostics
+
+
+def load_pages(content) -> list:
+    markdowns = []
+    for from_path, _ in find_pages(content, "public"):
+        with open(from_path) as f:
+            markdowns.append(f.read())
+    return markdowns
+
+
+def break_pages(markdowns, rate, seed) -> list:
+    # Appends an unclosed "*" to roughly rate of the paragraphs.
+    rng = random.Random(seed)
+    broken = []
+    for markdown in markdowns:
+        blocks = markdown.split("\n\n")
+        for i, block in enumerate(blocks):
+            if block[:1].isalpha() and rng.random() < rate:
+                blocks[i] = block + " *unclosed"
+        broken.append("\n\n".join(blocks))
+    return broken
+
+
+def render_all(markdowns) -> None:
+    for markdown in markdowns:
+        markdown_to_html_node(markdown, "div").to_html()
+
+
+def time_render(markdowns, lenient, repeat) -> tuple:
+    # Returns the best time and the number of problems reported per run.
+    times = []
+    diagnostics = None
+    for _ in range(repeat):
+        diagnostics = [] if lenient else None
+        set_block_diagnostics(diagnostics)
+        try:
+            times.append(timeit.timeit(lambda: render_all(markdowns), number=1))
+        finally:
+            set_block_diagnostics(None)
+    return min(times), len(diagnostics or ())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Strict vs lenient inline parsing")
+    add_shape_arguments(parser)
+    parser.add_argument("--repeat", type=int, default=15)
+    parser.add_argument("--rates", type=float, nargs="+", default=[0.01, 0.1, 0.5])
+    args = parser.parse_args()
+
+    set_block_cache(None)
+    with tempfile.TemporaryDirectory() as root:
+        corpus = generate_corpus(root, shape_from_args(args), args.seed)
+        markdowns = load_pages(corpus["content"])
+
+    strict, _ = time_render(markdowns, False, args.repeat)
+    print(f"{'mode':<30} {'seconds':>9} {'vs strict':>10} {'problems':>9}")
+    print(f"{'strict, valid input':<30} {strict:>9.4f} {'':>10} {0:>9}")
+    runs = [("lenient, valid input", markdowns)]
+    for rate in args.rates:
+        runs.append((f"lenient, {rate:.0%} paragraphs broken", break_pages(markdowns, rate, args.seed)))
+    for label, pages in runs:
+        seconds, problems = time_render(pages, True, args.repeat)
+        print(f"{label:<30} {seconds:>9.4f} {seconds / strict - 1:>+10.1%} {problems:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+import argparse
+import sys
+import timeit
+
+import bench  # noqa: F401  (puts src/ on sys.path)
+from htmlnode import ParentNode
+from markdown_blocks import (
+    block_type_quote,
+    block_to_block_type,
+    block_to_html_node,
+    markdown_to_blocks,
+    markdown_to_html_node,
+)
+
+
+# Strip one level of markers and parse the rest as a new document: every
+# level re-splits and re-classifies everything below it.
+def recursive_quote_to_html_node(block) -> ParentNode:
+    lines = []
+    for line in block.split("\n"):
+        line = line.lstrip()[1:]
+        lines.append(line[1:] if line.startswith(" ") else line)
+    children = []
+    for inner in markdown_to_blocks("\n".join(lines)):
+        block_type = block_to_block_type(inner)
+        if block_type == block_type_quote:
+            children.append(recursive_quote_to_html_node(inner))
+        else:
+            children.append(block_to_html_node(inner, block_type))
+    return ParentNode("blockquote", children)
+
+
+def nested_quote(depth, lines) -> str:
+    # lines spread evenly over depth levels, deepest in the middle.
+    per_level = max(1, lines // (2 * depth))
+    out = []
+    for level in list(range(1, depth + 1)) + list(range(depth, 0, -1)):
+        out.extend(">" * level + f" quoted text at level {level}" for _ in range(per_level))
+    return "\n".join(out)
+
+
+def nested_list(depth, lines) -> str:
+    per_level = max(1, lines // (2 * depth))
+    out = []
+    for level in list(range(depth)) + list(range(depth - 1, -1, -1)):
+        marker = "-" if level % 2 == 0 else "1."
+        out.extend("  " * level + f"{marker} item at level {level}" for _ in range(per_level))
+    return "\n".join(out)
+
+
+def time_per_kb(func, document) -> float:
+    # Deep documents have long marker prefixes, so cost is per input byte.
+    number = max(1, 200_000 // len(document))
+    seconds = min(timeit.repeat(func, number=number, repeat=3)) / number
+    return seconds / len(document) * 1024 * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Nested quote and list benchmark")
+    parser.add_argument("--lines", type=int, default=4_000)
+    parser.add_argument("--depths", type=int, nargs="+", default=[1, 10, 100, 500, 2_000])
+    args = parser.parse_args()
+
+    print(f"{'document':<8} {'depth':>6} {'KB':>7} {'us/KB':>9} {'recursive us/KB':>18}")
+    for depth in args.depths:
+        quote = nested_quote(depth, args.lines)
+        current = time_per_kb(lambda: markdown_to_html_node(quote, "div").to_html(), quote)
+        try:
+            sys.setrecursionlimit(max(1_000, depth * 4))
+            recursive = time_per_kb(lambda: recursive_quote_to_html_node(quote).to_html(), quote)
+            recursive = f"{recursive:>18.1f}"
+        except RecursionError:
+            recursive = f"{'recursion limit':>18}"
+        finally:
+            sys.setrecursionlimit(1_000)
+        print(f"{'quote':<8} {depth:>6} {len(quote) / 1024:>7.0f} {current:>9.1f} {recursive}")
+
+        nested = nested_list(depth, args.lines)
+        current = time_per_kb(lambda: markdown_to_html_node(nested, "div").to_html(), nested)
+        print(f"{'list':<8} {depth:>6} {len(nested) / 1024:>7.0f} {current:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import tracemalloc
+
+import bench  # noqa: F401  (puts src/ on sys.path)
+from htmlnode import LeafNode, ParentNode
+from textnode import TextNode, text_type_text, text_type_bold, text_type_link
+
+
+class DictTextNode():
+
+    def __init__(self, text, text_type, url=None) -> None:
+        self.text = text
+        self.text_type = text_type
+        self.url = url
+
+
+class DictLeafNode():
+
+    def __init__(self, tag, value, props=None) -> None:
+        self.tag = tag
+        self.value = value
+        self.children = None
+        self.props = props
+
+
+class DictParentNode():
+
+    def __init__(self, tag, children, props=None) -> None:
+        self.tag = tag
+        self.value = None
+        self.children = children
+        self.props = props
+
+
+variants = {
+    "dict": (DictTextNode, DictLeafNode, DictParentNode),
+    "slots": (TextNode, LeafNode, ParentNode),
+}
+
+
+def build_document(words, text_cls, leaf_cls, parent_cls):
+    # Roughly the node mix of a prose page: short text runs with some
+    # bold and link spans, grouped into paragraphs of ~60 words.
+    text_nodes = []
+    paragraphs = []
+    children = []
+    for i in range(0, words, 4):
+        text = f"word{i} word{i + 1} word{i + 2} "
+        if i % 12 == 4:
+            text_nodes.append(text_cls(text, text_type_bold))
+            children.append(leaf_cls("b", text))
+        elif i % 12 == 8:
+            url = f"/page/{i}"
+            text_nodes.append(text_cls(text, text_type_link, url))
+            children.append(leaf_cls("a", text, {"href": url}))
+        else:
+            text_nodes.append(text_cls(text, text_type_text))
+            children.append(leaf_cls(None, text))
+        if len(children) == 15:
+            paragraphs.append(parent_cls("p", children))
+            children = []
+    if children:
+        paragraphs.append(parent_cls("p", children))
+    root = parent_cls("div", paragraphs)
+    return text_nodes, root, len(text_nodes) * 2 + len(paragraphs) + 1
+
+
+def measure(variant, words) -> dict:
+    classes = variants[variant]
+    tracemalloc.start()
+    # Includes the text each node holds, which is identical across variants,
+    # so the difference between variants is the per-object layout.
+    baseline, _ = tracemalloc.get_traced_memory()
+    document = build_document(words, *classes)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    node_count = document[2]
+    return {
+        "variant": variant,
+        "words": words,
+        "nodes": node_count,
+        "bytes_per_node": (current - baseline) / node_count,
+        "traced_peak_bytes": peak - baseline,
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+def run_isolated(variant, words) -> dict:
+    # Each variant runs in a fresh interpreter so peak RSS isn't shared.
+    output = subprocess.run(
+        [sys.executable, "-m", "bench.nodes", "--variant", variant, "--words", str(words)],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Node memory benchmark")
+    parser.add_argument("--words", type=int, default=100_000)
+    parser.add_argument("--variant", choices=sorted(variants))
+    args = parser.parse_args()
+
+    if args.variant:
+        print(json.dumps(measure(args.variant, args.words)))
+        return
+
+    results = [run_isolated(variant, args.words) for variant in ("dict", "slots")]
+    print(f"{'variant':<8} {'nodes':>8} {'bytes/node':>11} {'traced peak':>12} {'peak RSS':>10}")
+    for r in results:
+        print(
+            f"{r['variant']:<8} {r['nodes']:>8} {r['bytes_per_node']:>11.1f} "
+            f"{r['traced_peak_bytes'] // 1024:>10}KB {r['peak_rss_kb'] // 1024:>8}MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
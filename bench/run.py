@@ -0,0 +1,206 @@
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import bench
+from bench.corpus import add_shape_arguments, generate_corpus, shape_from_args
+from copystatic import copy_files_recursive
+from gencontent import find_pages, generate_pages_recursive
+from htmlnode import MinifyStats, set_minify_stats
+from inline_markdown import text_to_textnodes
+from markdown_blocks import (
+    block_type_paragraph,
+    block_to_block_type,
+    markdown_to_blocks,
+    markdown_to_html_node,
+    set_block_cache,
+)
+from profiling import set_build_profile
+from sections import SiteIndex
+
+
+def measure(func, repeat, setup=None) -> dict:
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            func()
+        times.append(time.perf_counter() - start)
+    return {"min": min(times), "median": statistics.median(times), "runs": times}
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=bench.project_dir,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def run_benchmarks(root, corpus, repeat) -> dict:
+    template_path = os.path.join(bench.project_dir, "template.html")
+    public = os.path.join(root, "public")
+    static_dest = os.path.join(root, "static-copy")
+
+    markdowns = []
+    for from_path, _ in find_pages(corpus["content"], public):
+        with open(from_path) as f:
+            markdowns.append(f.read())
+    inline_texts = [
+        block.replace("\n", " ")
+        for markdown in markdowns
+        for block in markdown_to_blocks(markdown)
+        if block_to_block_type(block) == block_type_paragraph
+    ]
+    html_nodes = [markdown_to_html_node(markdown, "div") for markdown in markdowns]
+
+    def clear(path):
+        if os.path.exists(path):
+            shutil.rmtree(path)
+
+    def parse_inline():
+        for text in inline_texts:
+            text_to_textnodes(text)
+
+    def serialize():
+        for node in html_nodes:
+            node.to_html()
+
+    def render():
+        for markdown in markdowns:
+            markdown_to_html_node(markdown, "div").to_html()
+
+    def render_minified():
+        set_minify_stats(MinifyStats())
+        try:
+            render()
+        finally:
+            set_minify_stats(None)
+
+    return {
+        "generate_pages_recursive": measure(
+            lambda: generate_pages_recursive(corpus["content"], template_path, public),
+            repeat,
+            setup=lambda: clear(public),
+        ),
+        "copy_files_recursive": measure(
+            lambda: copy_files_recursive(corpus["static"], static_dest),
+            repeat,
+            setup=lambda: clear(static_dest),
+        ),
+        "site_index_refresh": measure(
+            lambda: SiteIndex().refresh(corpus["content"], public, template_path),
+            repeat,
+        ),
+        "text_to_textnodes": measure(parse_inline, repeat),
+        "to_html": measure(serialize, repeat),
+        "markdown_to_html": measure(render, repeat),
+        "markdown_to_html_minified": measure(render_minified, repeat),
+    }
+
+
+def compare(base, new, threshold) -> list:
+    regressions = []
+    print(f"{'benchmark':<26} {'base s':>10} {'new s':>10} {'change':>8}")
+    for name, result in new["results"].items():
+        if name not in base["results"]:
+            print(f"{name:<26} {'-':>10} {result['min']:>10.4f} {'new':>8}")
+            continue
+        before = base["results"][name]["min"]
+        after = result["min"]
+        change = after / before - 1 if before else 0.0
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(f"{name:<26} {before:>10.4f} {after:>10.4f} {change * 100:>+7.1f}%{flag}")
+    if base.get("corpus") != new.get("corpus"):
+        print("warning: the two runs used different corpora")
+    return regressions
+
+
+def load_results(path) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build benchmark suite")
+    add_shape_arguments(parser)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--output",
+        help="Where to write the results (default: bench/results/<time>.json)",
+    )
+    parser.add_argument("--baseline", help="Results file to compare this run against")
+    parser.add_argument(
+        "--compare",
+        nargs=2,
+        metavar=("BASE", "NEW"),
+        help="Only compare two existing results files",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.10,
+        help="Slowdown (fraction of the baseline's best time) reported as a regression",
+    )
+    args = parser.parse_args()
+
+    if args.compare:
+        base, new = (load_results(path) for path in args.compare)
+        sys.exit(1 if compare(base, new, args.threshold) else 0)
+
+    # Measure the code paths themselves, not the caches in front of them.
+    set_block_cache(None)
+    set_build_profile(None)
+    shape = shape_from_args(args)
+    with tempfile.TemporaryDirectory() as root:
+        corpus = generate_corpus(root, shape, args.seed)
+        results = run_benchmarks(root, corpus, args.repeat)
+
+    report = {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "corpus": dict(shape.as_dict(), seed=args.seed, markdown_bytes=corpus["markdown_bytes"]),
+        "repeat": args.repeat,
+        "results": results,
+    }
+    output = args.output or os.path.join(
+        bench.bench_dir, "results", f"{datetime.datetime.now():%Y%m%d-%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=1)
+
+    for name, result in results.items():
+        print(f"{name:<26} min {result['min']:.4f}s  median {result['median']:.4f}s")
+    overhead = results["markdown_to_html_minified"]["min"] / results["markdown_to_html"]["min"] - 1
+    print(f"Minifying adds {overhead * 100:+.1f}% to markdown_to_html")
+    print(f"Results written to {output}")
+
+    if args.baseline:
+        sys.exit(1 if compare(load_results(args.baseline), report, args.threshold) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+import argparse
+import functools
+import http.client
+import os
+import socket
+import sys
+import threading
+import time
+from http.server import HTTPServer, SimpleHTTPRequestHandler
+
+import bench
+
+sys.path.insert(0, bench.project_dir)
+from server import CORSHTTPRequestHandler, FileCache, ThreadingHTTPServer  # noqa: E402
+
+
+class LegacyHandler(SimpleHTTPRequestHandler):
+    # The handler as it was before keep-alive: HTTP/1.0, one request per connection.
+
+    def end_headers(self):
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("Access-Control-Allow-Methods", "GET, OPTIONS")
+        self.send_header("Access-Control-Allow-Headers", "*")
+        super().end_headers()
+
+
+class QuietMixin():
+
+    def log_message(self, format, *args):
+        pass
+
+
+servers = {
+    "old": (HTTPServer, type("QuietLegacyHandler", (QuietMixin, LegacyHandler), {})),
+    "new": (ThreadingHTTPServer, type("QuietHandler", (QuietMixin, CORSHTTPRequestHandler), {})),
+    "cached": (
+        ThreadingHTTPServer,
+        type("QuietCachedHandler", (QuietMixin, CORSHTTPRequestHandler), {"file_cache": FileCache()}),
+    ),
+}
+
+
+def start_server(name, directory):
+    server_class, handler_class = servers[name]
+    handler = functools.partial(handler_class, directory=directory)
+    httpd = server_class(("127.0.0.1", 0), handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd
+
+
+def client(port, paths, deadline, latencies, errors):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    i = 0
+    while time.perf_counter() < deadline:
+        path = paths[i % len(paths)]
+        i += 1
+        start = time.perf_counter()
+        try:
+            conn.request("GET", path)
+            conn.getresponse().read()
+        except (OSError, http.client.HTTPException):
+            errors.append(path)
+            conn.close()
+            continue
+        latencies.append(time.perf_counter() - start)
+    conn.close()
+
+
+def slow_client(port, deadline):
+    # A client on a bad link that trickles its request out; a single-threaded
+    # server can do nothing else until the request is complete.
+    request = b"GET / HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n"
+    while time.perf_counter() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=30) as sock:
+                for i in range(0, len(request), 8):
+                    sock.sendall(request[i:i + 8])
+                    time.sleep(0.05)
+                while sock.recv(65536):
+                    pass
+        except OSError:
+            pass
+
+
+def run_load(name, directory, paths, clients, slow_clients, seconds) -> dict:
+    httpd = start_server(name, directory)
+    port = httpd.server_address[1]
+    latencies = []
+    errors = []
+    deadline = time.perf_counter() + seconds
+    threads = [
+        threading.Thread(target=client, args=(port, paths, deadline, latencies, errors))
+        for _ in range(clients)
+    ]
+    threads += [
+        threading.Thread(target=slow_client, args=(port, deadline))
+        for _ in range(slow_clients)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    httpd.shutdown()
+    httpd.server_close()
+
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99)] if latencies else float("nan")
+    return {
+        "server": name,
+        "requests": len(latencies),
+        "errors": len(errors),
+        "rps": len(latencies) / seconds,
+        "p99_ms": p99 * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Dev server load test")
+    parser.add_argument("--dir", default=os.path.join(bench.project_dir, "public"))
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--slow-clients", type=int, default=1)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("paths", nargs="*", default=["/", "/index.css", "/majesty/"])
+    args = parser.parse_args()
+
+    print(f"{'server':<6} {'requests':>9} {'errors':>7} {'req/s':>9} {'p99 ms':>9}")
+    for name in servers:
+        r = run_load(name, args.dir, args.paths, args.clients, args.slow_clients, args.seconds)
+        print(f"{r['server']:<6} {r['requests']:>9} {r['errors']:>7} {r['rps']:>9.0f} {r['p99_ms']:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,91 @@
 import os
 import argparse
-from http.server import HTTPServer, SimpleHTTPRequestHandler
+import io
+import json
+import socket
+import threading
+import datetime
+import email.utils
+from collections import OrderedDict
+from http import HTTPStatus
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+
+# Precompressed siblings written by the build, in order of preference.
+encoded_siblings = (("br", ".br"), ("zstd", ".zst"), ("gzip", ".gz"))
+
+
+class FileCache():
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, max_file_size=256 * 1024) -> None:
+        self.max_bytes = max_bytes
+        self.max_file_size = max_file_size
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.sendfile_responses = 0
+        self.lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return f"FileCache(entries: {len(self.entries)}, bytes: {self.size}/{self.max_bytes})"
+
+    def get(self, path, stat):
+        # An entry is only valid for the exact file it was read from.
+        key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        with self.lock:
+            entry = self.entries.get(path)
+            if entry is not None and entry[0] == key:
+                self.entries.move_to_end(path)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            return None
+
+    def put(self, path, stat, data) -> None:
+        key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        with self.lock:
+            old = self.entries.pop(path, None)
+            if old is not None:
+                self.size -= len(old[1])
+            self.entries[path] = (key, data)
+            self.size += len(data)
+            while self.size > self.max_bytes:
+                _, (_, evicted) = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+                self.evictions += 1
+
+    def count_sendfile(self) -> None:
+        with self.lock:
+            self.sendfile_responses += 1
+
+    def stats(self) -> dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "bytes": self.size,
+                "max_bytes": self.max_bytes,
+                "max_file_size": self.max_file_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "sendfile_responses": self.sendfile_responses,
+            }
 
 
 class CORSHTTPRequestHandler(SimpleHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    file_cache = None
+
+    def setup(self):
+        super().setup()
+        # Headers and body go out in separate writes; without this, Nagle's
+        # algorithm stalls every keep-alive response on the client's delayed ACK.
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
     def end_headers(self):
         self.send_header("Access-Control-Allow-Origin", "*")
         self.send_header("Access-Control-Allow-Methods", "GET, OPTIONS")
@@ -12,17 +94,254 @@ class CORSHTTPRequestHandler(SimpleHTTPRequestHandler):
 
     def do_OPTIONS(self):
         self.send_response(200, "OK")
+        self.send_header("Content-Length", "0")
         self.end_headers()
 
+    def do_GET(self):
+        if self.file_cache is not None and self.path == "/__stats":
+            body = json.dumps(self.file_cache.stats(), indent=1).encode()
+            self.send_response(HTTPStatus.OK)
+            self.send_header("Content-type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("Cache-Control", "no-store")
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        super().do_GET()
+
+    def send_head(self):
+        self.byte_range = None
+        self.use_sendfile = False
+        path = self.translate_path(self.path)
+        if os.path.isdir(path):
+            index = find_index(path) if self.path.split("?", 1)[0].endswith("/") else None
+            if index is None:
+                # Redirects and directory listings.
+                return super().send_head()
+            path = index
+        elif self.path.split("?", 1)[0].endswith("/"):
+            self.send_error(HTTPStatus.NOT_FOUND, "File not found")
+            return None
+
+        content_type = self.guess_type(path)
+        encoding, has_siblings = self.select_encoding(path)
+        if encoding is not None:
+            path += dict(encoded_siblings)[encoding]
+
+        try:
+            f, stat = self.open_file(path)
+        except OSError:
+            self.send_error(HTTPStatus.NOT_FOUND, "File not found")
+            return None
+
+        try:
+            if encoding is None:
+                etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+            else:
+                etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}-{encoding}"'
+            last_modified = self.date_time_string(stat.st_mtime)
+
+            if self.not_modified(etag, stat.st_mtime):
+                f.close()
+                self.send_response(HTTPStatus.NOT_MODIFIED)
+                self.send_header("ETag", etag)
+                self.send_header("Last-Modified", last_modified)
+                if has_siblings:
+                    self.send_header("Vary", "Accept-Encoding")
+                self.end_headers()
+                return None
+
+            size = stat.st_size
+            byte_range = None
+            range_header = self.headers.get("Range")
+            if range_header and self.headers.get("If-Range", etag) in (etag, last_modified):
+                byte_range = parse_range(range_header, size)
+                if byte_range == "unsatisfiable":
+                    f.close()
+                    self.send_response(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+                    self.send_header("Content-Range", f"bytes */{size}")
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return None
+
+            if byte_range is None:
+                self.send_response(HTTPStatus.OK)
+                self.send_header("Content-Length", str(size))
+            else:
+                start, end = byte_range
+                self.byte_range = (start, end - start + 1)
+                self.send_response(HTTPStatus.PARTIAL_CONTENT)
+                self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+                self.send_header("Content-Length", str(end - start + 1))
+            self.send_header("Content-type", content_type)
+            if encoding is not None:
+                self.send_header("Content-Encoding", encoding)
+            if has_siblings:
+                self.send_header("Vary", "Accept-Encoding")
+            self.send_header("Last-Modified", last_modified)
+            self.send_header("ETag", etag)
+            self.send_header("Accept-Ranges", "bytes")
+            self.end_headers()
+            return f
+        except BaseException:
+            f.close()
+            raise
+
+    def select_encoding(self, path):
+        try:
+            source_mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return None, False
+        accepted = parse_accept_encoding(self.headers.get("Accept-Encoding", ""))
+        # Byte ranges are served from the identity representation.
+        if "Range" in self.headers:
+            accepted = set()
+
+        has_siblings = False
+        for encoding, ext in encoded_siblings:
+            try:
+                sibling_mtime = os.stat(path + ext).st_mtime_ns
+            except OSError:
+                continue
+            has_siblings = True
+            # The build gives a sibling its source's mtime. Any other is
+            # stale until the next build, even when newer: copies keep
+            # their original mtimes.
+            if encoding in accepted and sibling_mtime == source_mtime:
+                return encoding, True
+        return None, has_siblings
+
+    def open_file(self, path):
+        if self.file_cache is None:
+            f = open(path, 'rb')
+            return f, os.fstat(f.fileno())
+
+        stat = os.stat(path)
+        if stat.st_size > self.file_cache.max_file_size:
+            # Large files go straight from the page cache to the socket.
+            f = open(path, 'rb')
+            self.use_sendfile = True
+            return f, os.fstat(f.fileno())
+
+        data = self.file_cache.get(path, stat)
+        if data is None:
+            with open(path, 'rb') as f:
+                stat = os.fstat(f.fileno())
+                data = f.read()
+            self.file_cache.put(path, stat, data)
+        return io.BytesIO(data), stat
+
+    def not_modified(self, etag, mtime) -> bool:
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match is not None:
+            tags = [tag.strip() for tag in if_none_match.split(",")]
+            return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+        if_modified_since = self.headers.get("If-Modified-Since")
+        if if_modified_since is not None:
+            try:
+                since = email.utils.parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError, IndexError, OverflowError):
+                return False
+            if since.tzinfo is None:
+                since = since.replace(tzinfo=datetime.timezone.utc)
+            return int(mtime) <= since.timestamp()
+        return False
+
+    def copyfile(self, source, outputfile):
+        if self.use_sendfile:
+            start, count = self.byte_range or (0, None)
+            self.connection.sendfile(source, start, count)
+            self.file_cache.count_sendfile()
+            return
+        if self.byte_range is None:
+            return super().copyfile(source, outputfile)
+        start, remaining = self.byte_range
+        source.seek(start)
+        while remaining > 0:
+            chunk = source.read(min(remaining, 64 * 1024))
+            if not chunk:
+                break
+            outputfile.write(chunk)
+            remaining -= len(chunk)
+
+
+def find_index(dir_path):
+    for index in ("index.html", "index.htm"):
+        index_path = os.path.join(dir_path, index)
+        if os.path.isfile(index_path):
+            return index_path
+    return None
+
+
+def parse_accept_encoding(header):
+    accepted = set()
+    rejected = set()
+    wildcard = False
+    for part in header.split(","):
+        name, _, params = part.partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if q <= 0:
+            rejected.add(name)
+        elif name == "*":
+            wildcard = True
+        else:
+            accepted.add(name)
+    if wildcard:
+        accepted |= {encoding for encoding, _ in encoded_siblings} - rejected
+    return accepted
+
+
+def parse_range(header, size):
+    # Only single byte ranges are served; anything else gets the full file.
+    unit, _, spec = header.partition("=")
+    if unit.strip() != "bytes" or "," in spec:
+        return None
+    first, sep, last = spec.strip().partition("-")
+    if not sep:
+        return None
+    try:
+        if first == "":
+            length = int(last)
+            if length <= 0 or size == 0:
+                return "unsatisfiable"
+            return max(0, size - length), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size:
+        return "unsatisfiable"
+    if start > end:
+        return None
+    return start, min(end, size - 1)
+
 
 def run(
-    server_class=HTTPServer,
+    server_class=ThreadingHTTPServer,
     handler_class=CORSHTTPRequestHandler,
     port=8000,
     directory=None,
+    cache_bytes=0,
 ):
     if directory:  # Change the current working directory if directory is specified
         os.chdir(directory)
+    if cache_bytes:
+        handler_class = type(
+            handler_class.__name__,
+            (handler_class,),
+            {"file_cache": FileCache(cache_bytes)},
+        )
     server_address = ("", port)
     httpd = server_class(server_address, handler_class)
     print(f"Serving HTTP on http://localhost:{port} from directory '{directory}'...")
@@ -35,6 +354,12 @@ if __name__ == "__main__":
         "--dir", type=str, help="Directory to serve files from", default="."
     )
     parser.add_argument("--port", type=int, help="Port to serve HTTP on", default=8888)
+    parser.add_argument(
+        "--cache-mb",
+        type=int,
+        help="Keep small files in a memory cache of this size (0 disables)",
+        default=64,
+    )
     args = parser.parse_args()
 
-    run(port=args.port, directory=args.dir)
+    run(port=args.port, directory=args.dir, cache_bytes=args.cache_mb * 1024 * 1024)
@@ -0,0 +1,142 @@
+import hashlib
+import json
+import os
+
+
+ASSET_INDEX_VERSION = 1
+
+# Files under these extensions are copied to a name containing a hash of
+# their content, so they can be cached forever. Others, such as
+# robots.txt or favicon.ico, are requested by name and keep it.
+fingerprinted_extensions = {
+    ".css", ".js", ".mjs",
+    ".png", ".jpg", ".jpeg", ".gif", ".svg", ".webp", ".avif",
+    ".woff", ".woff2", ".ttf", ".otf",
+}
+fingerprint_length = 10
+
+# None: asset URLs are written as they are. An AssetMap: links, images
+# and template attributes pointing at a fingerprinted file by its
+# root-relative URL (/index.css) point at its fingerprinted copy instead.
+asset_map = None
+
+
+class AssetMap():
+
+    def __init__(self, urls=None) -> None:
+        # "/index.css" -> "/index.3f2a9c1b2d.css"
+        self.urls = urls if urls is not None else {}
+        self.sources = {fingerprinted: url for url, fingerprinted in self.urls.items()}
+        digest = hashlib.blake2b(digest_size=16)
+        for url, fingerprinted in sorted(self.urls.items()):
+            digest.update(f"{url}\0{fingerprinted}\0".encode())
+        # 16 bytes, so it can salt the block cache's keys.
+        self.digest = digest.digest()
+
+    def __repr__(self) -> str:
+        return f"AssetMap(assets: {len(self.urls)}, {self.digest.hex()})"
+
+
+class AssetIndex():
+
+    def __init__(self, path=None, files=None) -> None:
+        self.path = path
+        # rel_path -> {"size", "mtime", "hash"}, for fingerprinted files only
+        self.files = files if files is not None else {}
+        self.hashed = 0
+
+    def __repr__(self) -> str:
+        return f"AssetIndex({self.path}, files: {len(self.files)})"
+
+    @classmethod
+    def load(cls, path):
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return cls(path)
+        if data.get("version") != ASSET_INDEX_VERSION:
+            return cls(path)
+        return cls(path, data.get("files", {}))
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        data = {"version": ASSET_INDEX_VERSION, "files": self.files}
+        tmp_path = f"{self.path}.tmp"
+        text = json.dumps(data, separators=(",", ":"), sort_keys=True)
+        with open(tmp_path, 'w') as f:
+            f.write(text)
+        os.replace(tmp_path, self.path)
+
+    def lookup(self, rel_path, size, mtime):
+        # The hash from the last time the file was seen, if it hasn't
+        # changed since; None otherwise.
+        entry = self.files.get(rel_path)
+        if entry is None or entry["size"] != size or entry["mtime"] != mtime:
+            return None
+        return entry["hash"]
+
+    def record(self, rel_path, size, mtime, digest) -> None:
+        entry = {"size": size, "mtime": mtime, "hash": digest}
+        if self.files.get(rel_path) != entry:
+            self.files[rel_path] = entry
+            self.hashed += 1
+
+    def retain(self, rel_paths) -> None:
+        for rel_path in set(self.files) - set(rel_paths):
+            del self.files[rel_path]
+
+    def asset_map(self) -> AssetMap:
+        return AssetMap({
+            asset_url(rel_path): asset_url(fingerprinted_path(rel_path, entry["hash"]))
+            for rel_path, entry in self.files.items()
+        })
+
+    def write_manifest(self, dest_path) -> None:
+        # Maps each static file to the name it was published under, for
+        # tools outside the build such as CDN upload scripts.
+        assets = {
+            rel_path.replace(os.sep, "/"): fingerprinted_path(rel_path, entry["hash"]).replace(os.sep, "/")
+            for rel_path, entry in self.files.items()
+        }
+        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+        tmp_path = f"{dest_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(assets, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, dest_path)
+
+
+def is_fingerprinted(rel_path) -> bool:
+    return os.path.splitext(rel_path)[1].lower() in fingerprinted_extensions
+
+
+def fingerprinted_path(rel_path, digest) -> str:
+    root, ext = os.path.splitext(rel_path)
+    return f"{root}.{digest[:fingerprint_length]}{ext}"
+
+
+def asset_url(rel_path) -> str:
+    return "/" + rel_path.replace(os.sep, "/")
+
+
+def set_asset_map(assets) -> None:
+    global asset_map
+    asset_map = assets
+
+
+def get_asset_map():
+    return asset_map
+
+
+def rewrite_url(url) -> str:
+    if asset_map is None:
+        return url
+    return asset_map.urls.get(url, url)
+
+
+def source_url(url) -> str:
+    # The reverse of rewrite_url: links are indexed by the URL written in
+    # the markdown, so changes to the file can be traced to its pages.
+    if asset_map is None:
+        return url
+    return asset_map.sources.get(url, url)
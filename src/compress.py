@@ -0,0 +1,197 @@
+import gzip
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+COMPRESS_INDEX_VERSION = 1
+
+compressible_extensions = {
+    ".html", ".css", ".js", ".json", ".xml", ".svg", ".txt", ".map", ".md",
+}
+# Every extension a sibling can have, whichever encoders are installed.
+sibling_extensions = (".gz", ".br", ".zst")
+
+
+def gzip_compress(data) -> bytes:
+    # mtime=0 keeps the output byte-identical across builds.
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def brotli_compress(data) -> bytes:
+    return brotli.compress(data, quality=11)
+
+
+def zstd_compress(data) -> bytes:
+    return zstandard.ZstdCompressor(level=19).compress(data)
+
+
+def available_encoders() -> dict:
+    encoders = {".gz": gzip_compress}
+    if brotli is not None:
+        encoders[".br"] = brotli_compress
+    if zstandard is not None:
+        encoders[".zst"] = zstd_compress
+    return encoders
+
+
+class CompressStats():
+
+    def __init__(self) -> None:
+        self.compressed_files = 0
+        self.skipped_files = 0
+        self.removed_files = 0
+        self.input_bytes = 0
+        self.output_bytes = 0
+
+    def __repr__(self) -> str:
+        return (
+            f"CompressStats(compressed: {self.compressed_files}, skipped: {self.skipped_files}, "
+            f"removed: {self.removed_files}, {self.input_bytes} -> {self.output_bytes} bytes)"
+        )
+
+
+class CompressIndex():
+
+    def __init__(self, path=None, files=None) -> None:
+        self.path = path
+        # sibling rel_path -> {"size", "mtime"} of the source it was
+        # compressed from
+        self.files = files if files is not None else {}
+
+    def __repr__(self) -> str:
+        return f"CompressIndex({self.path}, files: {len(self.files)})"
+
+    @classmethod
+    def load(cls, path):
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return cls(path)
+        if data.get("version") != COMPRESS_INDEX_VERSION:
+            return cls(path)
+        return cls(path, data.get("files", {}))
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        data = {"version": COMPRESS_INDEX_VERSION, "files": self.files}
+        tmp_path = f"{self.path}.tmp"
+        text = json.dumps(data, separators=(",", ":"), sort_keys=True)
+        with open(tmp_path, 'w') as f:
+            f.write(text)
+        os.replace(tmp_path, self.path)
+
+
+def compress_files(dir_path, min_size=1024, workers=8, encoders=None, index=None) -> CompressStats:
+    # Siblings are rewritten unless index records that they were
+    # compressed from a source of the same size and mtime. Without an
+    # index, every sibling is rewritten.
+    if encoders is None:
+        encoders = available_encoders()
+    if index is None:
+        index = CompressIndex()
+    sources = []
+    orphans = []
+    for root, _, filenames in os.walk(dir_path):
+        names = set(filenames)
+        for filename in sorted(filenames):
+            base, ext = os.path.splitext(filename)
+            if ext in encoders:
+                # Only siblings this stage could have written count as orphans.
+                source_ext = os.path.splitext(base)[1].lower()
+                if source_ext in compressible_extensions and base not in names:
+                    orphans.append(os.path.join(root, filename))
+            elif ext.lower() in compressible_extensions:
+                sources.append(os.path.join(root, filename))
+
+    stats = CompressStats()
+    for path in orphans:
+        os.remove(path)
+        stats.removed_files += 1
+
+    rel_paths = []
+    jobs = []
+    for path in sources:
+        for ext, encode in encoders.items():
+            rel_path = os.path.relpath(path + ext, dir_path)
+            rel_paths.append(rel_path)
+            jobs.append((path, ext, encode, min_size, index.files.get(rel_path)))
+    files = {}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        # zlib, brotli and zstd release the GIL while compressing.
+        results = executor.map(lambda job: compress_file(*job), jobs)
+        for rel_path, (entry, result) in zip(rel_paths, results):
+            if entry is not None:
+                files[rel_path] = entry
+            if result is None:
+                stats.skipped_files += 1
+            else:
+                stats.compressed_files += 1
+                stats.input_bytes += result[0]
+                stats.output_bytes += result[1]
+    index.files = files
+    return stats
+
+
+def compress_file(path, ext, encode, min_size, recorded=None):
+    # Returns the source's {"size", "mtime"} if the sibling exists, and the
+    # input and output sizes if it was written.
+    target_path = path + ext
+    stat = os.stat(path)
+    if stat.st_size < min_size:
+        if os.path.exists(target_path):
+            os.remove(target_path)
+        return None, None
+    entry = {"size": stat.st_size, "mtime": stat.st_mtime_ns}
+    if entry == recorded and os.path.exists(target_path):
+        # Siblings from before the mtime stamp below are brought in line.
+        os.utime(target_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        return entry, None
+
+    # A change while reading leaves the mtime newer than the one recorded,
+    # so the next run compresses the file again.
+    with open(path, 'rb') as f:
+        data = f.read()
+    compressed = encode(data)
+    tmp_path = f"{target_path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(compressed)
+    os.replace(tmp_path, target_path)
+    # server.py only serves a sibling with the same mtime as its source.
+    os.utime(target_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    return entry, (len(data), len(compressed))
+
+
+def remove_stale_siblings(dir_path, index) -> int:
+    # For builds that don't compress: siblings left by an earlier one are
+    # removed once their source is gone or differs from the one recorded
+    # in index. Returns the number removed.
+    removed = 0
+    for root, _, filenames in os.walk(dir_path):
+        for filename in filenames:
+            base, ext = os.path.splitext(filename)
+            if ext not in sibling_extensions or os.path.splitext(base)[1].lower() not in compressible_extensions:
+                continue
+            path = os.path.join(root, filename)
+            rel_path = os.path.relpath(path, dir_path)
+            try:
+                stat = os.stat(os.path.join(root, base))
+                fresh = index.files.get(rel_path) == {"size": stat.st_size, "mtime": stat.st_mtime_ns}
+            except FileNotFoundError:
+                fresh = False
+            if not fresh:
+                os.remove(path)
+                index.files.pop(rel_path, None)
+                removed += 1
+    return removed
@@ -1,5 +1,11 @@
 import os
 import shutil
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from assets import fingerprinted_path, is_fingerprinted
+from manifest import hash_file
 
 
 def copy_files_recursive(source_dir_path, dest_dir_path):
@@ -14,3 +20,217 @@ def copy_files_recursive(source_dir_path, dest_dir_path):
             shutil.copy(from_path, dest_path)
         else:
             copy_files_recursive(from_path, dest_path)
+
+
+class SyncStats():
+
+    def __init__(self) -> None:
+        self.copied_files = 0
+        self.copied_bytes = 0
+        self.skipped_files = 0
+        self.skipped_bytes = 0
+        self.removed_files = 0
+
+    def __repr__(self) -> str:
+        return (
+            f"SyncStats(copied: {self.copied_files} files/{self.copied_bytes} bytes, "
+            f"skipped: {self.skipped_files} files/{self.skipped_bytes} bytes, "
+            f"removed: {self.removed_files})"
+        )
+
+
+def sync_files(
+    source_dir_path,
+    dest_dir_path,
+    manifest=None,
+    use_links=False,
+    workers=8,
+    progress_interval=2.0,
+    assets=None,
+) -> SyncStats:
+    # With an AssetIndex, fingerprinted files are copied to their
+    # fingerprinted names and their hashes are recorded in it.
+    dir_paths, files = scan_tree(source_dir_path)
+    # Create the whole directory tree up front so copies never race on mkdir.
+    os.makedirs(dest_dir_path, exist_ok=True)
+    for rel_dir in dir_paths:
+        os.makedirs(os.path.join(dest_dir_path, rel_dir), exist_ok=True)
+
+    def sync_one(item) -> tuple:
+        # Returns (output path, hash or None, copied).
+        rel_path, from_path, size, mtime = item
+        output = rel_path
+        digest = None
+        if assets is not None and is_fingerprinted(rel_path):
+            # Hashed in the copy threads, and only when the file changed.
+            digest = assets.lookup(rel_path, size, mtime) or hash_file(from_path)
+            output = fingerprinted_path(rel_path, digest)
+        dest_path = os.path.join(dest_dir_path, output)
+        try:
+            dest_stat = os.stat(dest_path)
+        except FileNotFoundError:
+            dest_stat = None
+        if dest_stat is not None and dest_stat.st_size == size and dest_stat.st_mtime_ns == mtime:
+            return output, digest, False
+        sync_file(from_path, dest_path, use_links, replace=dest_stat is not None)
+        return output, digest, True
+
+    stats = SyncStats()
+    progress = Progress(len(files), progress_interval)
+    if workers > 1:
+        executor = ThreadPoolExecutor(max_workers=workers)
+        results = map_bounded(executor, sync_one, files, workers * 4)
+    else:
+        executor = None
+        results = map(sync_one, files)
+    try:
+        for (rel_path, _, size, mtime), (output, digest, copied) in zip(files, results):
+            if copied:
+                stats.copied_files += 1
+                stats.copied_bytes += size
+            else:
+                stats.skipped_files += 1
+                stats.skipped_bytes += size
+            if digest is not None:
+                assets.record(rel_path, size, mtime, digest)
+            if manifest is not None:
+                old = manifest.assets.get(rel_path)
+                old_output = old.get("output", rel_path) if old else output
+                if old_output != output and os.path.exists(os.path.join(dest_dir_path, old_output)):
+                    # The fingerprint changed, so the old copy is stale.
+                    remove_file(os.path.join(dest_dir_path, old_output), dest_dir_path)
+                    stats.removed_files += 1
+                manifest.assets[rel_path] = {"size": size, "mtime": mtime, "output": output}
+            progress.update(stats)
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+    progress.finish(stats)
+
+    seen = {rel_path for rel_path, *_ in files}
+    if assets is not None:
+        assets.retain(rel_path for rel_path in seen if is_fingerprinted(rel_path))
+    if manifest is not None:
+        for rel_path in sorted(set(manifest.assets) - seen):
+            entry = manifest.assets.pop(rel_path)
+            dest_path = os.path.join(dest_dir_path, entry.get("output", rel_path))
+            if os.path.exists(dest_path):
+                remove_file(dest_path, dest_dir_path)
+                stats.removed_files += 1
+    return stats
+
+
+def map_bounded(executor, func, items, limit):
+    # Like executor.map, but only limit items are submitted ahead of the
+    # results taken, so a large tree doesn't queue a future per file.
+    pending = deque()
+    for item in items:
+        if len(pending) >= limit:
+            yield pending.popleft().result()
+        pending.append(executor.submit(func, item))
+    while pending:
+        yield pending.popleft().result()
+
+
+def scan_tree(source_dir_path) -> tuple:
+    dir_paths = []
+    files = []
+    pending = [""]
+    while pending:
+        rel_dir = pending.pop()
+        with os.scandir(os.path.join(source_dir_path, rel_dir)) as entries:
+            for entry in sorted(entries, key=lambda entry: entry.name):
+                rel_path = os.path.join(rel_dir, entry.name)
+                if entry.is_dir():
+                    dir_paths.append(rel_path)
+                    pending.append(rel_path)
+                elif entry.is_file():
+                    stat = entry.stat()
+                    files.append((rel_path, entry.path, stat.st_size, stat.st_mtime_ns))
+    return dir_paths, files
+
+
+class Progress():
+
+    def __init__(self, total, interval) -> None:
+        self.total = total
+        self.interval = interval
+        self.done = 0
+        self.last_report = time.monotonic()
+
+    def update(self, stats) -> None:
+        self.done += 1
+        now = time.monotonic()
+        if now - self.last_report >= self.interval:
+            self.last_report = now
+            self.report(stats)
+
+    def finish(self, stats) -> None:
+        if self.total:
+            self.report(stats)
+
+    def report(self, stats) -> None:
+        print(
+            f" * {self.done}/{self.total} files, "
+            f"{stats.copied_files} copied ({stats.copied_bytes} bytes), "
+            f"{stats.skipped_files} unchanged"
+        )
+
+
+def sync_file(from_path, dest_path, use_links=False, replace=True) -> None:
+    # Existing files are replaced through a temporary name so a server
+    # reading public/ never sees a half-written file.
+    target_path = f"{dest_path}.tmp" if replace else dest_path
+    try:
+        if use_links:
+            try:
+                os.link(from_path, target_path)
+            except OSError:
+                copy_file(from_path, target_path)
+        else:
+            copy_file(from_path, target_path)
+        if replace:
+            os.replace(target_path, dest_path)
+    except BaseException:
+        if replace and os.path.exists(target_path):
+            os.remove(target_path)
+        raise
+
+
+def copy_file(from_path, dest_path) -> None:
+    with open(from_path, 'rb') as src, open(dest_path, 'wb') as dst:
+        stat = os.fstat(src.fileno())
+        try:
+            # copy_file_range lets the filesystem share extents (reflink)
+            # or copy in-kernel, without bytes passing through Python.
+            remaining = stat.st_size
+            while remaining > 0:
+                copied = os.copy_file_range(src.fileno(), dst.fileno(), remaining)
+                if copied == 0:
+                    break
+                remaining -= copied
+        except (AttributeError, OSError):
+            src.seek(0)
+            dst.seek(0)
+            dst.truncate()
+            shutil.copyfileobj(src, dst)
+        dst.flush()
+        # Mode and mtime are set on the open file; the mtime is what the
+        # next sync compares against.
+        os.chmod(dst.fileno(), stat.st_mode & 0o7777)
+        os.utime(dst.fileno(), ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+
+def remove_file(dest_path, dest_dir_path) -> None:
+    if os.path.exists(dest_path):
+        os.remove(dest_path)
+    # Prune directories left empty, stopping at dest_dir_path itself.
+    parent = os.path.dirname(dest_path)
+    root = os.path.abspath(dest_dir_path)
+    while (
+        os.path.isdir(parent)
+        and os.path.abspath(parent) != root
+        and not os.listdir(parent)
+    ):
+        os.rmdir(parent)
+        parent = os.path.dirname(parent)
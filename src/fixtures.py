@@ -0,0 +1,11 @@
+import os
+
+
+def write_file(path, text="", mtime=None):
+    # Shared by the tests: writes text to path, creating its directories,
+    # and sets its mtime (in nanoseconds) when one is given.
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write(text)
+    if mtime is not None:
+        os.utime(path, ns=(mtime, mtime))
@@ -0,0 +1,54 @@
+import os
+
+
+front_matter_delimiter = "---"
+
+
+class FrontMatterError(ValueError):
+    pass
+
+
+def read_front_matter(f) -> dict:
+    # Reads only the header: afterwards f is positioned at the first body
+    # line, or rewound to the start when the file has no front matter.
+    first = f.readline()
+    if first.rstrip("\r\n") != front_matter_delimiter:
+        f.seek(0)
+        return {}
+
+    metadata = {}
+    line_number = 1
+    while True:
+        line = f.readline()
+        line_number += 1
+        if not line:
+            raise FrontMatterError("Front matter is not closed with ---")
+        line = line.rstrip("\r\n")
+        if line == front_matter_delimiter:
+            return metadata
+        if not line.strip() or line.lstrip().startswith("#"):
+            continue
+        key, sep, value = line.partition(":")
+        key = key.strip().lower()
+        if not sep or not key:
+            raise FrontMatterError(f"Invalid front matter on line {line_number}: {line!r}")
+        metadata[key] = unquote(value.strip())
+
+
+def unquote(value) -> str:
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in "\"'":
+        return value[1:-1]
+    return value
+
+
+def read_page_metadata(path) -> dict:
+    # Front matter plus a title, without reading past the first "# " heading.
+    with open(path, 'r') as f:
+        metadata = read_front_matter(f)
+        if "title" not in metadata:
+            for line in iter(f.readline, ""):
+                if line.startswith("# "):
+                    metadata["title"] = line[2:].rstrip("\n")
+                    break
+        metadata["mtime"] = os.fstat(f.fileno()).st_mtime
+    return metadata
@@ -1,43 +1,407 @@
+import datetime
 import os
+from concurrent.futures import ProcessPoolExecutor
 
-from markdown_blocks import markdown_to_html_node
+from assets import get_asset_map, set_asset_map
+from copystatic import remove_file
+from frontmatter import read_front_matter
+from htmlnode import MinifyStats, get_minify_stats, set_minify_stats
+from markdown_blocks import (
+    BlockCache,
+    get_block_cache,
+    get_block_diagnostics,
+    markdown_lines_to_html_node,
+    set_block_cache,
+    set_block_diagnostics,
+)
+from manifest import hash_file
+from profiling import BuildProfile, get_build_profile, profile_page, set_build_profile, stage
+from template import hash_template, load_template
 
 
 def extract_title(markdown):
-    lines = markdown.split("\n")
+    return extract_title_from_lines(markdown.split("\n"))
+
+
+def extract_title_from_lines(lines):
     for line in lines:
         if line.startswith("# "):
-            return line[2:]
+            return line[2:].rstrip("\n")
     raise ValueError("No title found")
 
 
-def generate_page(from_path, template_path, dest_path):
+class PageErrors(Exception):
+
+    def __init__(self, errors) -> None:
+        super().__init__(f"{len(errors)} page(s) failed to render")
+        self.errors = errors
+
+
+def page_url(dest_path, site_root) -> str:
+    url = "/" + os.path.relpath(dest_path, site_root).replace(os.sep, "/")
+    if url.endswith("/index.html"):
+        return url[:-len("index.html")]
+    return url
+
+
+def generate_page(from_path, template_path, dest_path, site_root=None):
     print(f" * {from_path} {template_path} -> {dest_path}")
+    render_page(from_path, template_path, dest_path, site_root)
 
-    with open(from_path, 'r') as f:
-        markdown = f.read()
-    
-    with open(template_path, 'r') as f:
-        template = f.read()
-    
-    content = markdown_to_html_node(markdown, "div").to_html()
-    title = extract_title(markdown)
 
-    template = template.replace("{{ Title }}", title)
-    template = template.replace("{{ Content }}", content)
+def page_context(metadata, content, modified, path) -> dict:
+    # Every front matter key is available to the template as {{ meta.key }}.
+    context = {f"meta.{key}": value for key, value in metadata.items()}
+    context["Title"] = metadata["title"]
+    context["Content"] = content
+    context["Date"] = metadata.get("date") or datetime.date.fromtimestamp(modified).isoformat()
+    context["Path"] = path
+    return context
 
+
+def render_page(from_path, template_path, dest_path, site_root=None) -> list:
+    # Returns the (kind, url) of every link and image on the page.
+    stats = get_minify_stats()
+    saved = stats.saved if stats is not None else 0
+    template = load_template(template_path)
     os.makedirs(os.path.dirname(dest_path), exist_ok=True)
-    with open(dest_path, 'w') as f:
-        f.write(template)
+    tmp_path = f"{dest_path}.tmp"
+
+    # The markdown is streamed block by block into the output file, so
+    # without a title in the front matter it is found with a separate pass
+    # over the first lines of the body.
+    links = []
+    with profile_page(from_path), open(from_path, 'r') as source:
+        with stage("read"):
+            metadata = read_front_matter(source)
+            if "title" not in metadata:
+                body_start = source.tell()
+                metadata["title"] = extract_title_from_lines(iter(source.readline, ""))
+                source.seek(body_start)
+        context = page_context(
+            metadata,
+            markdown_lines_to_html_node(source, "div", links),
+            os.fstat(source.fileno()).st_mtime,
+            page_url(dest_path, site_root) if site_root else "",
+        )
+        # Blocks are split, parsed, cached and serialized under their own
+        # stages while the template is filled; "write" is the rest.
+        with stage("write"):
+            try:
+                with open(tmp_path, 'w') as f, stage("template"):
+                    template.write(f.write, context)
+                os.replace(tmp_path, dest_path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+    if stats is not None:
+        stats.record(from_path, stats.saved - saved)
+    return links
 
 
-def generate_pages_recursive(dir_path_content, template_path, dest_dir_path):
-    for filename in os.listdir(dir_path_content):
+def page_dest_path(from_path, dir_path_content, dest_dir_path) -> str:
+    root, _ = os.path.splitext(os.path.relpath(from_path, dir_path_content))
+    return os.path.join(dest_dir_path, f"{root}.html")
+
+
+def find_pages(dir_path_content, dest_dir_path):
+    for filename in sorted(os.listdir(dir_path_content)):
         from_path = os.path.join(dir_path_content, filename)
         root, ext = os.path.splitext(filename)
         if os.path.isfile(from_path) and ext.lower() == ".md":
-            dest_path = os.path.join(dest_dir_path, f"{root}.html")
-            generate_page(from_path, template_path, dest_path)
+            yield from_path, os.path.join(dest_dir_path, f"{root}.html")
         elif os.path.isdir(from_path):
             dest_path = os.path.join(dest_dir_path, filename)
-            generate_pages_recursive(from_path, template_path, dest_path)
+            yield from find_pages(from_path, dest_path)
+
+
+def generate_pages_recursive(
+    dir_path_content, template_path, dest_dir_path, jobs=1, link_index=None, diagnostics=None, manifest=None
+):
+    # With a Manifest, every page that renders cleanly is recorded in it,
+    # so a later incremental build knows what this one wrote.
+    pages = list(find_pages(dir_path_content, dest_dir_path))
+    if manifest is not None:
+        template_hash = hash_template(template_path)
+        sources = {from_path: (os.stat(from_path), hash_file(from_path)) for from_path, _ in pages}
+    page_links = {}
+    reported = len(diagnostics) if diagnostics is not None else 0
+    errors = render_pages(pages, template_path, jobs, dest_dir_path, page_links, diagnostics)
+    if manifest is not None:
+        flagged = {from_path for from_path, *_ in diagnostics[reported:]} if diagnostics is not None else set()
+        for from_path, dest_path in pages:
+            if from_path in page_links and from_path not in flagged:
+                stat, content_hash = sources[from_path]
+                manifest.record_page(
+                    os.path.relpath(from_path, dir_path_content),
+                    stat,
+                    content_hash,
+                    template_hash,
+                    os.path.relpath(dest_path, dest_dir_path),
+                )
+    if link_index is not None:
+        link_index.clear()
+        for from_path, dest_path in pages:
+            if from_path in page_links:
+                key = os.path.relpath(from_path, dir_path_content)
+                link_index.set_page(key, page_url(dest_path, dest_dir_path), page_links[from_path])
+    if errors:
+        raise PageErrors(errors)
+
+
+def render_pages(pages, template_path, jobs=1, site_root=None, page_links=None, diagnostics=None) -> list:
+    # Fills page_links (from_path -> links) for the pages that rendered.
+    # With a diagnostics list, invalid inline markdown is rendered literally
+    # and (from_path, line, column, message) is appended for it instead of
+    # failing the page.
+    if page_links is None:
+        page_links = {}
+    if jobs <= 1 or len(pages) <= 1:
+        previous = get_block_diagnostics()
+        if diagnostics is not None:
+            set_block_diagnostics([])
+        try:
+            errors = []
+            for from_path, dest_path in pages:
+                print(f" * {from_path} {template_path} -> {dest_path}")
+                error, links, page_diagnostics = render_page_safely(
+                    from_path, template_path, dest_path, site_root
+                )
+                if error is not None:
+                    errors.append((from_path, error))
+                else:
+                    page_links[from_path] = links
+                    if diagnostics is not None:
+                        diagnostics.extend((from_path, *problem) for problem in page_diagnostics)
+        finally:
+            set_block_diagnostics(previous)
+        return errors
+
+    batches = batch_pages(pages, jobs)
+    block_cache = get_block_cache()
+    profile = get_build_profile()
+    minify_stats = get_minify_stats()
+    errors = []
+    with ProcessPoolExecutor(
+        max_workers=jobs,
+        initializer=init_worker,
+        initargs=(
+            block_cache.path if block_cache else None,
+            profile is not None,
+            diagnostics is not None,
+            minify_stats is not None,
+            get_asset_map(),
+        ),
+    ) as executor:
+        futures = [
+            executor.submit(render_batch, batch, template_path, site_root)
+            for batch in batches
+        ]
+        # Collect in submission order so logs don't depend on scheduling.
+        for batch, future in zip(batches, futures):
+            batch_results, cache_updates, profile_updates, minify_updates = future.result()
+            for (from_path, dest_path), (error, links, page_diagnostics) in zip(batch, batch_results):
+                print(f" * {from_path} {template_path} -> {dest_path}")
+                if error is not None:
+                    errors.append((from_path, error))
+                else:
+                    page_links[from_path] = links
+                    if diagnostics is not None:
+                        diagnostics.extend((from_path, *problem) for problem in page_diagnostics)
+            if block_cache is not None and cache_updates is not None:
+                block_cache.merge(cache_updates)
+            if profile is not None and profile_updates is not None:
+                profile.merge(profile_updates)
+            if minify_stats is not None and minify_updates is not None:
+                minify_stats.merge(minify_updates)
+    return errors
+
+
+def init_worker(block_cache_path, profiling=False, lenient=False, minify=False, asset_map=None):
+    if block_cache_path is not None:
+        cache = get_block_cache()
+        if cache is not None and cache.path == block_cache_path:
+            # A forked worker inherits the parent's cache as it is, so
+            # only its counters and updates are started afresh.
+            cache.take_updates()
+        else:
+            set_block_cache(BlockCache.load(block_cache_path))
+    if profiling:
+        set_build_profile(BuildProfile())
+    if lenient:
+        set_block_diagnostics([])
+    if minify:
+        set_minify_stats(MinifyStats())
+    set_asset_map(asset_map)
+
+
+def render_page_safely(from_path, template_path, dest_path, site_root=None) -> tuple:
+    # Returns (error, links, diagnostics), diagnostics as (line, column, message).
+    problems = get_block_diagnostics()
+    try:
+        links = render_page(from_path, template_path, dest_path, site_root)
+        diagnostics = locate_diagnostics(from_path, problems) if problems else []
+    except Exception as e:
+        return f"{type(e).__name__}: {e}", None, []
+    finally:
+        if problems:
+            problems.clear()
+    return None, links, diagnostics
+
+
+def locate_diagnostics(from_path, problems) -> list:
+    # Turns (block, line, column, message) into positions in the file.
+    # Only runs for pages that had problems, so it can read the file again.
+    with open(from_path, 'r') as f:
+        markdown = f.read()
+    diagnostics = []
+    block = None
+    start = end = 0
+    for problem_block, line, column, message in problems:
+        if problem_block is not block:
+            block = problem_block
+            start = markdown.find(block, end)
+            if start == -1:
+                start = max(0, markdown.find(block))
+            end = start + len(block)
+        if line == 1:
+            # The block was stripped, so its first line may be indented.
+            column += start - (markdown.rfind("\n", 0, start) + 1)
+        diagnostics.append((markdown.count("\n", 0, start) + line, column, message))
+    return diagnostics
+
+
+def render_batch(batch, template_path, site_root=None) -> tuple:
+    results = [
+        render_page_safely(from_path, template_path, dest_path, site_root)
+        for from_path, dest_path in batch
+    ]
+    block_cache = get_block_cache()
+    profile = get_build_profile()
+    minify_stats = get_minify_stats()
+    return (
+        results,
+        block_cache.take_updates() if block_cache else None,
+        profile.take_updates() if profile else None,
+        minify_stats.take_updates() if minify_stats else None,
+    )
+
+
+def batch_pages(pages, jobs, max_batch_bytes=256 * 1024) -> list:
+    sizes = [os.path.getsize(from_path) for from_path, _ in pages]
+    # Aim for several batches per worker so a slow batch doesn't stall the pool.
+    target = min(max_batch_bytes, max(1, sum(sizes) // (jobs * 4)))
+
+    batches = []
+    batch = []
+    batch_bytes = 0
+    for page, size in zip(pages, sizes):
+        if batch and batch_bytes + size > target:
+            batches.append(batch)
+            batch = []
+            batch_bytes = 0
+        batch.append(page)
+        batch_bytes += size
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def generate_pages_incremental(
+    dir_path_content, template_path, dest_dir_path, manifest, jobs=1, link_index=None, diagnostics=None
+) -> list:
+    pages = list(find_pages(dir_path_content, dest_dir_path))
+    seen = {os.path.relpath(from_path, dir_path_content) for from_path, _ in pages}
+    removed = set(manifest.pages) - seen
+    return update_pages(
+        pages,
+        removed,
+        dir_path_content,
+        template_path,
+        dest_dir_path,
+        manifest,
+        jobs,
+        link_index,
+        diagnostics=diagnostics,
+    )
+
+
+def update_pages(
+    pages,
+    removed,
+    dir_path_content,
+    template_path,
+    dest_dir_path,
+    manifest,
+    jobs=1,
+    link_index=None,
+    forced=(),
+    diagnostics=None,
+) -> list:
+    # Pages in forced are rendered even when their source is unchanged.
+    template_hash = hash_template(template_path)
+    pending = []
+
+    for from_path, dest_path in pages:
+        key = os.path.relpath(from_path, dir_path_content)
+        output = os.path.relpath(dest_path, dest_dir_path)
+
+        stat = os.stat(from_path)
+        entry = manifest.pages.get(key)
+        output_ok = (
+            entry is not None
+            and entry["output"] == output
+            and os.path.exists(dest_path)
+            and from_path not in forced
+            and (link_index is None or key in link_index.pages)
+        )
+        if output_ok and manifest.page_is_fresh(key, stat, template_hash):
+            continue
+
+        content_hash = hash_file(from_path)
+        if output_ok and entry["hash"] == content_hash and entry["template"] == template_hash:
+            # Touched but unchanged: refresh the stat so the next build skips the hash.
+            manifest.record_page(key, stat, content_hash, template_hash, output)
+            continue
+
+        pending.append((from_path, dest_path, key, stat, content_hash, output))
+
+    for key in sorted(removed):
+        entry = manifest.pages.pop(key, None)
+        if entry is None:
+            continue
+        dest_path = os.path.join(dest_dir_path, entry["output"])
+        print(f" * removing {dest_path}")
+        remove_file(dest_path, dest_dir_path)
+    if link_index is not None:
+        for key in removed:
+            link_index.remove_page(key)
+
+    pages = [(from_path, dest_path) for from_path, dest_path, *_ in pending]
+    page_links = {}
+    reported = len(diagnostics) if diagnostics is not None else 0
+    errors = render_pages(pages, template_path, jobs, dest_dir_path, page_links, diagnostics)
+    flagged = {from_path for from_path, *_ in diagnostics[reported:]} if diagnostics is not None else set()
+
+    generated = []
+    for from_path, dest_path, key, stat, content_hash, output in pending:
+        if from_path not in page_links:
+            # Forget the page so the next build retries it.
+            manifest.pages.pop(key, None)
+            if link_index is not None:
+                link_index.remove_page(key)
+            continue
+        if from_path in flagged:
+            # Rendered, but left out of the manifest so its problems are
+            # reported again until they are fixed.
+            manifest.pages.pop(key, None)
+        else:
+            manifest.record_page(key, stat, content_hash, template_hash, output)
+        if link_index is not None:
+            link_index.set_page(key, page_url(dest_path, dest_dir_path), page_links[from_path])
+        generated.append(dest_path)
+
+    if errors:
+        raise PageErrors(errors)
+    return generated
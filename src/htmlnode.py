@@ -1,4 +1,21 @@
+import html
+import re
+
+
+# HTML whitespace only: a non-breaking space is content.
+whitespace_pattern = re.compile(r"[ \t\n\r\f]{2,}|[\t\n\r\f]")
+preserved_pattern = re.compile(r"<(pre|code|textarea|script|style)\b.*?</\1\s*>", re.S | re.I)
+held_pattern = re.compile(r"<\0(\d+)>")
+tag_gap_pattern = re.compile(r"(?<=>)[ \t\r\f]*\n[ \t\n\r\f]*(?=<)")
+
+# None: output is written as it is. A MinifyStats: runs of whitespace in
+# text and templates collapse to one space, except where whitespace is
+# significant (<pre>, <code>, ...), and the bytes removed are added to it.
+minify_stats = None
+
+
 class HTMLNode():
+    __slots__ = ("tag", "value", "children", "props")
 
     def __init__(self, tag=None, value=None, children=None, props=None) -> None:
         self.tag = tag
@@ -21,17 +38,23 @@ class HTMLNode():
         return f"HTMLNode({self.tag}, {self.value}, children: {self.children}, {self.props})"
 
     def to_html(self) -> str:
-        raise NotImplementedError("to_html method not implemented")
-    
+        parts = []
+        self.write_html(parts.append)
+        return "".join(parts)
+
+    def write_html(self, write) -> None:
+        raise NotImplementedError("write_html method not implemented")
+
     def props_to_html(self) -> str:
         attributes = ""
         if self.props:
             for attribute, value in self.props.items():
-                attributes += f' {attribute}="{value}"'
+                attributes += f' {attribute}="{escape_attribute(value)}"'
         return attributes
 
 
 class LeafNode(HTMLNode):
+    __slots__ = ()
 
     def __init__(self, tag, value, props=None) -> None:
         super().__init__(tag, value, None, props)
@@ -49,17 +72,94 @@ class LeafNode(HTMLNode):
     def __repr__(self) -> str:
         return f'LeafNode({self.tag}, {self.value}, {self.props})'
     
+    def to_html(self) -> str:
+        value = self.value
+        if value is None:
+            raise ValueError("Invalid HTML: no value")
+        value = escape_text(value)
+        if self.tag is None:
+            return value
+        if self.tag == "img":
+            return f"<{self.tag}{self.props_to_html()} />"
+        return f"<{self.tag}{self.props_to_html()}>{value}</{self.tag}>"
+
+    def write_html(self, write) -> None:
+        write(self.to_html())
+
+
+class RawNode(LeafNode):
+    # HTML that is already serialized, such as a cached block: it is
+    # written as it is, without escaping.
+    __slots__ = ()
+
+    def __init__(self, html) -> None:
+        super().__init__(None, html)
+
+    def __eq__(self, __value: object) -> bool:
+        if not isinstance(__value, HTMLNode):
+            return NotImplemented
+
+        # Never equal to a LeafNode with the same text: that one is escaped.
+        return isinstance(__value, RawNode) and self.value == __value.value
+
+    def __repr__(self) -> str:
+        return f"RawNode({self.value})"
+
     def to_html(self) -> str:
         if self.value is None:
             raise ValueError("Invalid HTML: no value")
+        return self.value
+
+
+class EscapedNode(LeafNode):
+    # A leaf whose text and attribute values are already escaped, as the
+    # inline parser makes them: they are escaped once when parsed, not
+    # every time the node is written.
+    __slots__ = ()
+
+    def __eq__(self, __value: object) -> bool:
+        if not isinstance(__value, LeafNode):
+            return NotImplemented
+        if isinstance(__value, RawNode):
+            return False
+
+        # Equal to a LeafNode that writes the same HTML.
+        value = __value.value
+        props = __value.props
+        if not isinstance(__value, EscapedNode):
+            if value is not None:
+                value = escape_text(value)
+            if props:
+                props = {attribute: escape_attribute(value) for attribute, value in props.items()}
+        return(
+            self.tag == __value.tag and
+            self.value == value and
+            self.props == props
+        )
+
+    def __repr__(self) -> str:
+        return f"EscapedNode({self.tag}, {self.value}, {self.props})"
+
+    def props_to_html(self) -> str:
+        attributes = ""
+        if self.props:
+            for attribute, value in self.props.items():
+                attributes += f' {attribute}="{value}"'
+        return attributes
+
+    def to_html(self) -> str:
+        value = self.value
+        if value is None:
+            raise ValueError("Invalid HTML: no value")
         if self.tag is None:
-            return self.value
+            return value
         if self.tag == "img":
             return f"<{self.tag}{self.props_to_html()} />"
-        return f"<{self.tag}{self.props_to_html()}>{self.value}</{self.tag}>"
+        return f"<{self.tag}{self.props_to_html()}>{value}</{self.tag}>"
 
 
 class ParentNode(HTMLNode):
+    __slots__ = ()
 
     def __init__(self, tag, children, props=None) -> None:
         super().__init__(tag, None, children, props)
@@ -77,15 +177,105 @@ class ParentNode(HTMLNode):
     def __repr__(self) -> str:
         return f"ParentNode({self.tag}, children: {self.children}, {self.props})"
 
-    def to_html(self) -> str:
+    def write_html(self, write) -> None:
+        # Nested ParentNodes are walked with an explicit stack rather than
+        # recursion, so deeply nested documents can't hit the recursion limit.
+        self.write_open_tag(write)
+        stack = [(self, iter(self.children))]
+        while stack:
+            node, children = stack[-1]
+            for child in children:
+                if isinstance(child, ParentNode):
+                    child.write_open_tag(write)
+                    stack.append((child, iter(child.children)))
+                    break
+                child.write_html(write)
+            else:
+                stack.pop()
+                write(f"</{node.tag}>")
+
+    def write_open_tag(self, write) -> None:
         if self.tag is None:
             raise ValueError("Invalid HTML: no tag")
         if self.children is None:
             raise ValueError("Invalid HTML: no children")
-        
-        html = f"<{self.tag}{self.props_to_html()}>"
-        for child in self.children:
-            html += child.to_html()
-        html += f"</{self.tag}>"
+        write(f"<{self.tag}{self.props_to_html()}>")
+
+
+class MinifyStats():
+
+    def __init__(self) -> None:
+        # Bytes removed so far, including cached blocks and templates.
+        self.saved = 0
+        # page -> bytes removed from it
+        self.pages = {}
+
+    def __repr__(self) -> str:
+        return f"MinifyStats(pages: {len(self.pages)}, saved: {self.total()})"
+
+    def record(self, page, saved) -> None:
+        self.pages[page] = saved
+
+    def total(self) -> int:
+        return sum(self.pages.values())
+
+    def take_updates(self) -> dict:
+        # Hands the pages recorded in a worker process back to the parent.
+        pages = self.pages
+        self.pages = {}
+        return pages
+
+    def merge(self, pages) -> None:
+        self.pages.update(pages)
+
+
+def set_minify_stats(stats) -> None:
+    global minify_stats
+    minify_stats = stats
+
+
+def get_minify_stats():
+    return minify_stats
+
+
+# Most text has nothing to escape: checking first costs a few scans, where
+# html.escape would always build a new string. Faster than a regex search
+# or str.translate on strings this short.
+def escape_text(value) -> str:
+    if "&" in value or "<" in value or ">" in value:
+        return html.escape(value, quote=False)
+    return value
+
+
+def escape_attribute(value) -> str:
+    if "&" in value or "<" in value or ">" in value or '"' in value or "'" in value:
+        return html.escape(value)
+    return value
+
+
+def has_collapsible_whitespace(text) -> bool:
+    # Much faster than whitespace_pattern.search on the usual text, which
+    # has nothing to collapse.
+    return "  " in text or "\n" in text or "\t" in text or "\r" in text or "\f" in text
+
+
+def collapse_whitespace(text) -> str:
+    collapsed = whitespace_pattern.sub(" ", text)
+    minify_stats.saved += len(text) - len(collapsed)
+    return collapsed
+
+
+def minify_html(html, gap_pattern=tag_gap_pattern) -> str:
+    # For markup written by hand, such as templates: whitespace between
+    # tags on separate lines (gaps matched by gap_pattern) is removed,
+    # other runs of whitespace collapse to one space, and <pre>, <code>,
+    # <textarea>, <script> and <style> are copied unchanged.
+    preserved = []
+
+    def hold(match):
+        preserved.append(match.group())
+        return f"<\0{len(preserved) - 1}>"
 
-        return html
+    html = preserved_pattern.sub(hold, html)
+    html = whitespace_pattern.sub(" ", gap_pattern.sub("", html)).strip(" \t\n\r\f")
+    return held_pattern.sub(lambda match: preserved[int(match.group(1))], html)
@@ -11,7 +11,136 @@ from textnode import (
 )
 
 
+inline_delimiter_pattern = re.compile(r"\*\*|\*|`")
+image_pattern = re.compile(r"!\[(.*?)\]\((.*?)\)")
+# The "not preceded by !" check is done by hand in append_link_nodes, since a
+# lookbehind would see past the start of a run when searching with pos.
+link_pattern = re.compile(r"\[(.*?)\]\((.*?)\)")
+
+
 def text_to_textnodes(text) -> list:
+    nodes = []
+    bold = italic = code = False
+    start = 0
+    for match in inline_delimiter_pattern.finditer(text):
+        delimiter = match.group()
+        if delimiter == "**":
+            if italic or code:
+                raise ValueError("Invalid Markdown syntax")
+        elif delimiter == "*":
+            if code:
+                raise ValueError("Invalid Markdown syntax")
+        if match.start() > start:
+            text_type = (
+                text_type_code if code
+                else text_type_italic if italic
+                else text_type_bold if bold
+                else text_type_text
+            )
+            append_run_nodes(nodes, text, start, match.start(), text_type)
+        if delimiter == "**":
+            bold = not bold
+        elif delimiter == "*":
+            italic = not italic
+        else:
+            code = not code
+        start = match.end()
+
+    if bold or italic or code:
+        raise ValueError("Invalid Markdown syntax")
+    if start < len(text):
+        append_run_nodes(nodes, text, start, len(text), text_type_text)
+    return nodes
+
+
+def text_to_textnodes_lenient(text, problems) -> list:
+    # Same output as text_to_textnodes for valid text. Delimiters that
+    # don't pair up are kept as literal text, and (offset, message) is
+    # appended to problems for each one. Only used after the strict parser
+    # has failed, so valid text never pays for it.
+    matches = list(inline_delimiter_pattern.finditer(text))
+    unclosed = {}
+    while True:
+        nested = {}
+        active = []
+        opened = {}
+        for i, match in enumerate(matches):
+            if i in unclosed:
+                continue
+            delimiter = match.group()
+            if delimiter != "`" and "`" in opened:
+                nested[i] = f"'{delimiter}' inside a code span"
+            elif delimiter == "**" and "*" in opened:
+                nested[i] = "'**' inside italic text"
+            elif delimiter in opened:
+                active.append(opened.pop(delimiter))
+                active.append(i)
+            else:
+                opened[delimiter] = i
+        if not opened:
+            break
+        # An unclosed delimiter is literal. Pair the rest again without it,
+        # since it may have made later delimiters look nested.
+        for delimiter, i in opened.items():
+            unclosed[i] = f"Unclosed '{delimiter}'"
+
+    literal = {**unclosed, **nested}
+    for i in sorted(literal):
+        problems.append((matches[i].start(), literal[i]))
+
+    nodes = []
+    bold = italic = code = False
+    start = 0
+    for i in sorted(active):
+        match = matches[i]
+        if match.start() > start:
+            text_type = (
+                text_type_code if code
+                else text_type_italic if italic
+                else text_type_bold if bold
+                else text_type_text
+            )
+            append_run_nodes(nodes, text, start, match.start(), text_type)
+        delimiter = match.group()
+        if delimiter == "**":
+            bold = not bold
+        elif delimiter == "*":
+            italic = not italic
+        else:
+            code = not code
+        start = match.end()
+    if start < len(text):
+        append_run_nodes(nodes, text, start, len(text), text_type_text)
+    return nodes
+
+
+def append_run_nodes(nodes, text, start, end, text_type) -> None:
+    pos = start
+    for image in image_pattern.finditer(text, start, end):
+        append_link_nodes(nodes, text, pos, image.start(), text_type)
+        nodes.append(TextNode(image.group(1), text_type_image, image.group(2)))
+        pos = image.end()
+    append_link_nodes(nodes, text, pos, end, text_type)
+
+
+def append_link_nodes(nodes, text, start, end, text_type) -> None:
+    pos = search_from = start
+    while True:
+        link = link_pattern.search(text, search_from, end)
+        if link is None:
+            break
+        if link.start() > start and text[link.start() - 1] == "!":
+            search_from = link.start() + 1
+            continue
+        if link.start() > pos:
+            nodes.append(TextNode(text[pos:link.start()], text_type))
+        nodes.append(TextNode(link.group(1), text_type_link, link.group(2)))
+        pos = search_from = link.end()
+    if end > pos:
+        nodes.append(TextNode(text[pos:end], text_type))
+
+
+def text_to_textnodes_reference(text) -> list:
     nodes = [TextNode(text, text_type_text)]
     
     nodes = split_nodes_delimiter(nodes, "**", text_type_bold)
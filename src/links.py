@@ -0,0 +1,140 @@
+import json
+import os
+from urllib.parse import unquote, urljoin, urlsplit
+
+from assets import rewrite_url
+
+
+LINK_INDEX_VERSION = 1
+
+
+class LinkIndex():
+
+    def __init__(self, path=None, pages=None) -> None:
+        self.path = path
+        # source key -> {"url": page url, "links": [...], "images": [...]}
+        self.pages = pages if pages is not None else {}
+        # resolved site path -> keys of the pages pointing at it
+        self.referrer_keys = {}
+        for key in self.pages:
+            self.index_page(key)
+
+    def __repr__(self) -> str:
+        return f"LinkIndex({self.path}, pages: {len(self.pages)})"
+
+    @classmethod
+    def load(cls, path):
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return cls(path)
+        if data.get("version") != LINK_INDEX_VERSION:
+            return cls(path)
+        return cls(path, data.get("pages", {}))
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        data = {"version": LINK_INDEX_VERSION, "pages": self.pages}
+        tmp_path = f"{self.path}.tmp"
+        text = json.dumps(data, separators=(",", ":"), sort_keys=True)
+        with open(tmp_path, 'w') as f:
+            f.write(text)
+        os.replace(tmp_path, self.path)
+
+    def set_page(self, key, url, links) -> None:
+        self.remove_page(key)
+        self.pages[key] = {
+            "url": url,
+            "links": sorted({target for kind, target in links if kind == "link"}),
+            "images": sorted({target for kind, target in links if kind == "image"}),
+        }
+        self.index_page(key)
+
+    def remove_page(self, key) -> None:
+        if key not in self.pages:
+            return
+        for path, _ in self.targets(key):
+            keys = self.referrer_keys.get(path)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.referrer_keys[path]
+        del self.pages[key]
+
+    def clear(self) -> None:
+        self.pages = {}
+        self.referrer_keys = {}
+
+    def index_page(self, key) -> None:
+        for path, _ in self.targets(key):
+            self.referrer_keys.setdefault(path, set()).add(key)
+
+    def targets(self, key) -> list:
+        # The site paths a page points at; external and non-http links are skipped.
+        entry = self.pages[key]
+        targets = []
+        for target in entry["links"] + entry["images"]:
+            path = resolve_target(entry["url"], target)
+            if path is not None:
+                targets.append((path, target))
+        return targets
+
+    def referrers(self, *targets) -> list:
+        keys = set()
+        for target in targets:
+            keys.update(self.referrer_keys.get(resolve_target("/", target), ()))
+        return sorted(keys)
+
+    def broken_links(self, public_dir, keys=None) -> list:
+        # Checking the whole site lists public/ once; checking a few pages
+        # only stats the files they point at.
+        if keys is None:
+            exists = public_files(public_dir).__contains__
+        else:
+            def exists(path) -> bool:
+                return os.path.isfile(os.path.join(public_dir, *path.split("/")))
+        broken = []
+        for key in sorted(self.pages if keys is None else keys):
+            if key not in self.pages:
+                continue
+            for path, target in self.targets(key):
+                if rewrite_url(target) != target:
+                    # Only the fingerprinted copy is in public/.
+                    path = resolve_target("/", rewrite_url(target))
+                if not path_exists(exists, path):
+                    broken.append((key, target))
+        return broken
+
+
+def resolve_target(page_url, target):
+    # The site path target points at. A directory and its index page are
+    # one path: "/x", "/x/" and "/x/index.html" all resolve to "/x/", the
+    # URL pages are indexed under.
+    parts = urlsplit(urljoin(page_url, target))
+    if parts.scheme or parts.netloc:
+        return None
+    path = unquote(parts.path) or "/"
+    if path.endswith("/index.html"):
+        return path[:-len("index.html")]
+    if not path.endswith("/") and "." not in path.rsplit("/", 1)[1]:
+        return path + "/"
+    return path
+
+
+def public_files(public_dir) -> set:
+    files = set()
+    for root, _, filenames in os.walk(public_dir):
+        rel_root = os.path.relpath(root, public_dir).replace(os.sep, "/")
+        prefix = "/" if rel_root == "." else f"/{rel_root}/"
+        files.update(prefix + filename for filename in filenames)
+    return files
+
+
+def path_exists(exists, path) -> bool:
+    # exists tells whether a file is in public/, by its site path.
+    # Directories are served through their index page, like server.py does;
+    # "/x/" can also be a file without an extension, such as /CNAME.
+    if not path.endswith("/"):
+        return exists(path)
+    return exists(path + "index.html") or (path != "/" and exists(path[:-1]))
@@ -1,29 +1,369 @@
+import argparse
+import cProfile
 import os
+import pstats
 import shutil
+import sys
+import tracemalloc
 
-from copystatic import copy_files_recursive
-from gencontent import generate_pages_recursive
+from assets import AssetIndex, set_asset_map
+from compress import CompressIndex, available_encoders, compress_files, remove_stale_siblings
+from copystatic import sync_files
+from gencontent import (
+    PageErrors,
+    generate_pages_recursive,
+    generate_pages_incremental,
+)
+from htmlnode import MinifyStats, set_minify_stats
+from links import LinkIndex
+from manifest import Manifest
+from markdown_blocks import BlockCache, set_block_cache
+from profiling import BuildProfile, set_build_profile, stage
+from sections import SiteIndex
+from watch import Watcher
 
 script_dir = os.path.dirname(os.path.realpath(__file__))
 project_dir = os.path.dirname(script_dir)
 
 dir_path_static = f"{project_dir}/static"
 dir_path_public = f"{project_dir}/public"
+dir_path_content = f"{project_dir}/content"
+dir_path_cache = f"{project_dir}/.cache"
+template_path = f"{project_dir}/template.html"
+manifest_path = f"{dir_path_cache}/manifest.json"
+block_cache_path = f"{dir_path_cache}/blocks.json"
+link_index_path = f"{dir_path_cache}/links.json"
+site_index_path = f"{dir_path_cache}/site.json"
+asset_index_path = f"{dir_path_cache}/assets.json"
+compress_index_path = f"{dir_path_cache}/compress.json"
+asset_manifest_path = f"{dir_path_public}/assets.json"
+timings_path = f"{dir_path_cache}/timings.json"
+cprofile_path = f"{dir_path_cache}/build.prof"
 
 
-def main():
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Static site generator")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only re-render pages whose markdown or template changed",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="After an incremental build, keep rebuilding what changes",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of worker processes for page rendering (0 = one per CPU)",
+    )
+    parser.add_argument(
+        "--link-static",
+        action="store_true",
+        help="Hard-link static files into public/ instead of copying (incremental only)",
+    )
+    parser.add_argument(
+        "--copy-workers",
+        type=int,
+        default=8,
+        help="Number of threads copying static files",
+    )
+    parser.add_argument(
+        "--precompress",
+        action="store_true",
+        help="Write compressed siblings (.gz, plus .br/.zst if available) for public/",
+    )
+    parser.add_argument(
+        "--minify",
+        action="store_true",
+        help="Collapse whitespace in pages and the template, except inside <pre> and <code>",
+    )
+    parser.add_argument(
+        "--fingerprint",
+        action="store_true",
+        help="Copy CSS, scripts, images and fonts to content-hashed names and link pages to them",
+    )
+    parser.add_argument(
+        "--no-block-cache",
+        dest="block_cache",
+        action="store_false",
+        help="Parse every block instead of reusing cached HTML",
+    )
+    parser.add_argument(
+        "--no-listings",
+        dest="listings",
+        action="store_false",
+        help="Don't generate section listing pages and sitemap.xml",
+    )
+    parser.add_argument(
+        "--per-page",
+        type=int,
+        default=20,
+        help="Number of pages listed on each section listing page",
+    )
+    parser.add_argument(
+        "--base-url",
+        default="",
+        help="Prefix for the URLs in sitemap.xml, e.g. https://example.com",
+    )
+    parser.add_argument(
+        "--lenient",
+        action="store_true",
+        help="Render unpaired *, ** and ` literally and report every occurrence instead of failing the page",
+    )
+    parser.add_argument(
+        "--check-links",
+        action="store_true",
+        help="After building, report links and images that point at nothing in public/",
+    )
+    parser.add_argument(
+        "--referrers",
+        metavar="URL",
+        help="List the pages that link to URL (from the last build's link index) and exit",
+    )
+    parser.add_argument(
+        "--timings",
+        action="store_true",
+        help=f"Time each build stage per page and write a report to {os.path.relpath(timings_path, project_dir)}",
+    )
+    parser.add_argument(
+        "--top",
+        type=int,
+        default=10,
+        help="Number of slowest pages to list with --timings",
+    )
+    parser.add_argument(
+        "--profile",
+        choices=("cprofile", "tracemalloc"),
+        help="Run the build under cProfile or tracemalloc and print the stats (implies --timings)",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    link_index = LinkIndex.load(link_index_path)
+    if args.referrers:
+        for key in link_index.referrers(args.referrers):
+            print(key)
+        return
+
+    jobs = args.jobs if args.jobs > 0 else os.cpu_count() or 1
+    block_cache = BlockCache.load(block_cache_path) if args.block_cache else None
+    set_block_cache(block_cache)
+    site_index = None
+    if args.listings:
+        site_index = SiteIndex.load(site_index_path, max(1, args.per_page))
+    profile = BuildProfile() if args.timings or args.profile else None
+    set_build_profile(profile)
+    diagnostics = [] if args.lenient else None
+    minify_stats = MinifyStats() if args.minify else None
+    set_minify_stats(minify_stats)
+    assets = AssetIndex.load(asset_index_path) if args.fingerprint else None
+
+    try:
+        try:
+            build_profiled(args, jobs, profile, link_index, site_index, diagnostics, assets)
+        except PageErrors as e:
+            if not args.watch:
+                raise
+            # The watcher rebuilds the failed pages once they are fixed.
+            print_page_errors(e)
+        if diagnostics:
+            print_diagnostics(diagnostics)
+        if minify_stats is not None:
+            print_minify_stats(minify_stats)
+        if args.check_links:
+            broken = link_index.broken_links(dir_path_public)
+            for key, target in broken:
+                print(f" ! {key}: broken link {target}")
+            print(f"{len(broken)} broken link(s) in {len(link_index.pages)} pages")
+            if broken:
+                sys.exit(1)
+        if args.watch:
+            set_build_profile(None)
+            watcher = Watcher(
+                dir_path_content,
+                dir_path_static,
+                template_path,
+                dir_path_public,
+                Manifest.load(manifest_path),
+                copy_workers=args.copy_workers,
+                link_index=link_index,
+                site_index=site_index,
+                base_url=args.base_url,
+                lenient=args.lenient,
+                assets=assets,
+            )
+            watcher.run()
+    except KeyboardInterrupt:
+        print("Stopped.")
+    except PageErrors as e:
+        print_page_errors(e)
+        sys.exit(1)
+    finally:
+        link_index.save()
+        if assets is not None:
+            assets.save()
+        if block_cache is not None:
+            block_cache.save()
+            print(f"Block cache: {block_cache.hits} hits, {block_cache.misses} misses")
+
+
+def print_page_errors(e):
+    print(f"Build failed: {e}")
+    for from_path, error in e.errors:
+        print(f" ! {from_path}: {error}")
+
+
+def print_diagnostics(diagnostics):
+    for from_path, line, column, message in diagnostics:
+        print(f" ? {from_path}:{line}:{column}: {message}")
+    pages = len({from_path for from_path, *_ in diagnostics})
+    print(f"{len(diagnostics)} markdown problem(s) in {pages} page(s), rendered literally")
+
+
+def print_minify_stats(stats):
+    for page, saved in sorted(stats.pages.items()):
+        print(f" - {page}: {saved} bytes saved")
+    print(f"Minified {len(stats.pages)} page(s), {stats.total()} bytes saved")
+
+
+def build(args, jobs, link_index=None, site_index=None, diagnostics=None, assets=None):
+    if args.incremental or args.watch:
+        build_incremental(jobs, args.copy_workers, args.link_static, link_index, diagnostics, assets)
+    else:
+        if site_index is not None:
+            # public/ is recreated, so every listing is written again.
+            site_index = SiteIndex(site_index.path, per_page=site_index.per_page)
+        build_full(jobs, args.copy_workers, link_index, diagnostics, assets)
+    if site_index is not None:
+        with stage("listings"):
+            generate_listings(site_index, args.base_url)
+    if args.precompress:
+        with stage("precompress"):
+            precompress(args.copy_workers)
+    else:
+        index = CompressIndex.load(compress_index_path)
+        removed = remove_stale_siblings(dir_path_public, index)
+        if removed:
+            index.save()
+            print(f"{removed} stale compressed file(s) removed")
+
+
+def build_profiled(args, jobs, profile, link_index=None, site_index=None, diagnostics=None, assets=None):
+    if profile is None:
+        build(args, jobs, link_index, site_index, diagnostics, assets)
+        return
+
+    try:
+        if args.profile == "cprofile":
+            # Only the main process is profiled; use --jobs 1 to see rendering.
+            profiler = cProfile.Profile()
+            profiler.runcall(build, args, jobs, link_index, site_index, diagnostics, assets)
+            os.makedirs(dir_path_cache, exist_ok=True)
+            profiler.dump_stats(cprofile_path)
+            pstats.Stats(profiler).sort_stats("cumulative").print_stats(25)
+            print(f"cProfile stats written to {cprofile_path}")
+        elif args.profile == "tracemalloc":
+            tracemalloc.start()
+            try:
+                build(args, jobs, link_index, site_index, diagnostics, assets)
+                snapshot = tracemalloc.take_snapshot()
+            finally:
+                tracemalloc.stop()
+            print("Top allocations:")
+            for stat in snapshot.statistics("lineno")[:25]:
+                print(f" {stat}")
+        else:
+            build(args, jobs, link_index, site_index, diagnostics, assets)
+    finally:
+        profile.save(timings_path)
+        profile.print_summary(args.top)
+        print(f"Stage timings written to {timings_path}")
+
+
+def build_full(jobs=1, copy_workers=8, link_index=None, diagnostics=None, assets=None):
+    # The manifest is rebuilt from what this build writes, so a later
+    # incremental build doesn't trust records of the old public/.
+    manifest = Manifest(manifest_path)
     print("Deleting public directory...")
     if os.path.exists(dir_path_public):
         shutil.rmtree(dir_path_public)
 
     print("Copying static files to public directory...")
-    copy_files_recursive(dir_path_static, dir_path_public)
+    with stage("static copy"):
+        sync_files(dir_path_static, dir_path_public, manifest, workers=copy_workers, assets=assets)
+    if assets is not None:
+        publish_assets(assets)
 
     print("Generating page...")
-    generate_pages_recursive(
-        f"{project_dir}/content",
-        f"{project_dir}/template.html",
-        f"{project_dir}/public"
+    try:
+        generate_pages_recursive(
+            dir_path_content, template_path, dir_path_public, jobs, link_index, diagnostics, manifest
+        )
+    finally:
+        manifest.save()
+
+
+def build_incremental(jobs=1, copy_workers=8, use_links=False, link_index=None, diagnostics=None, assets=None):
+    manifest = Manifest.load(manifest_path)
+
+    print("Syncing static files to public directory...")
+    with stage("static copy"):
+        stats = sync_files(
+            dir_path_static, dir_path_public, manifest, use_links, copy_workers, assets=assets
+        )
+    print(
+        f"{stats.copied_bytes} bytes copied ({stats.copied_files} files), "
+        f"{stats.skipped_bytes} bytes skipped ({stats.skipped_files} files), "
+        f"{stats.removed_files} stale files removed"
+    )
+    if assets is not None:
+        publish_assets(assets)
+    elif os.path.exists(asset_manifest_path):
+        os.remove(asset_manifest_path)
+
+    print("Generating changed pages...")
+    try:
+        generated = generate_pages_incremental(
+            dir_path_content, template_path, dir_path_public, manifest, jobs, link_index, diagnostics
+        )
+    finally:
+        manifest.save()
+    print(f"{len(generated)} of {len(manifest.pages)} pages re-rendered")
+
+
+def publish_assets(assets):
+    # Pages are rendered against the map, so it is set before any are.
+    set_asset_map(assets.asset_map())
+    assets.write_manifest(asset_manifest_path)
+    print(
+        f"Fingerprinted {len(assets.files)} asset(s), {assets.hashed} hashed, "
+        f"manifest written to {os.path.relpath(asset_manifest_path, project_dir)}"
+    )
+
+
+def generate_listings(site_index, base_url=""):
+    print("Generating section listings and sitemap...")
+    site_index.refresh(dir_path_content, dir_path_public, template_path)
+    written = site_index.write_listings(template_path, dir_path_public, base_url)
+    site_index.save()
+    print(f"{len(written)} listing page(s) written")
+
+
+def precompress(workers=8):
+    encoders = available_encoders()
+    print(f"Precompressing public directory ({', '.join(encoders)})...")
+    index = CompressIndex.load(compress_index_path)
+    stats = compress_files(dir_path_public, workers=workers, encoders=encoders, index=index)
+    index.save()
+    print(
+        f"{stats.compressed_files} files compressed "
+        f"({stats.input_bytes} -> {stats.output_bytes} bytes), "
+        f"{stats.skipped_files} skipped (small or up to date), {stats.removed_files} stale removed"
     )
 
 
@@ -0,0 +1,71 @@
+import hashlib
+import json
+import os
+
+
+MANIFEST_VERSION = 1
+
+
+def hash_file(path) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class Manifest():
+
+    def __init__(self, path, pages=None, assets=None) -> None:
+        self.path = path
+        self.pages = pages if pages is not None else {}
+        self.assets = assets if assets is not None else {}
+
+    def __repr__(self) -> str:
+        return f"Manifest({self.path}, pages: {len(self.pages)}, assets: {len(self.assets)})"
+
+    @classmethod
+    def load(cls, path):
+        if not os.path.exists(path):
+            return cls(path)
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return cls(path)
+        if data.get("version") != MANIFEST_VERSION:
+            return cls(path)
+        return cls(path, data.get("pages", {}), data.get("assets", {}))
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        data = {
+            "version": MANIFEST_VERSION,
+            "pages": self.pages,
+            "assets": self.assets,
+        }
+        tmp_path = f"{self.path}.tmp"
+        # Compact, so json.dumps can use the C encoder: this is written
+        # after every watch rebuild.
+        text = json.dumps(data, separators=(",", ":"), sort_keys=True)
+        with open(tmp_path, 'w') as f:
+            f.write(text)
+        os.replace(tmp_path, self.path)
+
+    def page_is_fresh(self, key, stat, template_hash) -> bool:
+        entry = self.pages.get(key)
+        return (
+            entry is not None
+            and entry["template"] == template_hash
+            and entry["mtime"] == stat.st_mtime_ns
+            and entry["size"] == stat.st_size
+        )
+
+    def record_page(self, key, stat, content_hash, template_hash, output) -> None:
+        self.pages[key] = {
+            "hash": content_hash,
+            "mtime": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "template": template_hash,
+            "output": output,
+        }
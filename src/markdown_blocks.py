@@ -1,8 +1,23 @@
+import hashlib
+import json
+import os
 import re
-
-from inline_markdown import text_to_textnodes
-from textnode import text_node_to_html_node
-from htmlnode import ParentNode
+from collections import OrderedDict
+from html import unescape
+
+from assets import get_asset_map, source_url
+from inline_markdown import text_to_textnodes, text_to_textnodes_lenient
+from textnode import text_node_to_html_node, text_type_code
+from profiling import get_build_profile, stage
+from htmlnode import (
+    EscapedNode,
+    HTMLNode,
+    ParentNode,
+    RawNode,
+    collapse_whitespace,
+    get_minify_stats,
+    has_collapsible_whitespace,
+)
 
 
 block_type_paragraph = "paragraph"
@@ -12,35 +27,74 @@ block_type_quote = "quote"
 block_type_unordered_list = "unordered_list"
 block_type_ordered_list = "ordered_list"
 
+# Bump whenever block or inline rendering changes so cached HTML is discarded.
+PARSER_VERSION = 5
+
+block_cache = None
+# None: invalid inline markdown raises. A list: the block is rendered
+# again with unpaired delimiters as literal text, and (block, line,
+# column, message) is appended for each of them.
+block_diagnostics = None
+# (text, offset, message) from the block being recovered.
+inline_problems = None
+
 
 def markdown_to_blocks(markdown) -> list:
-    blocks = markdown.split("\n\n")
-    filtered_blocks = []
-    for block in blocks:
-        if block == "":
+    return list(iter_markdown_blocks(markdown.split("\n")))
+
+
+def iter_markdown_blocks(lines):
+    # Blocks are separated by empty lines, except inside ``` fences.
+    # lines can be any iterable of lines, such as an open file.
+    block_lines = []
+    in_fence = False
+    for line in lines:
+        line = line.rstrip("\n")
+        if line == "" and not in_fence:
+            if block_lines:
+                block = "\n".join(block_lines).strip()
+                block_lines = []
+                if block:
+                    yield block
             continue
-        filtered_blocks.append(block.strip())
-    return filtered_blocks
+        block_lines.append(line)
+        stripped = line.strip()
+        if stripped.startswith("```"):
+            if in_fence:
+                in_fence = False
+            elif len(stripped) < 6 or not stripped.endswith("```"):
+                in_fence = True
+    if block_lines:
+        block = "\n".join(block_lines).strip()
+        if block:
+            yield block
+
+
+heading_pattern = re.compile(r"^(#{1,6})\s+(.+)")
+quote_marker_pattern = re.compile(r"(?:[ \t]*> ?)*")
+list_item_pattern = re.compile(r"([ \t]*)([*-]|\d+\.) (.*)")
 
 
 def block_to_block_type(block) -> str:
-    if is_heading_block(block):
-        return block_type_heading
-    if is_code_block(block):
-        return block_type_code
-    if is_quote_block(block):
-        return block_type_quote
-    if is_unordered_list_block(block):
-        return block_type_unordered_list
-    if is_ordered_list_block(block):
-        return block_type_ordered_list
+    first = block[:1]
+    if first == "#":
+        return block_type_heading if is_heading_block(block) else block_type_paragraph
+    if first == "`":
+        return block_type_code if is_code_block(block) else block_type_paragraph
+    if first.isspace():
+        # Quotes and lists are matched on stripped lines.
+        first = block.lstrip()[:1]
+    if first == ">":
+        return block_type_quote if is_quote_block(block) else block_type_paragraph
+    if first == "*" or first == "-":
+        return block_type_unordered_list if is_unordered_list_block(block) else block_type_paragraph
+    if first == "1":
+        return block_type_ordered_list if is_ordered_list_block(block) else block_type_paragraph
     return block_type_paragraph
 
 
 def is_heading_block(text) -> bool:
-    pattern = r"^(#{1,6})\s+(.+)"
-    match = re.match(pattern, text)
-    return match is not None
+    return heading_pattern.match(text) is not None
 
 
 def is_code_block(text) -> bool:
@@ -48,32 +102,61 @@ def is_code_block(text) -> bool:
 
 
 def is_quote_block(text) -> bool:
-    pattern = r"^>.*"
-    return all(re.match(pattern, line.strip()) for line in text.split("\n"))
+    for line in text.split("\n"):
+        if not line.strip().startswith(">"):
+            return False
+    return True
 
 
 def is_unordered_list_block(text) -> bool:
-    lines = text.split("\n")
-    pattern_star = r"^\* .+"
-    pattern_dash = r"^- .+"
-    
-    all_star = all(re.match(pattern_star, line.strip()) for line in lines)
-    all_dash = all(re.match(pattern_dash, line.strip()) for line in lines)
-    
-    return all_star or all_dash
+    marker = text.lstrip()[:1]
+    if marker != "*" and marker != "-":
+        return False
+    return is_list_block(text, ordered=False)
 
 
 def is_ordered_list_block(text) -> bool:
-    lines = text.split("\n")
-    for i, line in enumerate(lines, start=1):
-        pattern = r"^" + str(i) + r"\. .+"
-        if not re.match(pattern, line.strip()):
+    return is_list_block(text, ordered=True)
+
+
+def is_list_block(text, ordered) -> bool:
+    # Top-level items must all be of the block's kind, numbered 1, 2, ...
+    # when ordered. Indented lines are nested items of either kind.
+    marker = None
+    number = 0
+    for line in text.split("\n"):
+        match = list_item_pattern.match(line)
+        if match is None or not match.group(3).strip():
+            return False
+        if match.group(1):
+            continue
+        if ordered:
+            number += 1
+            if match.group(2) != f"{number}.":
+                return False
+        elif marker is None:
+            marker = match.group(2)
+        elif match.group(2) != marker:
             return False
     return True
 
 
-def text_to_children(text) -> list:
-    text_nodes = text_to_textnodes(text.strip())
+def text_to_children(text, keep_whitespace=False) -> list:
+    text = text.strip()
+    try:
+        text_nodes = text_to_textnodes(text)
+    except ValueError:
+        if inline_problems is None:
+            raise
+        problems = []
+        text_nodes = text_to_textnodes_lenient(text, problems)
+        inline_problems.extend((text, offset, message) for offset, message in problems)
+    if not keep_whitespace and get_minify_stats() is not None and has_collapsible_whitespace(text):
+        # Minifying is done here, once per block of text, rather than for
+        # every node while serializing.
+        for text_node in text_nodes:
+            if text_node.text_type != text_type_code:
+                text_node.text = collapse_whitespace(text_node.text)
     children = []
     for text_node in text_nodes:
         html_node = text_node_to_html_node(text_node)
@@ -105,34 +188,89 @@ def heading_to_html_node(block) -> ParentNode:
 
 def code_to_html_node(block) -> ParentNode:
     text = block[4:-3]
-    children = text_to_children(text)
+    children = text_to_children(text, keep_whitespace=True)
     code = ParentNode("code", children)
     return ParentNode("pre", [code])
 
 
+def split_quote_markers(line) -> tuple:
+    # "> > text" is depth 2. One space after each ">" belongs to the
+    # marker; any further indentation belongs to the text.
+    markers = quote_marker_pattern.match(line).group()
+    return markers.count(">"), line[len(markers):].rstrip()
+
+
 def quote_to_html_node(block) -> ParentNode:
-    text = '\n'.join(line.lstrip("> ").strip() for line in block.split("\n"))
-    return markdown_to_html_node(text, "blockquote")
+    # One pass over the lines: a stack holds the open blockquotes, and each
+    # run of lines at one depth is parsed as ordinary blocks, so nesting
+    # never causes the text to be split or classified again.
+    stack = [ParentNode("blockquote", [])]
+    lines = []
+    in_fence = False
+
+    def flush():
+        inner = "\n".join(lines).strip()
+        lines.clear()
+        if inner:
+            stack[-1].children.append(block_to_html_node(inner, block_to_block_type(inner)))
+
+    for line in block.split("\n"):
+        depth, text = split_quote_markers(line)
+        if depth != len(stack):
+            flush()
+            in_fence = False
+            del stack[max(depth, 1):]
+            while len(stack) < depth:
+                quote = ParentNode("blockquote", [])
+                stack[-1].children.append(quote)
+                stack.append(quote)
+        if text == "" and not in_fence:
+            flush()
+            continue
+        if text.lstrip().startswith("```"):
+            stripped = text.strip()
+            if in_fence:
+                in_fence = False
+            elif len(stripped) < 6 or not stripped.endswith("```"):
+                in_fence = True
+        lines.append(text)
+    flush()
+    return stack[0]
+
+
+def list_to_html_node(block) -> ParentNode:
+    # One pass: the stack holds (indent, list) for every list still open,
+    # and a more indented item opens a list inside the previous item.
+    stack = []
+    for line in block.split("\n"):
+        match = list_item_pattern.match(line)
+        indent = len(match.group(1).expandtabs(4))
+        tag = "ul" if match.group(2) in ("*", "-") else "ol"
+        item = ParentNode("li", text_to_children(match.group(3)))
+
+        while len(stack) > 1 and indent < stack[-1][0]:
+            stack.pop()
+        if not stack:
+            stack.append((indent, ParentNode(tag, [])))
+        elif indent > stack[-1][0]:
+            nested = ParentNode(tag, [])
+            stack[-1][1].children[-1].children.append(nested)
+            stack.append((indent, nested))
+        elif stack[-1][1].tag != tag and len(stack) > 1:
+            # A different kind of list at the same depth starts a new list.
+            sibling = ParentNode(tag, [])
+            stack[-2][1].children[-1].children.append(sibling)
+            stack[-1] = (indent, sibling)
+        stack[-1][1].children.append(item)
+    return stack[0][1]
 
 
 def unordered_list_to_html_node(block) -> ParentNode:
-    list_items = block.split("\n")
-    html_items = []
-    for item in list_items:
-        text = item[2:]
-        children = text_to_children(text)
-        html_items.append(ParentNode("li", children))
-    return ParentNode("ul", html_items)
+    return list_to_html_node(block)
 
 
 def ordered_list_to_html_node(block) -> ParentNode:
-    list_items = block.split("\n")
-    html_items = []
-    for item in list_items:
-        text = item[3:]
-        children = text_to_children(text)
-        html_items.append(ParentNode("li", children))
-    return ParentNode("ol", html_items)
+    return list_to_html_node(block)
 
 
 def block_to_html_node(block, block_type) -> ParentNode:
@@ -150,11 +288,251 @@ def block_to_html_node(block, block_type) -> ParentNode:
     raise ValueError(f"Invalid block type: {block_type}")
 
 
-def markdown_to_html_node(markdown, tag) -> ParentNode:
+def markdown_to_html_node(markdown, tag, links=None) -> ParentNode:
     child_elements = []
     blocks = markdown_to_blocks(markdown)
     for block in blocks:
-        block_type = block_to_block_type(block)
-        html_node = block_to_html_node(block, block_type)
-        child_elements.append(html_node)
+        child_elements.append(block_to_node(block, links))
     return ParentNode(tag, child_elements)
+
+
+def markdown_lines_to_html_node(lines, tag, links=None) -> ParentNode:
+    # The children are produced lazily while the node is serialized, so
+    # only one block is held at a time. The node can be written only once.
+    return ParentNode(tag, iter_block_nodes(iter_markdown_blocks(lines), links))
+
+
+def iter_block_nodes(blocks, links=None):
+    profiling = get_build_profile() is not None
+    while True:
+        with stage("block split"):
+            block = next(blocks, None)
+        if block is None:
+            return
+        node = block_to_node(block, links)
+        if profiling:
+            # Serialized here, so that it is timed apart from the template
+            # fill that writes the node out.
+            with stage("serialize"):
+                node = RawNode(node.to_html())
+        yield node
+
+
+def recover_block(block, block_type) -> ParentNode:
+    # Only called once the strict render of block has failed.
+    global inline_problems
+    inline_problems = []
+    try:
+        node = block_to_html_node(block, block_type)
+        problems = inline_problems
+    finally:
+        inline_problems = None
+    cursor = 0
+    for text, offset, message in problems:
+        line, column, cursor = locate_in_block(block, text, offset, cursor)
+        block_diagnostics.append((block, line, column, message))
+    return node
+
+
+def locate_in_block(block, text, offset, cursor) -> tuple:
+    # text was taken from block with its lines joined or quote markers
+    # removed, so the delimiter is found again by searching for the word
+    # it starts, after the previous problem. Returns 1-based (line,
+    # column) and the new cursor.
+    token = text[offset:].split(None, 1)[0]
+    position = block.find(token, cursor)
+    if position == -1:
+        position = block.find(token)
+    if position == -1:
+        position = cursor
+    line = block.count("\n", 0, position) + 1
+    column = position - (block.rfind("\n", 0, position) + 1) + 1
+    return line, column, position + len(token)
+
+
+def block_to_node(block, links=None):
+    if block_cache is None:
+        with stage("classify"):
+            block_type = block_to_block_type(block)
+        with stage("inline parse"):
+            try:
+                node = block_to_html_node(block, block_type)
+            except ValueError:
+                if block_diagnostics is None:
+                    raise
+                node = recover_block(block, block_type)
+            if links is not None:
+                collect_links(node, links)
+        return node
+    return block_to_cached_html_node(block, block_cache, links)
+
+
+def block_to_cached_html_node(block, cache, links=None) -> HTMLNode:
+    with stage("cache lookup"):
+        key = cache.key(block)
+        entry = cache.get(key)
+    if entry is None:
+        stats = get_minify_stats()
+        saved = stats.saved if stats is not None else 0
+        with stage("classify"):
+            block_type = block_to_block_type(block)
+        with stage("inline parse"):
+            try:
+                node = block_to_html_node(block, block_type)
+            except ValueError:
+                if block_diagnostics is None:
+                    raise
+                # Not cached, so the next build reports the problems again.
+                node = recover_block(block, block_type)
+                if links is not None:
+                    collect_links(node, links)
+                return node
+            block_links = []
+            collect_links(node, block_links)
+        # The bytes saved by minifying are kept so that hits count them too.
+        saved = stats.saved - saved if stats is not None else 0
+        with stage("serialize"):
+            entry = (node.to_html(), tuple(block_links), saved)
+        cache.put(key, *entry)
+    elif entry[2]:
+        get_minify_stats().saved += entry[2]
+    if links is not None:
+        links.extend(entry[1])
+    return RawNode(entry[0])
+
+
+def collect_links(node, links) -> None:
+    # Appends (kind, url) for every link and image under node, in document
+    # order. Iterative, since nested quotes and lists can be deep.
+    # Fingerprinted assets are recorded by the URL in the markdown.
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if node.tag == "a" and node.props and "href" in node.props:
+            links.append(("link", source_url(attribute_value(node, "href"))))
+        elif node.tag == "img" and node.props and "src" in node.props:
+            links.append(("image", source_url(attribute_value(node, "src"))))
+        if isinstance(node, ParentNode):
+            stack.extend(reversed(node.children))
+
+
+def attribute_value(node, attribute) -> str:
+    value = node.props[attribute]
+    if isinstance(node, EscapedNode):
+        return unescape(value)
+    return value
+
+
+def set_block_cache(cache) -> None:
+    global block_cache
+    block_cache = cache
+
+
+def get_block_cache():
+    return block_cache
+
+
+def set_block_diagnostics(diagnostics) -> None:
+    global block_diagnostics
+    block_diagnostics = diagnostics
+
+
+def get_block_diagnostics():
+    return block_diagnostics
+
+
+class BlockCache():
+
+    def __init__(self, path=None, max_bytes=64 * 1024 * 1024) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.updates = {}
+        # Whether entries were stored or evicted since the last load or
+        # save. Hits only reorder entries, which isn't worth a rewrite.
+        self.dirty = False
+
+    def __repr__(self) -> str:
+        return f"BlockCache({self.path}, entries: {len(self.entries)}, bytes: {self.size})"
+
+    @staticmethod
+    def key(block) -> str:
+        # Minified and plain HTML for a block are cached separately, and
+        # so is HTML linking to a different set of fingerprinted assets.
+        person = b"minified" if get_minify_stats() is not None else b""
+        assets = get_asset_map()
+        salt = assets.digest if assets is not None else b""
+        return hashlib.blake2b(block.encode(), digest_size=16, person=person, salt=salt).hexdigest()
+
+    @classmethod
+    def load(cls, path, max_bytes=64 * 1024 * 1024):
+        cache = cls(path, max_bytes)
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return cache
+        if data.get("version") != PARSER_VERSION:
+            return cache
+        # Entries are stored least recently used first.
+        for key, (html, links, saved) in data.get("entries", []):
+            cache.store(key, html, tuple(tuple(link) for link in links), saved)
+        cache.dirty = False
+        return cache
+
+    def save(self) -> None:
+        if not self.dirty:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        data = {"version": PARSER_VERSION, "entries": list(self.entries.items())}
+        tmp_path = f"{self.path}.tmp"
+        # json.dumps uses the C encoder; json.dump writes through the
+        # much slower pure Python one.
+        text = json.dumps(data, separators=(",", ":"))
+        with open(tmp_path, 'w') as f:
+            f.write(text)
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+
+    def get(self, key):
+        # Returns (html, links, saved) or None.
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return entry
+
+    def put(self, key, html, links=(), saved=0) -> None:
+        self.store(key, html, links, saved)
+        self.updates[key] = (html, links, saved)
+
+    def store(self, key, html, links=(), saved=0) -> None:
+        old = self.entries.pop(key, None)
+        if old is not None:
+            self.size -= len(old[0])
+        self.entries[key] = (html, links, saved)
+        self.size += len(html)
+        self.dirty = True
+        while self.size > self.max_bytes and self.entries:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= len(evicted[0])
+
+    def take_updates(self) -> tuple:
+        # Hands the work done in a worker process back to the parent's cache.
+        updates = (self.updates, self.hits, self.misses)
+        self.updates = {}
+        self.hits = 0
+        self.misses = 0
+        return updates
+
+    def merge(self, updates) -> None:
+        entries, hits, misses = updates
+        for key, (html, links, saved) in entries.items():
+            self.put(key, html, links, saved)
+        self.hits += hits
+        self.misses += misses
@@ -0,0 +1,178 @@
+import json
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+
+stage_names = (
+    "static copy",
+    "read",
+    "block split",
+    "cache lookup",
+    "classify",
+    "inline parse",
+    "serialize",
+    "template",
+    "write",
+    "listings",
+    "precompress",
+)
+
+build_profile = None
+null_stage = nullcontext()
+
+
+class BuildProfile():
+
+    def __init__(self) -> None:
+        # stage -> [seconds, net blocks, peak bytes, calls]
+        self.stages = {}
+        # page -> {stage: [seconds, net blocks, peak bytes]}
+        self.pages = {}
+        # The page being rendered, for stages that don't name one.
+        self.page = None
+        # [seconds, net blocks] spent in stages nested in each
+        # running stage.
+        self.running = []
+
+    def __repr__(self) -> str:
+        return f"BuildProfile(stages: {len(self.stages)}, pages: {len(self.pages)})"
+
+    @contextmanager
+    def stage(self, name, page=None):
+        # Net blocks is the change in live memory blocks, not a count of
+        # allocations: a stage that frees more than it allocates is
+        # negative. The peak is only known while tracemalloc is tracing. A page's stages nest as
+        # it streams, so time and allocations in a nested stage count only
+        # towards that one; peaks are not split.
+        if page is None:
+            page = self.page
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            start_bytes = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        nested = [0.0, 0]
+        self.running.append(nested)
+        start_blocks = sys.getallocatedblocks()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            blocks = sys.getallocatedblocks() - start_blocks
+            peak = tracemalloc.get_traced_memory()[1] - start_bytes if tracing else 0
+            self.running.pop()
+            if self.running:
+                self.running[-1][0] += seconds
+                self.running[-1][1] += blocks
+            self.record(name, page, seconds - nested[0], blocks - nested[1], peak)
+
+    def record(self, name, page, seconds, blocks=0, peak=0) -> None:
+        total = self.stages.setdefault(name, [0.0, 0, 0, 0])
+        total[0] += seconds
+        total[1] += blocks
+        total[2] = max(total[2], peak)
+        total[3] += 1
+        if page is None:
+            return
+        entry = self.pages.setdefault(page, {}).setdefault(name, [0.0, 0, 0])
+        entry[0] += seconds
+        entry[1] += blocks
+        entry[2] = max(entry[2], peak)
+
+    def take_updates(self) -> dict:
+        # Worker processes hand their per-page timings back to the parent.
+        updates, self.pages = self.pages, {}
+        return updates
+
+    def merge(self, updates) -> None:
+        for page, stages in updates.items():
+            for name, (seconds, blocks, peak) in stages.items():
+                self.record(name, page, seconds, blocks, peak)
+
+    def page_seconds(self, page) -> float:
+        return sum(entry[0] for entry in self.pages[page].values())
+
+    def slowest_pages(self, n=10) -> list:
+        return sorted(self.pages, key=self.page_seconds, reverse=True)[:n]
+
+    def report(self) -> dict:
+        def stage_entry(values):
+            entry = {"seconds": values[0], "net_blocks": values[1]}
+            if values[2]:
+                entry["peak_bytes"] = values[2]
+            return entry
+
+        return {
+            "total_seconds": sum(values[0] for values in self.stages.values()),
+            "stages": {
+                name: dict(stage_entry(values), calls=values[3])
+                for name, values in sorted(self.stages.items(), key=stage_order)
+            },
+            "pages": {
+                page: {
+                    "seconds": self.page_seconds(page),
+                    "stages": {
+                        name: stage_entry(values)
+                        for name, values in sorted(stages.items(), key=stage_order)
+                    },
+                }
+                for page, stages in sorted(self.pages.items())
+            },
+        }
+
+    def save(self, path) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.report(), f, indent=1)
+        os.replace(tmp_path, path)
+
+    def print_summary(self, top=10) -> None:
+        total = sum(values[0] for values in self.stages.values()) or 1.0
+        print("Stage           seconds      %     net blocks")
+        for name, values in sorted(self.stages.items(), key=stage_order):
+            print(f"{name:<14} {values[0]:>8.3f} {values[0] / total * 100:>6.1f} {values[1]:>14}")
+        if not self.pages or top <= 0:
+            return
+        print(f"Slowest {min(top, len(self.pages))} of {len(self.pages)} pages:")
+        for page in self.slowest_pages(top):
+            stages = self.pages[page]
+            worst = max(stages, key=lambda name: stages[name][0])
+            print(f" {self.page_seconds(page) * 1000:>9.2f} ms  {page} (mostly {worst})")
+
+
+def stage_order(item):
+    name = item[0]
+    return (stage_names.index(name) if name in stage_names else len(stage_names), name)
+
+
+def set_build_profile(profile) -> None:
+    global build_profile
+    build_profile = profile
+
+
+def get_build_profile():
+    return build_profile
+
+
+def stage(name, page=None):
+    # Cheap when not profiling, so it can wrap steps run for every block.
+    if build_profile is None:
+        return null_stage
+    return build_profile.stage(name, page)
+
+
+@contextmanager
+def profile_page(page):
+    # Stages inside are recorded against page.
+    if build_profile is None:
+        yield
+        return
+    build_profile.page = page
+    try:
+        yield
+    finally:
+        build_profile.page = None
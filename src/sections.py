@@ -0,0 +1,386 @@
+import bisect
+import datetime
+import json
+import os
+import re
+from xml.sax.saxutils import escape
+
+from copystatic import remove_file
+from frontmatter import read_page_metadata
+from gencontent import find_pages, page_dest_path, page_url
+from htmlnode import LeafNode, ParentNode
+from template import hash_template, load_template
+
+
+SITE_INDEX_VERSION = 2
+
+iso_date_pattern = re.compile(r"\d{4}-\d{2}-\d{2}")
+
+
+class SiteIndex():
+
+    def __init__(self, path=None, pages=None, listings=None, per_page=20, template=None) -> None:
+        self.path = path
+        self.per_page = per_page
+        self.template = template
+        # source key -> {"url", "title", "date", "lastmod", "mtime", "size"}
+        self.pages = pages if pages is not None else {}
+        # section -> number of listing pages written for it
+        self.listings = listings if listings is not None else {}
+        # section -> entries sorted oldest first: (date, title, url, key)
+        self.sections = {}
+        # section -> first listing page (0-based, oldest first) that must
+        # be rewritten
+        self.dirty = {}
+        self.sitemap_dirty = False
+
+        for key, entry in self.pages.items():
+            self.add_section(section_of(key))
+            if not is_index(key):
+                self.sections[section_of(key)].append(sort_key(key, entry))
+        for entries in self.sections.values():
+            entries.sort()
+        self.dirty = {}
+        self.sitemap_dirty = False
+
+    def __repr__(self) -> str:
+        return f"SiteIndex({self.path}, pages: {len(self.pages)}, sections: {len(self.sections)})"
+
+    @classmethod
+    def load(cls, path, per_page=20):
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return cls(path, per_page=per_page)
+        if data.get("version") != SITE_INDEX_VERSION:
+            return cls(path, per_page=per_page)
+        index = cls(path, data.get("pages", {}), data.get("listings", {}), data.get("per_page"), data.get("template"))
+        if index.per_page != per_page:
+            index.per_page = per_page
+            index.mark_all_dirty()
+        return index
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        data = {
+            "version": SITE_INDEX_VERSION,
+            "per_page": self.per_page,
+            "template": self.template,
+            "pages": self.pages,
+            "listings": self.listings,
+        }
+        tmp_path = f"{self.path}.tmp"
+        text = json.dumps(data, separators=(",", ":"), sort_keys=True)
+        with open(tmp_path, 'w') as f:
+            f.write(text)
+        os.replace(tmp_path, self.path)
+
+    def add_section(self, section) -> None:
+        # Sections exist for every directory above a page.
+        while section not in self.sections:
+            self.sections[section] = []
+            self.mark_dirty(section, 0)
+            if section == "":
+                return
+            self.mark_dirty(parent_of(section), 0)
+            section = parent_of(section)
+
+    def mark_dirty(self, section, page) -> None:
+        self.dirty[section] = min(page, self.dirty.get(section, page))
+        self.sitemap_dirty = True
+
+    def mark_all_dirty(self) -> None:
+        for section in self.sections:
+            self.mark_dirty(section, 0)
+        self.sitemap_dirty = True
+
+    def set_page(self, key, entry) -> None:
+        old = self.pages.get(key)
+        self.pages[key] = entry
+        if old is not None and sort_key(key, old) == sort_key(key, entry):
+            if old["lastmod"] != entry["lastmod"]:
+                self.sitemap_dirty = True
+            return
+
+        section = section_of(key)
+        if old is not None:
+            self.unlist(key, old)
+        self.add_section(section)
+        if is_index(key):
+            # The section's own page replaces its listing, and its title
+            # is shown in the parent's list of sections.
+            self.mark_dirty(section, 0)
+            if section != "":
+                self.mark_dirty(parent_of(section), 0)
+            return
+        entries = self.sections[section]
+        position = bisect.bisect_left(entries, sort_key(key, entry))
+        entries.insert(position, sort_key(key, entry))
+        self.mark_dirty(section, position // self.per_page)
+
+    def remove_page(self, key) -> None:
+        entry = self.pages.pop(key, None)
+        if entry is None:
+            return
+        self.unlist(key, entry)
+        section = section_of(key)
+        while (
+            section in self.sections
+            and not self.sections[section]
+            and not self.has_index(section)
+            and not any(parent_of(other) == section for other in self.sections if other != "")
+        ):
+            del self.sections[section]
+            self.mark_dirty(section, 0)
+            if section == "":
+                break
+            section = parent_of(section)
+            self.mark_dirty(section, 0)
+
+    def unlist(self, key, entry) -> None:
+        section = section_of(key)
+        if is_index(key):
+            self.mark_dirty(section, 0)
+            if section != "":
+                self.mark_dirty(parent_of(section), 0)
+            return
+        entries = self.sections[section]
+        position = bisect.bisect_left(entries, sort_key(key, entry))
+        del entries[position]
+        self.mark_dirty(section, position // self.per_page)
+
+    def has_index(self, section) -> bool:
+        return index_key(section) in self.pages
+
+    def page_count(self, section) -> int:
+        if section not in self.sections or self.has_index(section):
+            return 0
+        return max(1, -(-len(self.sections[section]) // self.per_page))
+
+    def listing_entries(self, section, page) -> list:
+        # Pages are counted from the oldest entry, so adding a new entry
+        # leaves every page but the newest as it is. Newest first on each
+        # page; only the entries on this page are touched.
+        entries = self.sections[section]
+        start = page * self.per_page
+        return [self.pages[key] for *_, key in reversed(entries[start:start + self.per_page])]
+
+    def subsections(self, section) -> list:
+        return sorted(
+            other for other in self.sections
+            if other != "" and other != section and parent_of(other) == section
+        )
+
+    def section_title(self, section) -> str:
+        if self.has_index(section):
+            return self.pages[index_key(section)]["title"]
+        return section.rsplit("/", 1)[-1] if section else "Index"
+
+    def refresh(self, dir_path_content, dest_dir_path, template_path, keys=None) -> None:
+        # Only headers of new or modified pages are read. With keys (source
+        # keys such as "blog/post.md"), only those pages are looked at.
+        template = hash_template(template_path)
+        if template != self.template:
+            self.template = template
+            self.mark_all_dirty()
+
+        if keys is not None:
+            for key in keys:
+                from_path = os.path.join(dir_path_content, *key.split("/"))
+                if os.path.isfile(from_path):
+                    dest_path = page_dest_path(from_path, dir_path_content, dest_dir_path)
+                    self.refresh_page(key, from_path, dest_path, dest_dir_path)
+                else:
+                    self.remove_page(key)
+            return
+
+        seen = set()
+        for from_path, dest_path in find_pages(dir_path_content, dest_dir_path):
+            key = os.path.relpath(from_path, dir_path_content).replace(os.sep, "/")
+            seen.add(key)
+            self.refresh_page(key, from_path, dest_path, dest_dir_path)
+
+        for key in sorted(set(self.pages) - seen):
+            self.remove_page(key)
+
+        for section in self.sections:
+            # Listings deleted from public/ are written again.
+            count = self.page_count(section)
+            if count and not os.path.exists(listing_path(dest_dir_path, section, count - 1, count)):
+                self.mark_dirty(section, 0)
+        if not os.path.exists(os.path.join(dest_dir_path, "sitemap.xml")):
+            self.sitemap_dirty = True
+
+    def refresh_page(self, key, from_path, dest_path, dest_dir_path) -> None:
+        stat = os.stat(from_path)
+        old = self.pages.get(key)
+        if old is not None and old["mtime"] == stat.st_mtime_ns and old["size"] == stat.st_size:
+            return
+        try:
+            metadata = read_page_metadata(from_path)
+        except ValueError:
+            # Broken front matter is reported when the page renders.
+            return
+        self.set_page(key, page_entry(metadata, stat, page_url(dest_path, dest_dir_path)))
+
+    def write_listings(self, template_path, dest_dir_path, base_url="") -> list:
+        template = load_template(template_path)
+        written = []
+        for section, first in sorted(self.dirty.items()):
+            old_count = self.listings.pop(section, 0)
+            count = self.page_count(section)
+            if count:
+                # The newest page is served at the section's URL. When the
+                # number of pages changes, the page moving to or from it and
+                # the page linking to that one are written again.
+                first = min(first, count - 1)
+                if old_count and old_count != count:
+                    first = min(first, max(0, min(count, old_count) - 2))
+                for page in range(first, count):
+                    dest_path = listing_path(dest_dir_path, section, page, count)
+                    write_listing(template, self.listing_context(section, page, count), dest_path)
+                    written.append(dest_path)
+                self.listings[section] = count
+            # Older pages that no longer exist. A hand-written index.html
+            # replaces the newest page, so it is never removed here.
+            for page in range(max(count, 1) - 1, old_count - 1):
+                remove_file(listing_path(dest_dir_path, section, page, old_count), dest_dir_path)
+            if not count and old_count and section not in self.sections:
+                remove_file(listing_path(dest_dir_path, section, old_count - 1, old_count), dest_dir_path)
+        self.dirty = {}
+
+        if self.sitemap_dirty:
+            write_sitemap(self, os.path.join(dest_dir_path, "sitemap.xml"), base_url)
+            self.sitemap_dirty = False
+        return written
+
+    def listing_context(self, section, page, count) -> dict:
+        entries = self.listing_entries(section, page)
+        children = []
+        if page == count - 1:
+            subsections = self.subsections(section)
+            if subsections:
+                children.append(ParentNode("ul", [
+                    ParentNode("li", [LeafNode("a", self.section_title(sub), {"href": section_url(sub)})])
+                    for sub in subsections
+                ], {"class": "sections"}))
+        if entries:
+            children.append(ParentNode("ul", [
+                ParentNode("li", [
+                    LeafNode("a", entry["title"], {"href": entry["url"]}),
+                    LeafNode("time", entry["date"]),
+                ])
+                for entry in entries
+            ], {"class": "pages"}))
+        links = []
+        if page < count - 1:
+            links.append(LeafNode("a", "Newer", {"href": listing_url(section, page + 1, count), "rel": "prev"}))
+        if page > 0:
+            links.append(LeafNode("a", "Older", {"href": listing_url(section, page - 1, count), "rel": "next"}))
+        if links:
+            children.append(ParentNode("nav", links))
+
+        # Nothing on an older page depends on the number of pages, so it
+        # isn't rewritten when one is added.
+        title = self.section_title(section)
+        if page < count - 1:
+            title = f"{title} (page {page + 1})"
+        return {
+            "Title": title,
+            "Content": ParentNode("div", children) if children else LeafNode("div", ""),
+            "Date": entries[0]["date"] if entries else "",
+            "Path": listing_url(section, page, count),
+        }
+
+
+def section_of(key) -> str:
+    return key.rsplit("/", 1)[0] if "/" in key else ""
+
+
+def parent_of(section) -> str:
+    return section.rsplit("/", 1)[0] if "/" in section else ""
+
+
+def is_index(key) -> bool:
+    return key.rsplit("/", 1)[-1].lower() == "index.md"
+
+
+def index_key(section) -> str:
+    return f"{section}/index.md" if section else "index.md"
+
+
+def sort_key(key, entry) -> tuple:
+    return (entry["date"], entry["title"], entry["url"], key)
+
+
+def page_entry(metadata, stat, url) -> dict:
+    modified = datetime.date.fromtimestamp(metadata["mtime"]).isoformat()
+    date = metadata.get("date") or modified
+    return {
+        "url": url,
+        "title": metadata.get("title") or url,
+        "date": date,
+        "lastmod": date[:10] if iso_date_pattern.match(date) else modified,
+        "mtime": stat.st_mtime_ns,
+        "size": stat.st_size,
+    }
+
+
+def section_url(section) -> str:
+    return f"/{section}/" if section else "/"
+
+
+def listing_url(section, page, count) -> str:
+    # The newest of count pages is the section's own URL; older pages are
+    # numbered from the oldest, so their URLs don't change as entries are
+    # added.
+    if page == count - 1:
+        return section_url(section)
+    return f"{section_url(section)}page/{page + 1}/"
+
+
+def listing_path(dest_dir_path, section, page, count) -> str:
+    parts = section.split("/") if section else []
+    if page != count - 1:
+        parts += ["page", str(page + 1)]
+    return os.path.join(dest_dir_path, *parts, "index.html")
+
+
+def write_listing(template, context, dest_path) -> None:
+    os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+    tmp_path = f"{dest_path}.tmp"
+    try:
+        with open(tmp_path, 'w') as f:
+            template.write(f.write, context)
+        os.replace(tmp_path, dest_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def write_sitemap(site_index, dest_path, base_url="") -> None:
+    urls = {entry["url"]: entry["lastmod"] for entry in site_index.pages.values()}
+    for section in site_index.sections:
+        lastmod = max(
+            (site_index.pages[key]["lastmod"] for *_, key in site_index.sections[section]),
+            default=None,
+        )
+        count = site_index.page_count(section)
+        for page in range(count):
+            urls[listing_url(section, page, count)] = lastmod
+
+    base_url = base_url.rstrip("/")
+    os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+    tmp_path = f"{dest_path}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        f.write('<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n')
+        for url, lastmod in sorted(urls.items()):
+            f.write(f"<url><loc>{escape(base_url + url)}</loc>")
+            if lastmod:
+                f.write(f"<lastmod>{lastmod}</lastmod>")
+            f.write("</url>\n")
+        f.write("</urlset>\n")
+    os.replace(tmp_path, dest_path)
@@ -0,0 +1,116 @@
+import os
+import re
+
+from assets import get_asset_map, rewrite_url
+from htmlnode import HTMLNode, escape_attribute, get_minify_stats, minify_html
+from manifest import hash_file
+
+
+placeholder_pattern = re.compile(r"\{\{\s*([A-Za-z_][\w.-]*)\s*\}\}")
+# A placeholder on its own line between tags stands for markup, so the
+# line breaks around it go like those between tags.
+template_gap_pattern = re.compile(
+    r"(?:(?<=>)|(?<=\}\}))[ \t\r\f]*\n[ \t\n\r\f]*(?=<|\{\{)"
+)
+url_attribute_pattern = re.compile(r"""(\s(?:href|src)\s*=\s*)(["'])(.*?)\2""", re.I)
+
+template_cache = {}
+
+
+class Template():
+
+    def __init__(self, literals, names, placeholders, saved=0) -> None:
+        # literals has one more entry than names: literal, name, literal, ...
+        self.literals = literals
+        self.names = names
+        self.placeholders = placeholders
+        # Names used more than once. A node can be written only once, as
+        # content is streamed from the markdown, so these are buffered.
+        self.repeated = {name for name in names if names.count(name) > 1}
+        # Bytes removed from the literals by minifying.
+        self.saved = saved
+
+    def __repr__(self) -> str:
+        return f"Template(placeholders: {self.names})"
+
+    def render(self, context) -> str:
+        parts = []
+        self.write(parts.append, context)
+        return "".join(parts)
+
+    def write(self, write, context) -> None:
+        if self.saved:
+            get_minify_stats().saved += self.saved
+        literals = self.literals
+        buffered = {}
+        write(literals[0])
+        for i, name in enumerate(self.names):
+            value = context.get(name)
+            if value is None:
+                # Unknown placeholders are left in the output untouched.
+                write(self.placeholders[i])
+            elif isinstance(value, HTMLNode):
+                if name not in self.repeated:
+                    value.write_html(write)
+                else:
+                    if name not in buffered:
+                        buffered[name] = value.to_html()
+                    write(buffered[name])
+            else:
+                # Quotes too, since a placeholder can be inside an attribute.
+                write(escape_attribute(str(value)))
+            write(literals[i + 1])
+
+
+def compile_template(text, minify=False) -> Template:
+    # Links to fingerprinted assets are rewritten once here, not in
+    # every page.
+    if get_asset_map() is not None:
+        text = url_attribute_pattern.sub(
+            lambda match: f"{match.group(1)}{match.group(2)}{rewrite_url(match.group(3))}{match.group(2)}",
+            text,
+        )
+    saved = 0
+    if minify:
+        minified = minify_html(text, template_gap_pattern)
+        saved = len(text) - len(minified)
+        text = minified
+    literals = []
+    names = []
+    placeholders = []
+    pos = 0
+    for match in placeholder_pattern.finditer(text):
+        literals.append(text[pos:match.start()])
+        names.append(match.group(1))
+        placeholders.append(match.group())
+        pos = match.end()
+    literals.append(text[pos:])
+    return Template(literals, names, placeholders, saved)
+
+
+def load_template(path) -> Template:
+    minify = get_minify_stats() is not None
+    assets = get_asset_map()
+    key = (path, minify, assets.digest if assets is not None else None)
+    mtime = os.stat(path).st_mtime_ns
+    cached = template_cache.get(key)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+
+    with open(path, 'r') as f:
+        template = compile_template(f.read(), minify)
+    template_cache[key] = (mtime, template)
+    return template
+
+
+def hash_template(path) -> str:
+    # Every page embeds the template, so settings that change how it is
+    # written out are part of its hash.
+    digest = hash_file(path)
+    if get_minify_stats() is not None:
+        digest += "-minified"
+    if get_asset_map() is not None:
+        # Pages link to fingerprinted assets, so they are rendered again
+        # when any asset's fingerprint changes.
+        digest += "-" + get_asset_map().digest.hex()
+    return digest
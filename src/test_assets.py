@@ -0,0 +1,108 @@
+import json
+import os
+import tempfile
+import unittest
+
+from assets import (
+    AssetIndex,
+    fingerprinted_path,
+    is_fingerprinted,
+    rewrite_url,
+    set_asset_map,
+    source_url,
+)
+from htmlnode import LeafNode
+from textnode import TextNode, text_node_to_html_node, text_type_image, text_type_link
+
+
+class TestFingerprintedPath(unittest.TestCase):
+
+    def test_hash_before_extension(self):
+        self.assertEqual(
+            fingerprinted_path(os.path.join("images", "a.png"), "3f2a9c1b2d4e5f"),
+            os.path.join("images", "a.3f2a9c1b2d.png"),
+        )
+
+    def test_only_assets_are_fingerprinted(self):
+        self.assertTrue(is_fingerprinted("index.css"))
+        self.assertTrue(is_fingerprinted(os.path.join("images", "A.PNG")))
+        self.assertFalse(is_fingerprinted("robots.txt"))
+        self.assertFalse(is_fingerprinted("favicon.ico"))
+
+
+class TestAssetIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = AssetIndex()
+        self.index.record("index.css", 7, 100, "aaaaaaaaaaaaaaaa")
+        self.index.record(os.path.join("images", "a.png"), 9, 200, "bbbbbbbbbbbbbbbb")
+
+    def tearDown(self):
+        set_asset_map(None)
+
+    def test_lookup_until_file_changes(self):
+        self.assertEqual(self.index.lookup("index.css", 7, 100), "aaaaaaaaaaaaaaaa")
+        self.assertIsNone(self.index.lookup("index.css", 7, 101))
+        self.assertIsNone(self.index.lookup("index.css", 8, 100))
+        self.assertIsNone(self.index.lookup("other.css", 7, 100))
+
+    def test_hashed_counts_changes_only(self):
+        self.index.record("index.css", 7, 100, "aaaaaaaaaaaaaaaa")
+        self.assertEqual(self.index.hashed, 2)
+        self.index.record("index.css", 8, 101, "cccccccccccccccc")
+        self.assertEqual(self.index.hashed, 3)
+
+    def test_retain(self):
+        self.index.retain(["index.css"])
+        self.assertEqual(set(self.index.files), {"index.css"})
+
+    def test_asset_map(self):
+        asset_map = self.index.asset_map()
+        self.assertEqual(asset_map.urls, {
+            "/index.css": "/index.aaaaaaaaaa.css",
+            "/images/a.png": "/images/a.bbbbbbbbbb.png",
+        })
+        self.assertEqual(len(asset_map.digest), 16)
+        self.index.record("index.css", 8, 101, "cccccccccccccccc")
+        self.assertNotEqual(self.index.asset_map().digest, asset_map.digest)
+
+    def test_rewrite_url(self):
+        self.assertEqual(rewrite_url("/index.css"), "/index.css")
+        set_asset_map(self.index.asset_map())
+        self.assertEqual(rewrite_url("/index.css"), "/index.aaaaaaaaaa.css")
+        self.assertEqual(rewrite_url("index.css"), "index.css")
+        self.assertEqual(rewrite_url("https://example.com/"), "https://example.com/")
+        self.assertEqual(source_url("/index.aaaaaaaaaa.css"), "/index.css")
+
+    def test_links_and_images_are_rewritten(self):
+        set_asset_map(self.index.asset_map())
+        self.assertEqual(
+            text_node_to_html_node(TextNode("a", text_type_image, "/images/a.png")),
+            LeafNode("img", "", {"src": "/images/a.bbbbbbbbbb.png", "alt": "a"}),
+        )
+        self.assertEqual(
+            text_node_to_html_node(TextNode("page", text_type_link, "/page.html")),
+            LeafNode("a", "page", {"href": "/page.html"}),
+        )
+
+    def test_save_and_load(self):
+        with tempfile.TemporaryDirectory() as root:
+            self.index.path = os.path.join(root, ".cache", "assets.json")
+            self.index.save()
+            loaded = AssetIndex.load(self.index.path)
+            self.assertEqual(loaded.files, self.index.files)
+            self.assertEqual(AssetIndex.load(os.path.join(root, "missing.json")).files, {})
+
+    def test_write_manifest(self):
+        with tempfile.TemporaryDirectory() as root:
+            path = os.path.join(root, "public", "assets.json")
+            self.index.write_manifest(path)
+            with open(path) as f:
+                self.assertEqual(json.load(f), {
+                    "index.css": "index.aaaaaaaaaa.css",
+                    "images/a.png": "images/a.bbbbbbbbbb.png",
+                })
+
+
+if __name__ == "__main__":
+    unittest.main()
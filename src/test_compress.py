@@ -0,0 +1,111 @@
+import gzip
+import os
+import tempfile
+import unittest
+
+from compress import CompressIndex, compress_files, gzip_compress, remove_stale_siblings
+from fixtures import write_file
+
+
+class TestCompressFiles(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.public = self.tmp.name
+        self.encoders = {".gz": gzip_compress}
+        self.index = CompressIndex(os.path.join(self.public, ".cache", "compress.json"))
+        write_file(os.path.join(self.public, "index.html"), "<p>hello</p>" * 200)
+        write_file(os.path.join(self.public, "blog", "post.html"), "<p>post</p>" * 200)
+        write_file(os.path.join(self.public, "tiny.css"), "body {}")
+        write_file(os.path.join(self.public, "image.png"), "x" * 4096)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def compress(self):
+        return compress_files(self.public, min_size=1024, workers=2, encoders=self.encoders, index=self.index)
+
+    def test_writes_gzip_siblings(self):
+        stats = self.compress()
+        self.assertEqual(stats.compressed_files, 2)
+        with open(os.path.join(self.public, "index.html.gz"), 'rb') as f:
+            self.assertEqual(gzip.decompress(f.read()), b"<p>hello</p>" * 200)
+        self.assertFalse(os.path.exists(os.path.join(self.public, "tiny.css.gz")))
+        self.assertFalse(os.path.exists(os.path.join(self.public, "image.png.gz")))
+
+    def test_up_to_date_siblings_are_skipped(self):
+        self.compress()
+        stats = self.compress()
+        self.assertEqual(stats.compressed_files, 0)
+
+    def test_newer_source_is_recompressed(self):
+        self.compress()
+        write_file(os.path.join(self.public, "index.html"), "<p>changed</p>" * 200, mtime=10**19)
+        stats = self.compress()
+        self.assertEqual(stats.compressed_files, 1)
+        with open(os.path.join(self.public, "index.html.gz"), 'rb') as f:
+            self.assertEqual(gzip.decompress(f.read()), b"<p>changed</p>" * 200)
+
+    def test_older_source_is_recompressed(self):
+        # Copies can keep the mtime of the file they were copied from.
+        self.compress()
+        write_file(os.path.join(self.public, "index.html"), "<p>older</p>" * 200, mtime=10**9)
+        stats = self.compress()
+        self.assertEqual(stats.compressed_files, 1)
+        with open(os.path.join(self.public, "index.html.gz"), 'rb') as f:
+            self.assertEqual(gzip.decompress(f.read()), b"<p>older</p>" * 200)
+
+    def test_missing_sibling_is_recompressed(self):
+        self.compress()
+        os.remove(os.path.join(self.public, "index.html.gz"))
+        self.assertEqual(self.compress().compressed_files, 1)
+
+    def test_index_is_saved(self):
+        self.compress()
+        self.index.save()
+        self.index = CompressIndex.load(self.index.path)
+        self.assertEqual(set(self.index.files), {"index.html.gz", os.path.join("blog", "post.html.gz")})
+        self.assertEqual(self.compress().compressed_files, 0)
+
+    def test_without_index_everything_is_compressed(self):
+        self.compress()
+        self.index = None
+        self.assertEqual(self.compress().compressed_files, 2)
+
+    def test_orphaned_siblings_are_removed(self):
+        self.compress()
+        os.remove(os.path.join(self.public, "blog", "post.html"))
+        write_file(os.path.join(self.public, "archive.tar.gz"), "not ours")
+        stats = self.compress()
+        self.assertEqual(stats.removed_files, 1)
+        self.assertFalse(os.path.exists(os.path.join(self.public, "blog", "post.html.gz")))
+        self.assertTrue(os.path.exists(os.path.join(self.public, "archive.tar.gz")))
+        self.assertEqual(list(self.index.files), ["index.html.gz"])
+
+    def test_siblings_have_the_source_mtime(self):
+        write_file(os.path.join(self.public, "index.html"), "<p>hello</p>" * 200, mtime=10**18)
+        self.compress()
+        self.assertEqual(os.stat(os.path.join(self.public, "index.html.gz")).st_mtime_ns, 10**18)
+
+    def test_stale_siblings_are_removed_without_compressing(self):
+        self.compress()
+        write_file(os.path.join(self.public, "index.html"), "<p>changed</p>" * 200, mtime=10**19)
+        os.remove(os.path.join(self.public, "blog", "post.html"))
+        write_file(os.path.join(self.public, "other.css.gz"), "left by hand")
+        write_file(os.path.join(self.public, "archive.tar.gz"), "not ours")
+        self.assertEqual(remove_stale_siblings(self.public, self.index), 3)
+        self.assertEqual(self.index.files, {})
+        self.assertTrue(os.path.exists(os.path.join(self.public, "archive.tar.gz")))
+        self.assertFalse(os.path.exists(os.path.join(self.public, "other.css.gz")))
+
+    def test_fresh_siblings_are_kept_without_compressing(self):
+        self.compress()
+        self.assertEqual(remove_stale_siblings(self.public, self.index), 0)
+        self.assertTrue(os.path.exists(os.path.join(self.public, "index.html.gz")))
+
+    def test_output_is_deterministic(self):
+        self.assertEqual(gzip_compress(b"abc" * 100), gzip_compress(b"abc" * 100))
+
+
+if __name__ == "__main__":
+    unittest.main()
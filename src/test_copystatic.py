@@ -0,0 +1,135 @@
+import os
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from assets import AssetIndex
+from copystatic import map_bounded, scan_tree, sync_files
+from fixtures import write_file
+from manifest import Manifest, hash_file
+
+
+class TestSyncFilesRecursive(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = self.tmp.name
+        self.static = os.path.join(root, "static")
+        self.public = os.path.join(root, "public")
+        self.manifest = Manifest(os.path.join(root, ".cache", "manifest.json"))
+        write_file(os.path.join(self.static, "index.css"), "body {}")
+        write_file(os.path.join(self.static, "images", "a.png"), "png-bytes")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def sync(self, use_links=False, workers=1):
+        return sync_files(self.static, self.public, self.manifest, use_links, workers)
+
+    def test_first_sync_copies_everything(self):
+        stats = self.sync()
+        self.assertEqual((stats.copied_files, stats.copied_bytes), (2, 16))
+        with open(os.path.join(self.public, "images", "a.png")) as f:
+            self.assertEqual(f.read(), "png-bytes")
+
+    def test_unchanged_files_are_skipped(self):
+        self.sync()
+        stats = self.sync()
+        self.assertEqual(stats.copied_files, 0)
+        self.assertEqual((stats.skipped_files, stats.skipped_bytes), (2, 16))
+
+    def test_changed_file_is_copied(self):
+        self.sync()
+        path = os.path.join(self.static, "index.css")
+        write_file(path, "body { margin: 0 }")
+        os.utime(path, ns=(0, 0))
+        stats = self.sync()
+        self.assertEqual(stats.copied_files, 1)
+        with open(os.path.join(self.public, "index.css")) as f:
+            self.assertEqual(f.read(), "body { margin: 0 }")
+
+    def test_stale_files_are_removed(self):
+        self.sync()
+        write_file(os.path.join(self.public, "index.html"), "generated page")
+        os.remove(os.path.join(self.static, "images", "a.png"))
+        stats = self.sync()
+        self.assertEqual(stats.removed_files, 1)
+        self.assertFalse(os.path.exists(os.path.join(self.public, "images")))
+        self.assertTrue(os.path.exists(os.path.join(self.public, "index.html")))
+        self.assertEqual(set(self.manifest.assets), {"index.css"})
+
+    def test_hard_links(self):
+        self.sync(use_links=True)
+        source = os.stat(os.path.join(self.static, "index.css"))
+        dest = os.stat(os.path.join(self.public, "index.css"))
+        self.assertEqual((source.st_dev, source.st_ino), (dest.st_dev, dest.st_ino))
+        self.assertEqual(self.sync(use_links=True).copied_files, 0)
+
+    def test_concurrent_sync(self):
+        for i in range(50):
+            write_file(os.path.join(self.static, "many", f"{i:02}.txt"), str(i))
+        stats = self.sync(workers=4)
+        self.assertEqual(stats.copied_files, 52)
+        with open(os.path.join(self.public, "many", "42.txt")) as f:
+            self.assertEqual(f.read(), "42")
+        self.assertEqual(self.sync(workers=4).skipped_files, 52)
+
+    def test_sync_without_manifest(self):
+        stats = sync_files(self.static, self.public, workers=1)
+        self.assertEqual(stats.copied_files, 2)
+
+    def test_fingerprinted(self):
+        assets = AssetIndex()
+        write_file(os.path.join(self.static, "robots.txt"), "User-agent: *")
+        sync_files(self.static, self.public, self.manifest, workers=1, assets=assets)
+        digest = hash_file(os.path.join(self.static, "index.css"))
+        old_path = os.path.join(self.public, f"index.{digest[:10]}.css")
+        self.assertTrue(os.path.exists(old_path))
+        self.assertFalse(os.path.exists(os.path.join(self.public, "index.css")))
+        self.assertTrue(os.path.exists(os.path.join(self.public, "robots.txt")))
+        self.assertEqual(set(assets.files), {"index.css", os.path.join("images", "a.png")})
+
+        self.assertEqual(sync_files(self.static, self.public, self.manifest, workers=1, assets=assets).copied_files, 0)
+        self.assertEqual(assets.hashed, 2)
+
+        path = os.path.join(self.static, "index.css")
+        write_file(path, "body { margin: 0 }")
+        os.utime(path, ns=(0, 0))
+        stats = sync_files(self.static, self.public, self.manifest, workers=1, assets=assets)
+        self.assertEqual((stats.copied_files, stats.removed_files, assets.hashed), (1, 1, 3))
+        self.assertFalse(os.path.exists(old_path))
+
+
+class TestScanTree(unittest.TestCase):
+
+    def test_scan_tree(self):
+        with tempfile.TemporaryDirectory() as root:
+            write_file(os.path.join(root, "b.txt"), "bb")
+            write_file(os.path.join(root, "a", "c.txt"), "c")
+            dir_paths, files = scan_tree(root)
+            self.assertEqual(dir_paths, ["a"])
+            self.assertEqual(
+                sorted((rel_path, size) for rel_path, _, size, _ in files),
+                [(os.path.join("a", "c.txt"), 1), ("b.txt", 2)],
+            )
+
+
+class TestMapBounded(unittest.TestCase):
+
+    def test_results_in_order_with_bounded_submissions(self):
+        taken = []
+
+        def items():
+            for i in range(100):
+                taken.append(i)
+                yield i
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = map_bounded(executor, lambda i: i * 2, items(), 8)
+            self.assertEqual(next(results), 0)
+            self.assertLessEqual(len(taken), 9)
+            self.assertEqual(list(results), [i * 2 for i in range(1, 100)])
+
+
+if __name__ == "__main__":
+    unittest.main()
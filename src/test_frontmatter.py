@@ -0,0 +1,62 @@
+import io
+import os
+import tempfile
+import unittest
+
+from frontmatter import (
+    FrontMatterError,
+    read_front_matter,
+    read_page_metadata,
+)
+
+
+class TestReadFrontMatter(unittest.TestCase):
+
+    def test_header_is_parsed_and_body_follows(self):
+        f = io.StringIO("---\nTitle: Hello\ntags: 'a, b'\n\n# comment\n---\n# Body\n")
+        self.assertEqual(read_front_matter(f), {"title": "Hello", "tags": "a, b"})
+        self.assertEqual(f.read(), "# Body\n")
+
+    def test_no_front_matter_rewinds(self):
+        f = io.StringIO("# Title\n\nText")
+        self.assertEqual(read_front_matter(f), {})
+        self.assertEqual(f.read(), "# Title\n\nText")
+
+    def test_unclosed(self):
+        with self.assertRaises(FrontMatterError):
+            read_front_matter(io.StringIO("---\ntitle: x\n# Body\n"))
+
+    def test_invalid_line(self):
+        with self.assertRaises(FrontMatterError) as cm:
+            read_front_matter(io.StringIO("---\ntitle: x\nnot a pair\n---\n"))
+        self.assertIn("line 3", str(cm.exception))
+
+
+class TestReadPageMetadata(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "page.md")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def read(self, text):
+        with open(self.path, 'w') as f:
+            f.write(text)
+        return read_page_metadata(self.path)
+
+    def test_title_from_front_matter(self):
+        metadata = self.read("---\ntitle: From header\n---\n# From body\n")
+        self.assertEqual(metadata["title"], "From header")
+        self.assertIn("mtime", metadata)
+
+    def test_title_from_first_heading(self):
+        self.assertEqual(self.read("intro\n\n# Heading\n\nText")["title"], "Heading")
+
+    def test_no_title(self):
+        self.assertNotIn("title", self.read("Just text"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,306 @@
+import datetime
+import os
+import tempfile
+import unittest
+
+from fixtures import write_file
+from gencontent import (
+    PageErrors,
+    batch_pages,
+    extract_title,
+    extract_title_from_lines,
+    generate_pages_incremental,
+    generate_pages_recursive,
+    page_url,
+)
+from htmlnode import MinifyStats, set_minify_stats
+from links import LinkIndex
+from manifest import Manifest
+from markdown_blocks import BlockCache, get_block_cache, set_block_cache
+from profiling import BuildProfile, set_build_profile
+
+
+TEMPLATE = "<title>{{ Title }}</title><main>{{ Content }}</main>"
+
+
+class TestExtractTitle(unittest.TestCase):
+
+    def test_extract_title(self):
+        self.assertEqual(extract_title("intro\n# Hello\n## Sub"), "Hello")
+
+    def test_extract_title_missing(self):
+        with self.assertRaises(ValueError):
+            extract_title("## Only a subheading")
+
+    def test_extract_title_from_lines(self):
+        self.assertEqual(extract_title_from_lines(["intro\n", "# Hello\n"]), "Hello")
+
+
+class TestPageUrl(unittest.TestCase):
+
+    def test_index_page(self):
+        self.assertEqual(page_url("/site/public/blog/index.html", "/site/public"), "/blog/")
+
+    def test_plain_page(self):
+        self.assertEqual(page_url("/site/public/blog/post.html", "/site/public"), "/blog/post.html")
+
+
+class TestGeneratePagesIncremental(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = self.tmp.name
+        self.content = os.path.join(root, "content")
+        self.public = os.path.join(root, "public")
+        self.template = os.path.join(root, "template.html")
+        self.manifest = Manifest(os.path.join(root, ".cache", "manifest.json"))
+        write_file(self.template, TEMPLATE)
+        write_file(os.path.join(self.content, "index.md"), "# Home\n\nWelcome")
+        write_file(os.path.join(self.content, "blog", "post.md"), "# Post\n\nBody")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def build(self):
+        return generate_pages_incremental(
+            self.content, self.template, self.public, self.manifest
+        )
+
+    def test_first_build_renders_everything(self):
+        generated = self.build()
+        self.assertEqual(len(generated), 2)
+        self.assertTrue(os.path.exists(os.path.join(self.public, "blog", "post.html")))
+        self.assertEqual(set(self.manifest.pages), {"index.md", os.path.join("blog", "post.md")})
+
+    def test_unchanged_build_renders_nothing(self):
+        self.build()
+        self.assertEqual(self.build(), [])
+
+    def test_changed_page_is_rerendered(self):
+        self.build()
+        write_file(os.path.join(self.content, "index.md"), "# Home\n\nWelcome back")
+        generated = self.build()
+        self.assertEqual(generated, [os.path.join(self.public, "index.html")])
+        with open(generated[0]) as f:
+            self.assertIn("Welcome back", f.read())
+
+    def test_touched_page_with_same_content_is_skipped(self):
+        self.build()
+        path = os.path.join(self.content, "index.md")
+        os.utime(path, ns=(0, 0))
+        self.assertEqual(self.build(), [])
+        self.assertEqual(self.manifest.pages["index.md"]["mtime"], 0)
+
+    def test_template_change_rerenders_everything(self):
+        self.build()
+        write_file(self.template, "<h1>{{ Title }}</h1>{{ Content }}")
+        self.assertEqual(len(self.build()), 2)
+
+    def test_full_build_records_manifest(self):
+        self.build()
+        write_file(self.template, "<h1>{{ Title }}</h1>{{ Content }}")
+        self.manifest = Manifest(self.manifest.path)
+        generate_pages_recursive(self.content, self.template, self.public, manifest=self.manifest)
+        self.assertEqual(self.build(), [])
+        # Reverting the template re-renders what the full build wrote.
+        write_file(self.template, TEMPLATE)
+        self.assertEqual(len(self.build()), 2)
+
+    def test_missing_output_is_regenerated(self):
+        self.build()
+        os.remove(os.path.join(self.public, "index.html"))
+        self.assertEqual(self.build(), [os.path.join(self.public, "index.html")])
+
+    def test_deleted_source_removes_output(self):
+        self.build()
+        os.remove(os.path.join(self.content, "blog", "post.md"))
+        self.build()
+        self.assertFalse(os.path.exists(os.path.join(self.public, "blog")))
+        self.assertEqual(set(self.manifest.pages), {"index.md"})
+
+    def test_template_placeholders(self):
+        write_file(self.template, "{{ Title }}|{{ Path }}|{{ Date }}|{{ Content }}")
+        modified = 86400 * 365 + 43200
+        os.utime(os.path.join(self.content, "blog", "post.md"), (modified, modified))
+        self.build()
+        with open(os.path.join(self.public, "blog", "post.html")) as f:
+            html = f.read()
+        # The date is in local time, as the page's is.
+        date = datetime.date.fromtimestamp(modified).isoformat()
+        self.assertEqual(html, f"Post|/blog/post.html|{date}|<div><h1>Post</h1><p>Body</p></div>")
+
+    def test_front_matter(self):
+        write_file(self.template, "{{ Title }}|{{ Date }}|{{ meta.author }}|{{ Content }}")
+        write_file(
+            os.path.join(self.content, "index.md"),
+            "---\ntitle: Front\ndate: 2024-05-06\nauthor: Ann\n---\n# Body title\n\nText",
+        )
+        self.build()
+        with open(os.path.join(self.public, "index.html")) as f:
+            self.assertEqual(
+                f.read(),
+                "Front|2024-05-06|Ann|<div><h1>Body title</h1><p>Text</p></div>",
+            )
+
+    def test_pages_with_problems_are_reported_again(self):
+        write_file(os.path.join(self.content, "index.md"), "# Home\n\nBroken *text")
+        for _ in range(2):
+            diagnostics = []
+            generated = generate_pages_incremental(
+                self.content, self.template, self.public, self.manifest, diagnostics=diagnostics
+            )
+            self.assertIn(os.path.join(self.public, "index.html"), generated)
+            self.assertEqual([(line, column) for _, line, column, _ in diagnostics], [(3, 8)])
+        self.assertNotIn("index.md", self.manifest.pages)
+
+    def test_minify_change_rerenders_everything(self):
+        self.build()
+        set_minify_stats(MinifyStats())
+        try:
+            self.assertEqual(len(self.build()), 2)
+            self.assertEqual(self.build(), [])
+        finally:
+            set_minify_stats(None)
+        self.assertEqual(len(self.build()), 2)
+
+    def test_manifest_round_trip(self):
+        self.build()
+        self.manifest.save()
+        loaded = Manifest.load(self.manifest.path)
+        self.assertEqual(loaded.pages, self.manifest.pages)
+
+
+class TestParallelGeneration(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = self.tmp.name
+        self.content = os.path.join(root, "content")
+        self.public = os.path.join(root, "public")
+        self.template = os.path.join(root, "template.html")
+        write_file(self.template, TEMPLATE)
+        for i in range(12):
+            write_file(os.path.join(self.content, f"page{i:02}.md"), f"# Page {i}\n\nText {i}")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def read_outputs(self):
+        outputs = {}
+        for filename in sorted(os.listdir(self.public)):
+            with open(os.path.join(self.public, filename)) as f:
+                outputs[filename] = f.read()
+        return outputs
+
+    def test_parallel_output_matches_sequential(self):
+        generate_pages_recursive(self.content, self.template, self.public)
+        sequential = self.read_outputs()
+        for filename in os.listdir(self.public):
+            os.remove(os.path.join(self.public, filename))
+
+        generate_pages_recursive(self.content, self.template, self.public, jobs=3)
+        self.assertEqual(self.read_outputs(), sequential)
+
+    def test_errors_are_collected_without_aborting(self):
+        write_file(os.path.join(self.content, "page03.md"), "No title here")
+        write_file(os.path.join(self.content, "page07.md"), "# Broken `code")
+        with self.assertRaises(PageErrors) as cm:
+            generate_pages_recursive(self.content, self.template, self.public, jobs=2)
+        failed = [os.path.basename(from_path) for from_path, _ in cm.exception.errors]
+        self.assertEqual(failed, ["page03.md", "page07.md"])
+        self.assertEqual(len(os.listdir(self.public)), 10)
+
+    def test_lenient_build_reports_every_problem(self):
+        write_file(os.path.join(self.content, "page03.md"), "---\ntitle: Three\n---\n# Three\n\n  Open *a\n\nand `b")
+        write_file(os.path.join(self.content, "page07.md"), "# Seven\n\n- one **two")
+        for jobs in (1, 2):
+            diagnostics = []
+            generate_pages_recursive(self.content, self.template, self.public, jobs=jobs, diagnostics=diagnostics)
+            self.assertEqual(
+                [(os.path.basename(from_path), line, column) for from_path, line, column, _ in diagnostics],
+                [("page03.md", 6, 8), ("page03.md", 8, 5), ("page07.md", 3, 7)],
+            )
+            self.assertEqual(len(os.listdir(self.public)), 12)
+        with open(os.path.join(self.public, "page07.html")) as f:
+            self.assertIn("<li>one **two</li>", f.read())
+
+    def test_profiled_output_matches_streamed(self):
+        write_file(os.path.join(self.content, "page04.md"), "---\ntitle: Four\n---\n\nText 4")
+        generate_pages_recursive(self.content, self.template, self.public)
+        streamed = self.read_outputs()
+
+        profile = BuildProfile()
+        set_build_profile(profile)
+        try:
+            generate_pages_recursive(self.content, self.template, self.public, jobs=2)
+        finally:
+            set_build_profile(None)
+        self.assertEqual(self.read_outputs(), streamed)
+        self.assertEqual(len(profile.pages), 12)
+        for name in ("inline parse", "serialize", "template", "write"):
+            self.assertIn(name, profile.stages)
+
+    def test_profiled_cache_hits_are_serialized(self):
+        set_block_cache(BlockCache())
+        try:
+            generate_pages_recursive(self.content, self.template, self.public)
+            profile = BuildProfile()
+            set_build_profile(profile)
+            generate_pages_recursive(self.content, self.template, self.public)
+        finally:
+            set_build_profile(None)
+            set_block_cache(None)
+        # Two blocks a page, every one a cache hit.
+        self.assertEqual(profile.stages["serialize"][3], 24)
+        self.assertNotIn("inline parse", profile.stages)
+
+    def test_link_index_matches_sequential(self):
+        write_file(os.path.join(self.content, "page05.md"), "# Page 5\n\n[six](/page06.html)")
+        sequential = LinkIndex()
+        generate_pages_recursive(self.content, self.template, self.public, link_index=sequential)
+        parallel = LinkIndex()
+        generate_pages_recursive(self.content, self.template, self.public, jobs=3, link_index=parallel)
+        self.assertEqual(parallel.pages, sequential.pages)
+        self.assertEqual(len(parallel.pages), 12)
+        self.assertEqual(parallel.referrers("/page06.html"), ["page05.md"])
+
+    def test_minified_pages_report_bytes_saved(self):
+        write_file(self.template, "<html>\n  <main>{{ Content }}</main>\n</html>\n")
+        write_file(os.path.join(self.content, "page02.md"), "# Page 2\n\nText  with\n  gaps\n\n```\nkeep  this\n```")
+        reports = []
+        for jobs, cache in ((1, None), (1, BlockCache()), (1, "reuse"), (2, None)):
+            if cache == "reuse":
+                cache = get_block_cache()
+            set_block_cache(cache)
+            stats = MinifyStats()
+            set_minify_stats(stats)
+            try:
+                generate_pages_recursive(self.content, self.template, self.public, jobs=jobs)
+            finally:
+                set_minify_stats(None)
+            reports.append(stats.pages)
+        set_block_cache(None)
+        self.assertEqual(reports[1:], reports[:1] * 3)
+        saved = {os.path.basename(page): saved for page, saved in reports[0].items()}
+        # 5 from the template on every page, 3 from the paragraph.
+        self.assertEqual(saved["page02.md"], 5 + 3)
+        self.assertEqual(saved["page01.md"], 5)
+        with open(os.path.join(self.public, "page02.html")) as f:
+            self.assertEqual(
+                f.read(),
+                "<html><main><div><h1>Page 2</h1><p>Text with gaps</p>"
+                "<pre><code>keep  this</code></pre></div></main></html>",
+            )
+
+    def test_batch_pages_keeps_order(self):
+        pages = [
+            (os.path.join(self.content, filename), filename)
+            for filename in sorted(os.listdir(self.content))
+        ]
+        batches = batch_pages(pages, jobs=2)
+        self.assertGreater(len(batches), 1)
+        self.assertEqual([page for batch in batches for page in batch], pages)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,17 @@
+import io
 import unittest
 
-from htmlnode import HTMLNode, LeafNode, ParentNode
+from htmlnode import (
+    EscapedNode,
+    HTMLNode,
+    LeafNode,
+    MinifyStats,
+    ParentNode,
+    RawNode,
+    collapse_whitespace,
+    minify_html,
+    set_minify_stats,
+)
 
 
 class TestHTMLNode(unittest.TestCase):
@@ -46,6 +57,27 @@ class TestLeafNode(unittest.TestCase):
         with self.assertRaises(ValueError):
             leaf.to_html()
 
+    def test_text_is_escaped(self):
+        self.assertEqual(LeafNode(None, "a < b & c > d").to_html(), "a &lt; b &amp; c &gt; d")
+        self.assertEqual(LeafNode("code", "<p>\"x\"</p>").to_html(), "<code>&lt;p&gt;\"x\"&lt;/p&gt;</code>")
+
+    def test_attributes_are_escaped(self):
+        leaf = LeafNode("a", "link", {"href": '/q?a=1&b="2"', "title": "it's"})
+        self.assertEqual(leaf.to_html(), '<a href="/q?a=1&amp;b=&quot;2&quot;" title="it&#x27;s">link</a>')
+
+    def test_raw_node_is_not_escaped(self):
+        node = ParentNode("div", [RawNode("<p>a &amp; b</p>"), LeafNode(None, "<")])
+        self.assertEqual(node.to_html(), "<div><p>a &amp; b</p>&lt;</div>")
+        self.assertNotEqual(RawNode("x"), LeafNode(None, "x"))
+
+    def test_escaped_node_is_not_escaped_again(self):
+        node = EscapedNode("b", "a &lt; b", {"title": "&quot;"})
+        self.assertEqual(node.to_html(), '<b title="&quot;">a &lt; b</b>')
+        self.assertEqual(node, LeafNode("b", "a < b", {"title": '"'}))
+        self.assertEqual(LeafNode("b", "a < b", {"title": '"'}), node)
+        self.assertNotEqual(node, LeafNode("b", "a &lt; b", {"title": '"'}))
+        self.assertNotEqual(EscapedNode(None, "x"), RawNode("x"))
+
 
 class TestParentNode(unittest.TestCase):
     
@@ -90,6 +122,45 @@ class TestParentNode(unittest.TestCase):
         with self.assertRaises(ValueError):
             parent.to_html()
 
+    def test_write_html_streams_fragments(self):
+        child = ParentNode(tag='p', children=[LeafNode('b', 'bold'), LeafNode(None, ' text')])
+        parent = ParentNode(tag='div', children=[child, LeafNode('img', '', {'src': 'a.png'})])
+        fragments = []
+        parent.write_html(fragments.append)
+        self.assertGreater(len(fragments), 1)
+        self.assertEqual(''.join(fragments), parent.to_html())
+
+    def test_write_html_to_file_object(self):
+        parent = ParentNode(tag='ul', children=[ParentNode('li', [LeafNode(None, str(i))]) for i in range(3)])
+        sink = io.StringIO()
+        parent.write_html(sink.write)
+        self.assertEqual(sink.getvalue(), '<ul><li>0</li><li>1</li><li>2</li></ul>')
+
+    def test_base_node_write_html_not_implemented(self):
+        with self.assertRaises(NotImplementedError):
+            HTMLNode('p', 'text').to_html()
+
+
+class TestMinify(unittest.TestCase):
+
+    def setUp(self):
+        self.stats = MinifyStats()
+        set_minify_stats(self.stats)
+
+    def tearDown(self):
+        set_minify_stats(None)
+
+    def test_collapse_whitespace(self):
+        self.assertEqual(collapse_whitespace("a  \n b\tc\u00a0\u00a0d"), "a b c\u00a0\u00a0d")
+        self.assertEqual(self.stats.saved, 3)
+
+    def test_minify_markup(self):
+        html = "<ul>\n  <li>a  <b>b</b>\n  <i>c</i></li>\n</ul>\n<pre>  x\n    y\n</pre>\n<p> end </p>\n"
+        self.assertEqual(
+            minify_html(html),
+            "<ul><li>a <b>b</b><i>c</i></li></ul><pre>  x\n    y\n</pre><p> end </p>",
+        )
+
 
 if __name__ == '__main__':
     unittest.main()
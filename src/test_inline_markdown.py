@@ -1,3 +1,4 @@
+import random
 import unittest
 
 from inline_markdown import (
@@ -6,7 +7,9 @@ from inline_markdown import (
     split_nodes_delimiter,
     split_nodes_link,
     split_nodes_image,
-    text_to_textnodes
+    text_to_textnodes,
+    text_to_textnodes_lenient,
+    text_to_textnodes_reference
 )
 from textnode import (
     TextNode,
@@ -186,35 +189,38 @@ class TestSplitNodesExtended(unittest.TestCase):
 
 class TestTextToTextNodes(unittest.TestCase):
 
+    def text_to_textnodes(self, text):
+        return text_to_textnodes(text)
+
     def test_plain_text(self):
         text = "This is plain text."
         expected = [TextNode("This is plain text.", text_type_text)]
-        self.assertEqual(text_to_textnodes(text), expected)
+        self.assertEqual(self.text_to_textnodes(text), expected)
 
     def test_bold_text(self):
         text = "This is **bold** text."
         expected = [TextNode("This is ", text_type_text), TextNode("bold", text_type_bold), TextNode(" text.", text_type_text)]
-        self.assertEqual(text_to_textnodes(text), expected)
+        self.assertEqual(self.text_to_textnodes(text), expected)
 
     def test_italic_text(self):
         text = "This is *italic* text."
         expected = [TextNode("This is ", text_type_text), TextNode("italic", text_type_italic), TextNode(" text.", text_type_text)]
-        self.assertEqual(text_to_textnodes(text), expected)
+        self.assertEqual(self.text_to_textnodes(text), expected)
 
     def test_code_text(self):
         text = "This is `code` text."
         expected = [TextNode("This is ", text_type_text), TextNode("code", text_type_code), TextNode(" text.", text_type_text)]
-        self.assertEqual(text_to_textnodes(text), expected)
+        self.assertEqual(self.text_to_textnodes(text), expected)
 
     def test_image(self):
         text = "This is ![alt text](http://example.com/image.jpg) in text."
         expected = [TextNode("This is ", text_type_text), TextNode("alt text", text_type_image, "http://example.com/image.jpg"), TextNode(" in text.", text_type_text)]
-        self.assertEqual(text_to_textnodes(text), expected)
+        self.assertEqual(self.text_to_textnodes(text), expected)
 
     def test_link(self):
         text = "This is [link text](http://example.com) in text."
         expected = [TextNode("This is ", text_type_text), TextNode("link text", text_type_link, "http://example.com"), TextNode(" in text.", text_type_text)]
-        self.assertEqual(text_to_textnodes(text), expected)
+        self.assertEqual(self.text_to_textnodes(text), expected)
 
     def test_combined_markdown_elements(self):
         text = "**Bold**, *italic*, `code`, ![alt](http://image.com), [link](http://link.com)."
@@ -225,7 +231,7 @@ class TestTextToTextNodes(unittest.TestCase):
             TextNode("alt", text_type_image, "http://image.com"), TextNode(", ", text_type_text),
             TextNode("link", text_type_link, "http://link.com"), TextNode(".", text_type_text)
         ]
-        self.assertEqual(text_to_textnodes(text), expected)
+        self.assertEqual(self.text_to_textnodes(text), expected)
 
     def test_nested_bold_italic(self):
         text = "This is **bold and *italic* text**."
@@ -236,7 +242,7 @@ class TestTextToTextNodes(unittest.TestCase):
             TextNode(" text", text_type_bold),
             TextNode(".", text_type_text)
         ]
-        self.assertEqual(text_to_textnodes(text), expected)
+        self.assertEqual(self.text_to_textnodes(text), expected)
 
     def test_link_inside_bold(self):
         text = "This is **bold with a [link](http://example.com)** text."
@@ -246,7 +252,7 @@ class TestTextToTextNodes(unittest.TestCase):
             TextNode("link", text_type_link, "http://example.com"),
             TextNode(" text.", text_type_text)
         ]
-        self.assertEqual(text_to_textnodes(text), expected)
+        self.assertEqual(self.text_to_textnodes(text), expected)
 
     def test_image_inside_italic(self):
         text = "This is *italic with an ![image](http://example.com/image.jpg)* text."
@@ -256,7 +262,7 @@ class TestTextToTextNodes(unittest.TestCase):
             TextNode("image", text_type_image, "http://example.com/image.jpg"),
             TextNode(" text.", text_type_text)
         ]
-        self.assertEqual(text_to_textnodes(text), expected)
+        self.assertEqual(self.text_to_textnodes(text), expected)
 
     def test_complex_nesting(self):
         text = "Here is **bold, *italic, and ![an image](http://example.com/image.jpg)* text**."
@@ -268,7 +274,100 @@ class TestTextToTextNodes(unittest.TestCase):
             TextNode(" text", text_type_bold),
             TextNode(".", text_type_text)
         ]
-        self.assertEqual(text_to_textnodes(text), expected)
+        self.assertEqual(self.text_to_textnodes(text), expected)
+
+    def test_unbalanced_delimiter_raises(self):
+        for text in ["**bold", "*italic", "`code", "**bold *italic** text*", "*a `b* c`"]:
+            with self.assertRaises(ValueError):
+                self.text_to_textnodes(text)
+
+    def test_link_after_bang_outside_run(self):
+        text = "!**[link](http://example.com)**"
+        expected = [
+            TextNode("!", text_type_text),
+            TextNode("link", text_type_link, "http://example.com"),
+        ]
+        self.assertEqual(self.text_to_textnodes(text), expected)
+
+
+class TestTextToTextNodesReference(TestTextToTextNodes):
+
+    def text_to_textnodes(self, text):
+        return text_to_textnodes_reference(text)
+
+
+class TestSinglePassEquivalence(unittest.TestCase):
+
+    alphabet = ["a", "b", " ", "*", "**", "`", "!", "[", "]", "(", ")", "![", "](", "\n"]
+
+    def parse(self, func, text):
+        try:
+            return func(text)
+        except ValueError:
+            return "error"
+
+    def test_matches_reference_on_random_inputs(self):
+        rng = random.Random(1234)
+        for _ in range(20000):
+            text = "".join(rng.choice(self.alphabet) for _ in range(rng.randint(0, 16)))
+            expected = self.parse(text_to_textnodes_reference, text)
+            actual = self.parse(text_to_textnodes, text)
+            if actual != "error":
+                # The reference drops images with empty alt text.
+                actual = [
+                    node for node in actual
+                    if not (node.text_type == text_type_image and node.text == "")
+                ]
+            self.assertEqual(actual, expected, msg=repr(text))
+
+    def test_keeps_image_with_empty_alt(self):
+        expected = [TextNode("", text_type_image, "http://example.com/image.jpg")]
+        self.assertEqual(text_to_textnodes("![](http://example.com/image.jpg)"), expected)
+
+
+class TestTextToTextNodesLenient(unittest.TestCase):
+
+    def lenient(self, text):
+        problems = []
+        return text_to_textnodes_lenient(text, problems), problems
+
+    def test_unclosed_delimiter_is_literal(self):
+        nodes, problems = self.lenient("a **b** *c")
+        self.assertEqual(nodes, [
+            TextNode("a ", text_type_text),
+            TextNode("b", text_type_bold),
+            TextNode(" *c", text_type_text),
+        ])
+        self.assertEqual(problems, [(8, "Unclosed '*'")])
+
+    def test_nested_delimiters_are_literal(self):
+        nodes, problems = self.lenient("`a *b` and *c **d* e")
+        self.assertEqual(nodes, [
+            TextNode("a *b", text_type_code),
+            TextNode(" and ", text_type_text),
+            TextNode("c **d", text_type_italic),
+            TextNode(" e", text_type_text),
+        ])
+        self.assertEqual(problems, [(3, "'*' inside a code span"), (14, "'**' inside italic text")])
+
+    def test_unclosed_code_does_not_hide_later_delimiters(self):
+        nodes, problems = self.lenient("`a *b*")
+        self.assertEqual(nodes, [TextNode("`a ", text_type_text), TextNode("b", text_type_italic)])
+        self.assertEqual(problems, [(0, "Unclosed '`'")])
+
+    def test_matches_strict_on_valid_inputs(self):
+        rng = random.Random(4321)
+        for _ in range(20000):
+            text = "".join(rng.choice(TestSinglePassEquivalence.alphabet) for _ in range(rng.randint(0, 16)))
+            nodes, problems = self.lenient(text)
+            try:
+                expected = text_to_textnodes(text)
+            except ValueError:
+                expected = "error"
+            if expected == "error":
+                self.assertTrue(problems, msg=repr(text))
+            else:
+                self.assertEqual((nodes, problems), (expected, []), msg=repr(text))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,92 @@
+import os
+import tempfile
+import unittest
+
+from fixtures import write_file
+from links import LinkIndex, resolve_target
+
+
+class TestResolveTarget(unittest.TestCase):
+
+    def test_absolute(self):
+        self.assertEqual(resolve_target("/blog/post.html", "/images/a.png"), "/images/a.png")
+
+    def test_relative(self):
+        self.assertEqual(resolve_target("/blog/post.html", "other.html#top"), "/blog/other.html")
+        self.assertEqual(resolve_target("/blog/", "../about.html"), "/about.html")
+
+    def test_directories_are_one_path(self):
+        for target in ("/blog", "/blog/", "/blog/index.html", "blog#top"):
+            with self.subTest(target=target):
+                self.assertEqual(resolve_target("/", target), "/blog/")
+        self.assertEqual(resolve_target("/blog/", "../index.html"), "/")
+
+    def test_external(self):
+        self.assertIsNone(resolve_target("/", "https://example.com/"))
+        self.assertIsNone(resolve_target("/", "mailto:someone@example.com"))
+
+
+class TestLinkIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.public = os.path.join(self.tmp.name, "public")
+        self.index = LinkIndex(os.path.join(self.tmp.name, ".cache", "links.json"))
+        self.index.set_page("index.md", "/", [
+            ("link", "/blog"),
+            ("link", "https://example.com"),
+            ("image", "/images/a.png"),
+        ])
+        self.index.set_page("blog/index.md", "/blog/", [
+            ("link", "/"),
+            ("link", "missing.html"),
+            ("image", "../images/a.png"),
+        ])
+        write_file(os.path.join(self.public, "index.html"))
+        write_file(os.path.join(self.public, "blog", "index.html"))
+        write_file(os.path.join(self.public, "images", "a.png"))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_set_page_splits_and_dedupes(self):
+        self.index.set_page("a.md", "/a.html", [("link", "/b"), ("link", "/b"), ("image", "/c.png")])
+        self.assertEqual(self.index.pages["a.md"], {"url": "/a.html", "links": ["/b"], "images": ["/c.png"]})
+
+    def test_referrers(self):
+        self.assertEqual(self.index.referrers("/images/a.png"), ["blog/index.md", "index.md"])
+        self.assertEqual(self.index.referrers("/"), ["blog/index.md"])
+        self.assertEqual(self.index.referrers("/nothing"), [])
+        self.assertEqual(self.index.referrers("/", "/blog"), ["blog/index.md", "index.md"])
+
+    def test_referrers_by_any_directory_url(self):
+        for url in ("/blog", "/blog/", "/blog/index.html"):
+            self.assertEqual(self.index.referrers(url), ["index.md"])
+
+    def test_referrers_follow_changes(self):
+        self.index.set_page("index.md", "/", [("link", "/blog")])
+        self.assertEqual(self.index.referrers("/images/a.png"), ["blog/index.md"])
+        self.index.remove_page("blog/index.md")
+        self.assertEqual(self.index.referrers("/images/a.png"), [])
+        self.assertEqual(LinkIndex(pages=self.index.pages).referrers("/blog"), ["index.md"])
+        self.index.clear()
+        self.assertEqual(self.index.referrers("/blog"), [])
+
+    def test_broken_links(self):
+        self.assertEqual(self.index.broken_links(self.public), [("blog/index.md", "missing.html")])
+        os.remove(os.path.join(self.public, "images", "a.png"))
+        self.assertEqual(
+            self.index.broken_links(self.public, ["index.md"]),
+            [("index.md", "/images/a.png")],
+        )
+
+    def test_save_and_load(self):
+        self.index.save()
+        self.assertEqual(LinkIndex.load(self.index.path).pages, self.index.pages)
+
+    def test_load_missing_file(self):
+        self.assertEqual(LinkIndex.load(os.path.join(self.tmp.name, "none.json")).pages, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
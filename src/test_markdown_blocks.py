@@ -1,8 +1,12 @@
+import json
+import os
+import tempfile
 import unittest
 
 from bs4 import BeautifulSoup
 
 
+from htmlnode import MinifyStats, set_minify_stats
 from markdown_blocks import (
     block_type_paragraph,
     block_type_heading,
@@ -12,7 +16,14 @@ from markdown_blocks import (
     block_type_ordered_list,
     markdown_to_blocks,
     block_to_block_type,
-    markdown_to_html_node
+    collect_links,
+    markdown_to_html_node,
+    markdown_lines_to_html_node,
+    iter_markdown_blocks,
+    set_block_cache,
+    set_block_diagnostics,
+    BlockCache,
+    PARSER_VERSION
 )
 
 
@@ -64,6 +75,21 @@ This is the same paragraph on a new line
         expected = ["This is a paragraph\nwith a new line\nbut considered as one block."]
         self.assertEqual(markdown_to_blocks(markdown), expected)
 
+    def test_fenced_code_with_blank_lines(self):
+        markdown = "Intro\n\n```\ndef f():\n\n    return 1\n```\n\nOutro"
+        expected = ["Intro", "```\ndef f():\n\n    return 1\n```", "Outro"]
+        self.assertEqual(markdown_to_blocks(markdown), expected)
+
+    def test_single_line_fence(self):
+        markdown = "```code```\n\nNext"
+        self.assertEqual(markdown_to_blocks(markdown), ["```code```", "Next"])
+
+    def test_iter_blocks_from_file_lines(self):
+        lines = ["# Title\n", "\n", "Para\n", "graph\n", "\n", "\n", "* item\n"]
+        blocks = iter_markdown_blocks(iter(lines))
+        self.assertEqual(next(blocks), "# Title")
+        self.assertEqual(list(blocks), ["Para\ngraph", "* item"])
+
 
 class TestBlockToBlockType(unittest.TestCase):
 
@@ -167,5 +193,236 @@ This is a paragraph following a code block. And here's a link in a paragraph: [E
         actual_soup = BeautifulSoup(markdown_to_html_node(document, "div").to_html(), 'html.parser').prettify()
         self.assertEqual(str(expected_soup), str(actual_soup))
 
+    def test_special_characters_are_escaped(self):
+        markdown = "a < b & [x](/s?a=1&b=2)\n\n```\nif a < b:\n    print(\"&\")\n```"
+        self.assertEqual(
+            markdown_to_html_node(markdown, "div").to_html(),
+            '<div><p>a &lt; b &amp; <a href="/s?a=1&amp;b=2">x</a></p>'
+            '<pre><code>if a &lt; b:\n    print("&amp;")</code></pre></div>',
+        )
+        links = []
+        collect_links(markdown_to_html_node(markdown, "div"), links)
+        self.assertEqual(links, [("link", "/s?a=1&b=2")])
+
+
+class TestNestedBlocks(unittest.TestCase):
+
+    def render(self, markdown):
+        return markdown_to_html_node(markdown, "div").to_html()
+
+    def test_nested_quotes(self):
+        self.assertEqual(
+            self.render("> a\n> > b\n>> c\n> d"),
+            "<div><blockquote><p>a</p><blockquote><p>b c</p></blockquote><p>d</p></blockquote></div>",
+        )
+
+    def test_quote_with_code_and_nested_list(self):
+        markdown = "> ```\n> x\n>\n> y\n> ```\n>\n> - a\n>   - b"
+        self.assertEqual(
+            self.render(markdown),
+            "<div><blockquote><pre><code>x\n\ny</code></pre>"
+            "<ul><li>a<ul><li>b</li></ul></li></ul></blockquote></div>",
+        )
+
+    def test_nested_lists(self):
+        markdown = "- a\n  - b\n    1. c\n    2. d\n  - e\n- f"
+        self.assertEqual(
+            self.render(markdown),
+            "<div><ul><li>a<ul><li>b<ol><li>c</li><li>d</li></ol></li>"
+            "<li>e</li></ul></li><li>f</li></ul></div>",
+        )
+
+    def test_mixed_kinds_at_one_depth(self):
+        self.assertEqual(
+            self.render("1. a\n   - b\n   1. c\n2. d"),
+            "<div><ol><li>a<ul><li>b</li></ul><ol><li>c</li></ol></li><li>d</li></ol></div>",
+        )
+
+    def test_multi_digit_ordered_list(self):
+        markdown = "\n".join(f"{i}. item {i}" for i in range(1, 13))
+        self.assertEqual(block_to_block_type(markdown), block_type_ordered_list)
+        html = self.render(markdown)
+        self.assertIn("<li>item 9</li><li>item 10</li>", html)
+        self.assertIn("<li>item 12</li></ol>", html)
+
+    def test_nested_items_of_other_kind_keep_the_list(self):
+        self.assertEqual(block_to_block_type("- a\n  1. b\n- c"), block_type_unordered_list)
+        self.assertEqual(block_to_block_type("1. a\n   - b\n2. c"), block_type_ordered_list)
+        self.assertEqual(block_to_block_type("- a\n  not an item"), block_type_paragraph)
+
+    def test_deep_nesting_does_not_recurse(self):
+        depth = 3000
+        quote = "\n".join(">" * i + " x" for i in range(1, depth + 1))
+        html = self.render(quote)
+        self.assertEqual(html.count("<blockquote>"), depth)
+        nested = "\n".join("  " * i + "- x" for i in range(depth))
+        html = self.render(nested)
+        self.assertEqual(html.count("<ul>"), depth)
+
+
+class TestMarkdownLinesToHtmlNode(unittest.TestCase):
+
+    def test_matches_markdown_to_html_node(self):
+        markdown = "# Title\n\nSome **bold** text\n\n```\na\n\nb\n```\n\n> quote\n"
+        lines = markdown.splitlines(keepends=True)
+        self.assertEqual(
+            markdown_lines_to_html_node(lines, "div").to_html(),
+            markdown_to_html_node(markdown, "div").to_html(),
+        )
+
+
+class TestBlockDiagnostics(unittest.TestCase):
+
+    def tearDown(self):
+        set_block_cache(None)
+        set_block_diagnostics(None)
+
+    def test_strict_by_default(self):
+        with self.assertRaises(ValueError):
+            markdown_to_html_node("Broken *text", "div")
+
+    def test_unpaired_delimiters_render_literally(self):
+        diagnostics = []
+        set_block_diagnostics(diagnostics)
+        markdown = "# Title\n\nFine **bold**\nthen *open\n\n> quote\n> with `tick"
+        html = markdown_to_html_node(markdown, "div").to_html()
+        self.assertEqual(
+            html,
+            "<div><h1>Title</h1><p>Fine <b>bold</b> then *open</p>"
+            "<blockquote><p>quote with `tick</p></blockquote></div>",
+        )
+        self.assertEqual(
+            [(line, column, message) for _, line, column, message in diagnostics],
+            [(2, 6, "Unclosed '*'"), (2, 8, "Unclosed '`'")],
+        )
+
+    def test_recovered_blocks_are_not_cached(self):
+        cache = BlockCache()
+        set_block_cache(cache)
+        diagnostics = []
+        set_block_diagnostics(diagnostics)
+        for _ in range(2):
+            markdown_to_html_node("Fine\n\nBroken *text", "div")
+        self.assertEqual(list(cache.entries.values()), [("<p>Fine</p>", (), 0)])
+        self.assertEqual(len(diagnostics), 2)
+
+
+class TestMinifiedBlocks(unittest.TestCase):
+
+    def setUp(self):
+        self.stats = MinifyStats()
+        set_minify_stats(self.stats)
+
+    def tearDown(self):
+        set_block_cache(None)
+        set_minify_stats(None)
+
+    def test_text_collapses_but_code_is_kept(self):
+        markdown = "Some  text\n   with `a  b` and **x\ty**\n\n- item  one\n\n```\nkeep   this\n  and this\n```"
+        self.assertEqual(
+            markdown_to_html_node(markdown, "div").to_html(),
+            "<div><p>Some text with <code>a  b</code> and <b>x y</b></p>"
+            "<ul><li>item one</li></ul><pre><code>keep   this\n  and this</code></pre></div>",
+        )
+        self.assertEqual(self.stats.saved, 5)
+
+    def test_cache_keeps_saved_bytes(self):
+        cache = BlockCache()
+        set_block_cache(cache)
+        for _ in range(2):
+            markdown_to_html_node("a  b\n\nc", "div")
+        self.assertEqual(self.stats.saved, 2)
+        self.assertEqual(cache.hits, 2)
+
+    def test_minified_and_plain_are_cached_apart(self):
+        cache = BlockCache()
+        set_block_cache(cache)
+        minified = markdown_to_html_node("a  b", "div").to_html()
+        set_minify_stats(None)
+        self.assertEqual(markdown_to_html_node("a  b", "div").to_html(), "<div><p>a  b</p></div>")
+        self.assertEqual(minified, "<div><p>a b</p></div>")
+
+
+class TestBlockCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "blocks.json")
+
+    def tearDown(self):
+        set_block_cache(None)
+        self.tmp.cleanup()
+
+    def test_cached_render_matches_uncached(self):
+        document = "# Title\n\nSome **bold** text\n\n- a\n- b\n\n> quote"
+        expected = markdown_to_html_node(document, "div").to_html()
+        cache = BlockCache(self.path)
+        set_block_cache(cache)
+        self.assertEqual(markdown_to_html_node(document, "div").to_html(), expected)
+        self.assertEqual(markdown_to_html_node(document, "div").to_html(), expected)
+        self.assertEqual(cache.hits, 4)
+
+    def test_only_edited_block_is_parsed(self):
+        cache = BlockCache(self.path)
+        set_block_cache(cache)
+        markdown_to_html_node("First block\n\nSecond block", "div")
+        markdown_to_html_node("First block\n\nSecond block, edited", "div")
+        self.assertEqual((cache.hits, cache.misses), (1, 3))
+
+    def test_cached_blocks_keep_links(self):
+        document = "See [a](/a.html) and ![b](/b.png)\n\n# Plain heading"
+        expected = [("link", "/a.html"), ("image", "/b.png")]
+        links = []
+        markdown_to_html_node(document, "div", links)
+        self.assertEqual(links, expected)
+
+        cache = BlockCache(self.path)
+        set_block_cache(cache)
+        for _ in range(2):
+            links = []
+            markdown_to_html_node(document, "div", links)
+            self.assertEqual(links, expected)
+        cache.save()
+        links = []
+        set_block_cache(BlockCache.load(self.path))
+        markdown_to_html_node(document, "div", links)
+        self.assertEqual(links, expected)
+
+    def test_lru_eviction(self):
+        cache = BlockCache(self.path, max_bytes=10)
+        cache.put("a", "1234")
+        cache.put("b", "1234")
+        cache.get("a")
+        cache.put("c", "1234")
+        self.assertEqual(list(cache.entries), ["a", "c"])
+        self.assertEqual(cache.size, 8)
+
+    def test_save_and_load(self):
+        cache = BlockCache(self.path)
+        cache.put("a", "<p>a</p>")
+        cache.put("b", "<p>b</p>")
+        cache.save()
+        loaded = BlockCache.load(self.path)
+        self.assertEqual(loaded.entries, cache.entries)
+
+    def test_save_skipped_when_unchanged(self):
+        cache = BlockCache(self.path)
+        cache.put("a", "<p>a</p>")
+        cache.save()
+        loaded = BlockCache.load(self.path)
+        loaded.get("a")
+        os.remove(self.path)
+        loaded.save()
+        self.assertFalse(os.path.exists(self.path))
+        loaded.put("b", "<p>b</p>")
+        loaded.save()
+        self.assertEqual(len(BlockCache.load(self.path).entries), 2)
+
+    def test_version_mismatch_discards_entries(self):
+        with open(self.path, 'w') as f:
+            json.dump({"version": PARSER_VERSION - 1, "entries": [["a", "<p>a</p>"]]}, f)
+        self.assertEqual(len(BlockCache.load(self.path).entries), 0)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,63 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+
+from profiling import BuildProfile
+
+
+class TestBuildProfile(unittest.TestCase):
+
+    def test_stage_records_page_and_total(self):
+        profile = BuildProfile()
+        with profile.stage("read", "a.md"):
+            pass
+        with profile.stage("static copy"):
+            pass
+        self.assertEqual(set(profile.stages), {"read", "static copy"})
+        self.assertEqual(list(profile.pages), ["a.md"])
+        self.assertEqual(profile.stages["read"][3], 1)
+
+    def test_nested_stages_are_not_counted_twice(self):
+        profile = BuildProfile()
+        profile.page = "a.md"
+        with profile.stage("write"):
+            with profile.stage("inline parse"):
+                time.sleep(0.02)
+        self.assertEqual(list(profile.pages), ["a.md"])
+        self.assertGreaterEqual(profile.stages["inline parse"][0], 0.02)
+        self.assertLess(profile.stages["write"][0], 0.02)
+
+    def test_merge_worker_updates(self):
+        worker = BuildProfile()
+        worker.record("read", "a.md", 0.5)
+        worker.record("write", "a.md", 0.25)
+        worker.record("read", "b.md", 0.1)
+        profile = BuildProfile()
+        profile.merge(worker.take_updates())
+        self.assertEqual(worker.pages, {})
+        self.assertEqual(profile.page_seconds("a.md"), 0.75)
+        self.assertEqual(profile.stages["read"][0], 0.6)
+
+    def test_slowest_pages(self):
+        profile = BuildProfile()
+        for page, seconds in (("a.md", 0.1), ("b.md", 0.3), ("c.md", 0.2)):
+            profile.record("read", page, seconds)
+        self.assertEqual(profile.slowest_pages(2), ["b.md", "c.md"])
+
+    def test_report_is_json_in_stage_order(self):
+        profile = BuildProfile()
+        profile.record("write", "a.md", 0.2)
+        profile.record("read", "a.md", 0.1)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "timings.json")
+            profile.save(path)
+            with open(path) as f:
+                report = json.load(f)
+        self.assertEqual(list(report["stages"]), ["read", "write"])
+        self.assertAlmostEqual(report["pages"]["a.md"]["seconds"], 0.3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,169 @@
+import os
+import tempfile
+import unittest
+
+from fixtures import write_file
+from sections import SiteIndex, listing_url
+
+
+TEMPLATE = "{{ Title }}|{{ Path }}|{{ Content }}"
+
+
+class TestSiteIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = self.tmp.name
+        self.content = os.path.join(root, "content")
+        self.public = os.path.join(root, "public")
+        self.template = os.path.join(root, "template.html")
+        self.path = os.path.join(root, ".cache", "site.json")
+        write_file(self.template, TEMPLATE)
+        write_file(os.path.join(self.content, "index.md"), "# Home")
+        for day in range(1, 6):
+            self.write_post(day)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write_post(self, day, mtime=None):
+        write_file(
+            os.path.join(self.content, "blog", f"post{day}.md"),
+            f"---\ntitle: Post {day}\ndate: 2024-01-{day:02}\n---\n# Post {day}",
+            mtime,
+        )
+
+    def build(self, index=None):
+        index = index or SiteIndex.load(self.path, per_page=2)
+        index.refresh(self.content, self.public, self.template)
+        written = index.write_listings(self.template, self.public, "https://example.com")
+        index.save()
+        return index, sorted(os.path.relpath(path, self.public) for path in written)
+
+    def read(self, *parts):
+        with open(os.path.join(self.public, *parts)) as f:
+            return f.read()
+
+    def test_listings_are_paginated_newest_first(self):
+        _, written = self.build()
+        self.assertEqual(written, [
+            "blog/index.html",
+            "blog/page/1/index.html",
+            "blog/page/2/index.html",
+        ])
+        newest = self.read("blog", "index.html")
+        self.assertTrue(newest.startswith("blog|/blog/|"))
+        self.assertIn("Post 5", newest)
+        self.assertNotIn("Post 4", newest)
+        self.assertIn('<a href="/blog/page/2/" rel="next">Older</a>', newest)
+        middle = self.read("blog", "page", "2", "index.html")
+        self.assertTrue(middle.startswith("blog (page 2)|/blog/page/2/|"))
+        self.assertLess(middle.index("Post 4"), middle.index("Post 3"))
+        self.assertIn('<a href="/blog/" rel="prev">Newer</a>', middle)
+        oldest = self.read("blog", "page", "1", "index.html")
+        self.assertIn("Post 1", oldest)
+        self.assertIn('rel="prev"', oldest)
+        self.assertNotIn('rel="next"', oldest)
+
+    def test_hand_written_index_is_not_replaced(self):
+        self.build()
+        self.assertFalse(os.path.exists(os.path.join(self.public, "index.html")))
+
+    def test_sitemap(self):
+        self.build()
+        sitemap = self.read("sitemap.xml")
+        self.assertIn("<url><loc>https://example.com/blog/post3.html</loc><lastmod>2024-01-03</lastmod></url>", sitemap)
+        self.assertIn("<loc>https://example.com/blog/page/2/</loc>", sitemap)
+        self.assertNotIn("<loc>https://example.com/blog/page/3/</loc>", sitemap)
+        self.assertIn("<loc>https://example.com/</loc>", sitemap)
+
+    def test_unchanged_build_writes_nothing(self):
+        self.build()
+        _, written = self.build()
+        self.assertEqual(written, [])
+
+    def test_adding_newest_page_only_rewrites_the_newest(self):
+        for day in range(6, 28):
+            self.write_post(day)
+        self.build()
+        self.write_post(28)
+        _, written = self.build()
+        self.assertEqual(written, ["blog/index.html"])
+        self.assertIn("Post 28", self.read("blog", "index.html"))
+
+    def test_new_page_creates_a_listing_page(self):
+        for day in range(6, 28):
+            self.write_post(day)
+        self.build()
+        self.write_post(28)
+        self.write_post(29)
+        _, written = self.build()
+        # The newest page moves to page/14/, and page/13/ links to it.
+        self.assertEqual(written, [
+            "blog/index.html",
+            "blog/page/13/index.html",
+            "blog/page/14/index.html",
+        ])
+        self.assertIn('<a href="/blog/page/14/" rel="prev">Newer</a>', self.read("blog", "page", "13", "index.html"))
+        self.assertIn("Post 29", self.read("blog", "index.html"))
+
+    def test_adding_oldest_page_shifts_every_page(self):
+        self.build()
+        write_file(
+            os.path.join(self.content, "blog", "post0.md"),
+            "---\ntitle: Post 0\ndate: 2023-12-31\n---\n# Post 0",
+        )
+        _, written = self.build()
+        self.assertEqual(len(written), 3)
+        self.assertIn("Post 0", self.read("blog", "page", "1", "index.html"))
+
+    def test_removed_pages_drop_older_listing_pages(self):
+        self.build()
+        os.remove(os.path.join(self.content, "blog", "post1.md"))
+        os.remove(os.path.join(self.content, "blog", "post2.md"))
+        _, written = self.build()
+        self.assertEqual(written, ["blog/index.html", "blog/page/1/index.html"])
+        self.assertFalse(os.path.exists(os.path.join(self.public, "blog", "page", "2")))
+        self.assertNotIn('rel="next"', self.read("blog", "page", "1", "index.html"))
+        self.assertIn("Post 5", self.read("blog", "index.html"))
+
+    def test_removed_section_is_cleaned_up(self):
+        self.build()
+        for day in range(1, 6):
+            os.remove(os.path.join(self.content, "blog", f"post{day}.md"))
+        index, _ = self.build()
+        self.assertNotIn("blog", index.sections)
+        self.assertFalse(os.path.exists(os.path.join(self.public, "blog")))
+
+    def test_subsections_are_listed(self):
+        write_file(os.path.join(self.content, "blog", "2024", "notes.md"), "# Notes")
+        self.build()
+        first = self.read("blog", "index.html")
+        self.assertIn('<ul class="sections"><li><a href="/blog/2024/">2024</a></li></ul>', first)
+        self.assertIn("Notes", self.read("blog", "2024", "index.html"))
+
+    def test_refresh_only_given_keys(self):
+        index, _ = self.build()
+        self.write_post(6)
+        os.remove(os.path.join(self.content, "blog", "post1.md"))
+        index.refresh(self.content, self.public, self.template, ["blog/post1.md"])
+        self.assertNotIn("blog/post1.md", index.pages)
+        self.assertNotIn("blog/post6.md", index.pages)
+        index.refresh(self.content, self.public, self.template, ["blog/post6.md"])
+        self.assertEqual(index.pages["blog/post6.md"]["title"], "Post 6")
+
+    def test_template_change_rewrites_listings(self):
+        self.build()
+        write_file(self.template, "<b>{{ Title }}</b>")
+        _, written = self.build()
+        self.assertEqual(len(written), 3)
+        self.assertEqual(self.read("blog", "index.html"), "<b>blog</b>")
+
+    def test_listing_url(self):
+        self.assertEqual(listing_url("", 0, 1), "/")
+        self.assertEqual(listing_url("blog", 2, 4), "/blog/page/3/")
+        self.assertEqual(listing_url("blog", 3, 4), "/blog/")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,254 @@
+import functools
+import gzip
+import http.client
+import json
+import os
+import sys
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+from server import CORSHTTPRequestHandler, FileCache, ThreadingHTTPServer, parse_accept_encoding, parse_range  # noqa: E402
+
+
+class TestParseRange(unittest.TestCase):
+
+    def test_single_range(self):
+        self.assertEqual(parse_range("bytes=0-3", 10), (0, 3))
+        self.assertEqual(parse_range("bytes=4-", 10), (4, 9))
+        self.assertEqual(parse_range("bytes=5-100", 10), (5, 9))
+
+    def test_suffix_range(self):
+        self.assertEqual(parse_range("bytes=-3", 10), (7, 9))
+        self.assertEqual(parse_range("bytes=-30", 10), (0, 9))
+        self.assertEqual(parse_range("bytes=-0", 10), "unsatisfiable")
+        self.assertEqual(parse_range("bytes=-3", 0), "unsatisfiable")
+
+    def test_multiple_ranges_are_ignored(self):
+        self.assertIsNone(parse_range("bytes=0-1,4-5", 10))
+
+    def test_invalid_ranges_are_ignored(self):
+        for header in ("items=0-3", "bytes=3", "bytes=a-b", "bytes=5-2"):
+            with self.subTest(header=header):
+                self.assertIsNone(parse_range(header, 10))
+
+    def test_start_past_end_is_unsatisfiable(self):
+        self.assertEqual(parse_range("bytes=10-", 10), "unsatisfiable")
+        self.assertEqual(parse_range("bytes=0-", 0), "unsatisfiable")
+
+
+class TestParseAcceptEncoding(unittest.TestCase):
+
+    def test_q_zero_rejects(self):
+        self.assertEqual(parse_accept_encoding("gzip;q=0, br"), {"br"})
+        self.assertEqual(parse_accept_encoding("gzip; q=0.0"), set())
+
+    def test_wildcard_excludes_rejected(self):
+        self.assertEqual(parse_accept_encoding("*, br;q=0"), {"zstd", "gzip"})
+
+
+class QuietHandler(CORSHTTPRequestHandler):
+
+    def log_message(self, format, *args):
+        pass
+
+
+class CachedHandler(QuietHandler):
+    file_cache = None
+
+
+class TestServer(unittest.TestCase):
+    handler_class = QuietHandler
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.root = cls.tmp.name
+        handler = functools.partial(cls.handler_class, directory=cls.root)
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        cls.thread = threading.Thread(target=cls.server.serve_forever)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        cls.thread.join()
+        cls.tmp.cleanup()
+
+    def setUp(self):
+        for name in os.listdir(self.root):
+            os.remove(os.path.join(self.root, name))
+        self.body = b"0123456789" * 10
+        self.write("index.html", self.body)
+
+    def write(self, rel_path, data, mtime=None):
+        path = os.path.join(self.root, rel_path)
+        with open(path, 'wb') as f:
+            f.write(data)
+        if mtime is not None:
+            os.utime(path, (mtime, mtime))
+        return path
+
+    def get(self, path="/index.html", **headers):
+        connection = http.client.HTTPConnection(*self.server.server_address)
+        try:
+            connection.request("GET", path, headers={name.replace("_", "-"): value for name, value in headers.items()})
+            response = connection.getresponse()
+            return response, response.read()
+        finally:
+            connection.close()
+
+    def test_full_response(self):
+        response, body = self.get()
+        self.assertEqual(response.status, 200)
+        self.assertEqual(body, self.body)
+        self.assertEqual(response.getheader("Accept-Ranges"), "bytes")
+
+    def test_range(self):
+        response, body = self.get(Range="bytes=10-19")
+        self.assertEqual(response.status, 206)
+        self.assertEqual(body, self.body[10:20])
+        self.assertEqual(response.getheader("Content-Range"), "bytes 10-19/100")
+
+    def test_suffix_range(self):
+        response, body = self.get(Range="bytes=-5")
+        self.assertEqual(response.status, 206)
+        self.assertEqual(body, self.body[-5:])
+
+    def test_multiple_ranges_get_full_file(self):
+        response, body = self.get(Range="bytes=0-1,5-6")
+        self.assertEqual(response.status, 200)
+        self.assertEqual(body, self.body)
+
+    def test_unsatisfiable_range(self):
+        response, body = self.get(Range="bytes=200-")
+        self.assertEqual(response.status, 416)
+        self.assertEqual(response.getheader("Content-Range"), "bytes */100")
+        self.assertEqual(body, b"")
+
+    def test_if_range(self):
+        etag = self.get()[0].getheader("ETag")
+        response, body = self.get(Range="bytes=0-4", If_Range=etag)
+        self.assertEqual(response.status, 206)
+        self.assertEqual(body, self.body[:5])
+
+        # The file changed since the client's copy: it gets the whole file.
+        response, body = self.get(Range="bytes=0-4", If_Range='"stale"')
+        self.assertEqual(response.status, 200)
+        self.assertEqual(body, self.body)
+
+    def test_if_range_last_modified(self):
+        last_modified = self.get()[0].getheader("Last-Modified")
+        response, _ = self.get(Range="bytes=0-4", If_Range=last_modified)
+        self.assertEqual(response.status, 206)
+
+    def test_not_modified_etag(self):
+        etag = self.get()[0].getheader("ETag")
+        response, body = self.get(If_None_Match=etag)
+        self.assertEqual(response.status, 304)
+        self.assertEqual(response.getheader("ETag"), etag)
+        self.assertEqual(body, b"")
+
+        response, _ = self.get(If_None_Match='"other"')
+        self.assertEqual(response.status, 200)
+
+    def test_not_modified_since(self):
+        self.write("index.html", self.body, mtime=100_000_000)
+        last_modified = self.get()[0].getheader("Last-Modified")
+        response, _ = self.get(If_Modified_Since=last_modified)
+        self.assertEqual(response.status, 304)
+
+        response, _ = self.get(If_Modified_Since="Sat, 01 Jan 1972 00:00:00 GMT")
+        self.assertEqual(response.status, 200)
+
+    def test_precompressed_sibling(self):
+        self.write("index.html", self.body, mtime=1_000_000)
+        self.write("index.html.gz", gzip.compress(self.body), mtime=1_000_000)
+        response, body = self.get(Accept_Encoding="gzip")
+        self.assertEqual(response.getheader("Content-Encoding"), "gzip")
+        self.assertEqual(response.getheader("Vary"), "Accept-Encoding")
+        self.assertEqual(gzip.decompress(body), self.body)
+
+    def test_q_zero_encoding_is_not_served(self):
+        self.write("index.html", self.body, mtime=1_000_000)
+        self.write("index.html.gz", gzip.compress(self.body), mtime=1_000_000)
+        response, body = self.get(Accept_Encoding="gzip;q=0, identity")
+        self.assertIsNone(response.getheader("Content-Encoding"))
+        self.assertEqual(body, self.body)
+
+    def test_stale_sibling_is_ignored(self):
+        self.write("index.html", self.body, mtime=2_000_000)
+        self.write("index.html.gz", gzip.compress(b"old"), mtime=1_000_000)
+        response, body = self.get(Accept_Encoding="gzip")
+        self.assertIsNone(response.getheader("Content-Encoding"))
+        self.assertEqual(body, self.body)
+
+    def test_newer_sibling_of_another_source_is_ignored(self):
+        # The source was replaced by an older copy after compressing.
+        self.write("index.html", self.body, mtime=1_000_000)
+        self.write("index.html.gz", gzip.compress(b"old"), mtime=2_000_000)
+        response, body = self.get(Accept_Encoding="gzip")
+        self.assertIsNone(response.getheader("Content-Encoding"))
+        self.assertEqual(body, self.body)
+
+
+class TestCachedServer(TestServer):
+    # Runs every TestServer test again with the file cache on.
+    handler_class = CachedHandler
+
+    def setUp(self):
+        CachedHandler.file_cache = FileCache(max_bytes=64 * 1024, max_file_size=1024)
+        super().setUp()
+
+    def stats(self):
+        response, body = self.get("/__stats")
+        self.assertEqual(response.getheader("Content-Type"), "application/json")
+        return json.loads(body)
+
+    def test_unchanged_file_is_served_from_cache(self):
+        self.write("index.html", self.body, mtime=1_000_000)
+        self.get()
+        # Same size and mtime: the cached copy is still served.
+        self.write("index.html", self.body.replace(b"0", b"X"), mtime=1_000_000)
+        self.assertEqual(self.get()[1], self.body)
+
+    def test_changed_mtime_is_read_again(self):
+        self.write("index.html", self.body, mtime=1_000_000)
+        self.get()
+        changed = self.body.replace(b"0", b"X")
+        self.write("index.html", changed, mtime=2_000_000)
+        self.assertEqual(self.get()[1], changed)
+
+    def test_changed_size_is_read_again(self):
+        self.write("index.html", self.body, mtime=1_000_000)
+        self.get()
+        changed = self.body + b"!"
+        self.write("index.html", changed, mtime=1_000_000)
+        self.assertEqual(self.get()[1], changed)
+
+    def test_stats_count_hits_and_misses(self):
+        self.get()
+        self.get()
+        self.get()
+        stats = self.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (2, 1))
+        self.assertEqual((stats["entries"], stats["bytes"]), (1, 100))
+        self.assertAlmostEqual(stats["hit_rate"], 2 / 3)
+
+    def test_large_file_is_sent_with_sendfile(self):
+        data = bytes(range(256)) * 16
+        self.write("large.js", data)
+        response, body = self.get("/large.js")
+        self.assertEqual(body, data)
+        response, body = self.get("/large.js", Range="bytes=1000-1999")
+        self.assertEqual(response.status, 206)
+        self.assertEqual(body, data[1000:2000])
+        stats = self.stats()
+        self.assertEqual(stats["sendfile_responses"], 2)
+        self.assertEqual((stats["entries"], stats["hits"], stats["misses"]), (0, 0, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
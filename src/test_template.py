@@ -0,0 +1,107 @@
+import os
+import tempfile
+import unittest
+
+from assets import AssetMap, set_asset_map
+from htmlnode import LeafNode, ParentNode
+from template import compile_template, hash_template, load_template
+
+
+class TestCompileTemplate(unittest.TestCase):
+
+    def test_segments(self):
+        template = compile_template("<h1>{{ Title }}</h1>{{Content}}!")
+        self.assertEqual(template.literals, ["<h1>", "</h1>", "!"])
+        self.assertEqual(template.names, ["Title", "Content"])
+
+    def test_render_strings(self):
+        template = compile_template("<title> {{ Title }} </title><p>{{ Date }}</p>")
+        html = template.render({"Title": "Home", "Date": "2024-01-01"})
+        self.assertEqual(html, "<title> Home </title><p>2024-01-01</p>")
+
+    def test_render_html_node(self):
+        template = compile_template("<article>{{ Content }}</article>")
+        content = ParentNode("div", [LeafNode("b", "bold")])
+        self.assertEqual(template.render({"Content": content}), "<article><div><b>bold</b></div></article>")
+
+    def test_repeated_placeholder(self):
+        template = compile_template("{{ Title }}|{{ Title }}")
+        self.assertEqual(template.render({"Title": "x"}), "x|x")
+
+    def test_repeated_streamed_node(self):
+        # A generator of children can be walked only once.
+        template = compile_template("<main>{{ Content }}</main><aside>{{Content}}</aside>")
+        content = ParentNode("div", (LeafNode("b", text) for text in ("a", "b")))
+        self.assertEqual(
+            template.render({"Content": content}),
+            "<main><div><b>a</b><b>b</b></div></main><aside><div><b>a</b><b>b</b></div></aside>",
+        )
+
+    def test_unknown_placeholder_is_kept(self):
+        template = compile_template("<p>{{ Author }}</p>{{ Title }}")
+        self.assertEqual(template.render({"Title": "x"}), "<p>{{ Author }}</p>x")
+
+    def test_no_placeholders(self):
+        self.assertEqual(compile_template("plain").render({}), "plain")
+
+    def test_strings_are_escaped(self):
+        template = compile_template('<title>{{ Title }}</title><a href="{{ Path }}">')
+        html = template.render({"Title": "Fish & <Chips>", "Path": '/a"b'})
+        self.assertEqual(html, '<title>Fish &amp; &lt;Chips&gt;</title><a href="/a&quot;b">')
+
+    def test_minified(self):
+        template = compile_template("<html>\n  <title> {{ Title }} </title>\n  <pre>{{ Content }}\n</pre>\n</html>\n", True)
+        self.assertEqual(template.literals, ["<html><title> ", " </title><pre>", "\n</pre></html>"])
+        self.assertEqual(template.saved, 8)
+
+    def test_minified_placeholders_on_their_own_line(self):
+        template = compile_template("<article>\n  {{ Content }}\n</article>\n<p>\n  {{ Name }} wrote\n</p>\n", True)
+        self.assertEqual(template.literals, ["<article>", "</article><p>", " wrote </p>"])
+
+    def test_asset_urls_are_rewritten(self):
+        set_asset_map(AssetMap({"/index.css": "/index.3f2a9c1b2d.css"}))
+        try:
+            template = compile_template('<link href="/index.css"><a href="/other.css">{{ Content }}</a>')
+        finally:
+            set_asset_map(None)
+        self.assertEqual(template.literals, ['<link href="/index.3f2a9c1b2d.css"><a href="/other.css">', "</a>"])
+
+
+class TestLoadTemplate(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "template.html")
+        with open(self.path, 'w') as f:
+            f.write("<h1>{{ Title }}</h1>")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_cached_until_mtime_changes(self):
+        first = load_template(self.path)
+        self.assertIs(load_template(self.path), first)
+
+        with open(self.path, 'w') as f:
+            f.write("<h2>{{ Title }}</h2>")
+        stat = os.stat(self.path)
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+        second = load_template(self.path)
+        self.assertIsNot(second, first)
+        self.assertEqual(second.render({"Title": "x"}), "<h2>x</h2>")
+
+    def test_hash_changes_with_fingerprints(self):
+        plain = hash_template(self.path)
+        try:
+            set_asset_map(AssetMap({"/index.css": "/index.3f2a9c1b2d.css"}))
+            first = hash_template(self.path)
+            set_asset_map(AssetMap({"/index.css": "/index.0000000000.css"}))
+            second = hash_template(self.path)
+        finally:
+            set_asset_map(None)
+        self.assertEqual(len({plain, first, second}), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
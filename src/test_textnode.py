@@ -77,6 +77,15 @@ class TestTextNodeToHtmlNode(unittest.TestCase):
         html_node = text_node_to_html_node(text_node)
         self.assertEqual(html_node, LeafNode("img", "", {"src": "http://example.com/image.png", "alt": "Image alt"}))
 
+    def test_text_is_escaped_once(self):
+        html_node = text_node_to_html_node(TextNode("a < b & c", text_type_code))
+        self.assertEqual(html_node.value, "a &lt; b &amp; c")
+        self.assertEqual(html_node.to_html(), "<code>a &lt; b &amp; c</code>")
+
+    def test_attributes_are_escaped_once(self):
+        html_node = text_node_to_html_node(TextNode("a \"b\"", text_type_image, url="/q?a=1&b=2"))
+        self.assertEqual(html_node.to_html(), '<img src="/q?a=1&amp;b=2" alt="a &quot;b&quot;" />')
+
     def test_invalid_text_type(self):
         text_node = TextNode("Invalid", "invalid_type")
         with self.assertRaises(ValueError):
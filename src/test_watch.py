@@ -0,0 +1,161 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+from copystatic import sync_files
+from fixtures import write_file
+from gencontent import generate_pages_incremental
+from links import LinkIndex
+from manifest import Manifest
+from sections import SiteIndex
+from watch import Watcher, diff_files
+
+
+class TestDiffFiles(unittest.TestCase):
+
+    def test_diff_files(self):
+        old = {"a.md": (1, 1), "b.md": (1, 1), "c.md": (1, 1)}
+        new = {"a.md": (1, 1), "b.md": (2, 2), "d.md": (1, 1)}
+        self.assertEqual(diff_files(old, new), (["b.md", "d.md"], ["c.md"]))
+
+
+class TestWatcher(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = self.tmp.name
+        self.content = os.path.join(root, "content")
+        self.static = os.path.join(root, "static")
+        self.public = os.path.join(root, "public")
+        self.template = os.path.join(root, "template.html")
+        self.manifest = Manifest(os.path.join(root, ".cache", "manifest.json"))
+        self.link_index = LinkIndex(os.path.join(root, ".cache", "links.json"))
+        write_file(self.template, "{{ Title }}:{{ Content }}")
+        write_file(os.path.join(self.content, "index.md"), "# Home")
+        write_file(os.path.join(self.content, "blog", "post.md"), "# Post\n\n![logo](/logo.png)")
+        write_file(os.path.join(self.static, "index.css"), "body {}")
+        write_file(os.path.join(self.static, "logo.png"), "png")
+        with contextlib.redirect_stdout(io.StringIO()):
+            sync_files(self.static, self.public, self.manifest, workers=1)
+            generate_pages_incremental(
+                self.content, self.template, self.public, self.manifest, link_index=self.link_index
+            )
+        self.watcher = Watcher(
+            self.content,
+            self.static,
+            self.template,
+            self.public,
+            self.manifest,
+            debounce=0,
+            copy_workers=1,
+            link_index=self.link_index,
+        )
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def poll(self):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            changed = self.watcher.poll()
+        return changed, output.getvalue()
+
+    def read(self, *parts):
+        with open(os.path.join(self.public, *parts)) as f:
+            return f.read()
+
+    def test_no_changes(self):
+        self.assertEqual(self.poll(), (False, ""))
+
+    def test_single_page_change(self):
+        write_file(os.path.join(self.content, "blog", "post.md"), "# Edited", mtime=10**18)
+        changed, output = self.poll()
+        self.assertTrue(changed)
+        self.assertIn("Rebuilt 1 page(s)", output)
+        self.assertEqual(self.read("blog", "post.html"), "Edited:<div><h1>Edited</h1></div>")
+        self.assertEqual(self.link_index.pages["blog/post.md"]["images"], [])
+
+    def test_template_change_rerenders_all(self):
+        write_file(self.template, "<b>{{ Title }}</b>", mtime=10**18)
+        _, output = self.poll()
+        self.assertIn("Rebuilt 2 page(s)", output)
+        self.assertEqual(self.read("index.html"), "<b>Home</b>")
+
+    def test_removed_page(self):
+        os.remove(os.path.join(self.content, "blog", "post.md"))
+        self.poll()
+        self.assertFalse(os.path.exists(os.path.join(self.public, "blog", "post.html")))
+
+    def test_static_change_is_synced(self):
+        write_file(os.path.join(self.static, "site.js"), "1")
+        _, output = self.poll()
+        self.assertIn("Rebuilt 0 page(s)", output)
+        self.assertEqual(self.read("site.js"), "1")
+
+    def test_asset_change_rerenders_referrers(self):
+        write_file(os.path.join(self.static, "logo.png"), "new png", mtime=10**18)
+        _, output = self.poll()
+        self.assertIn("Rebuilt 1 page(s)", output)
+        self.assertIn("post.md", output)
+
+    def test_removed_asset_is_reported(self):
+        os.remove(os.path.join(self.static, "logo.png"))
+        _, output = self.poll()
+        self.assertIn("Rebuilt 1 page(s)", output)
+        self.assertIn("blog/post.md: broken link /logo.png", output)
+
+    def test_new_page_rerenders_referrers(self):
+        write_file(os.path.join(self.content, "index.md"), "# Home\n\n[about](/about.html)", mtime=10**18)
+        self.poll()
+        self.assertEqual(self.link_index.referrers("/about.html"), ["index.md"])
+        write_file(os.path.join(self.content, "about.md"), "# About")
+        _, output = self.poll()
+        self.assertIn("Rebuilt 2 page(s)", output)
+        self.assertNotIn("broken link", output)
+
+    def test_removed_linked_page_is_reported(self):
+        write_file(os.path.join(self.content, "about", "index.md"), "# About")
+        write_file(os.path.join(self.content, "index.md"), "# Home\n\n[about](/about)", mtime=10**18)
+        self.poll()
+        os.remove(os.path.join(self.content, "about", "index.md"))
+        _, output = self.poll()
+        self.assertIn("Rebuilt 1 page(s)", output)
+        self.assertIn("index.md: broken link /about", output)
+
+    def test_new_page_updates_listing(self):
+        site_index = SiteIndex(os.path.join(self.tmp.name, ".cache", "site.json"))
+        site_index.refresh(self.content, self.public, self.template)
+        site_index.write_listings(self.template, self.public)
+        self.watcher.site_index = site_index
+        write_file(os.path.join(self.content, "blog", "other.md"), "# Other")
+        _, output = self.poll()
+        self.assertIn("Rewrote 1 listing page(s)", output)
+        listing = self.read("blog", "index.html")
+        self.assertIn("Other", listing)
+        self.assertIn("Post", listing)
+        self.assertIn("/blog/other.html", self.read("sitemap.xml"))
+
+    def test_indexes_are_saved_once_quiet(self):
+        self.watcher.save_interval = 3600
+        write_file(os.path.join(self.content, "blog", "post.md"), "# Edited", mtime=10**18)
+        self.poll()
+        self.assertFalse(os.path.exists(self.manifest.path))
+        self.poll()
+        self.assertFalse(os.path.exists(self.manifest.path))
+        self.watcher.save_interval = 0
+        self.poll()
+        self.assertTrue(os.path.exists(self.manifest.path))
+        self.assertTrue(os.path.exists(self.link_index.path))
+        self.assertFalse(self.watcher.unsaved)
+
+    def test_failed_page_keeps_watching(self):
+        write_file(os.path.join(self.content, "index.md"), "no title", mtime=10**18)
+        _, output = self.poll()
+        self.assertIn("Rebuild failed", output)
+        self.assertNotIn("index.md", self.manifest.pages)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,4 +1,7 @@
-from htmlnode import LeafNode
+import html
+
+from assets import rewrite_url
+from htmlnode import EscapedNode, LeafNode, escape_attribute
 
 
 text_type_text = "text"
@@ -10,7 +13,8 @@ text_type_image = "image"
 
 
 class TextNode():
-    
+    __slots__ = ("text", "text_type", "url")
+
     def __init__(self, text, text_type, url=None) -> None:
         self.text = text
         self.text_type = text_type
@@ -31,16 +35,25 @@ class TextNode():
 
 
 def text_node_to_html_node(text_node) -> LeafNode:
-    if text_node.text_type == text_type_text:
-        return LeafNode(None, text_node.text)
-    if text_node.text_type == text_type_bold:
-        return LeafNode("b", text_node.text)
-    if text_node.text_type == text_type_italic:
-        return LeafNode("i", text_node.text)
-    if text_node.text_type == text_type_code:
-        return LeafNode("code", text_node.text)
-    if text_node.text_type == text_type_link:
-        return LeafNode("a", text_node.text, {"href": text_node.url})
-    if text_node.text_type == text_type_image:
-        return LeafNode("img", "", {"src": text_node.url, "alt": text_node.text})
-    raise ValueError(f"Invalid text type: {text_node.text_type}")
+    # Text and attributes are escaped here, once per node, rather than
+    # every time it is written. The check is escape_text's, inline: this
+    # runs for every run of text, and a call costs more than the check.
+    text = text_node.text
+    text_type = text_node.text_type
+    if text_type == text_type_image:
+        return EscapedNode(
+            "img", "", {"src": escape_attribute(rewrite_url(text_node.url)), "alt": escape_attribute(text)}
+        )
+    if "&" in text or "<" in text or ">" in text:
+        text = html.escape(text, quote=False)
+    if text_type == text_type_text:
+        return EscapedNode(None, text)
+    if text_type == text_type_bold:
+        return EscapedNode("b", text)
+    if text_type == text_type_italic:
+        return EscapedNode("i", text)
+    if text_type == text_type_code:
+        return EscapedNode("code", text)
+    if text_type == text_type_link:
+        return EscapedNode("a", text, {"href": escape_attribute(rewrite_url(text_node.url))})
+    raise ValueError(f"Invalid text type: {text_type}")
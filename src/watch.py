@@ -0,0 +1,261 @@
+import os
+import time
+
+from assets import get_asset_map, set_asset_map
+from copystatic import scan_tree, sync_files
+from gencontent import (
+    PageErrors,
+    generate_pages_incremental,
+    page_dest_path,
+    page_url,
+    update_pages,
+)
+
+
+class Snapshot():
+
+    def __init__(self, content, static, template) -> None:
+        self.content = content
+        self.static = static
+        self.template = template
+
+    def __eq__(self, __value: object) -> bool:
+        if not isinstance(__value, Snapshot):
+            return NotImplemented
+
+        return (
+            self.content == __value.content
+            and self.static == __value.static
+            and self.template == __value.template
+        )
+
+    def __repr__(self) -> str:
+        return f"Snapshot(content: {len(self.content)}, static: {len(self.static)}, {self.template})"
+
+
+def scan_files(dir_path, ext=None) -> dict:
+    if not os.path.isdir(dir_path):
+        return {}
+    _, files = scan_tree(dir_path)
+    return {
+        rel_path: (size, mtime)
+        for rel_path, _, size, mtime in files
+        if ext is None or rel_path.lower().endswith(ext)
+    }
+
+
+def file_state(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_size, stat.st_mtime_ns)
+
+
+def diff_files(old, new) -> tuple:
+    changed = sorted(rel_path for rel_path, state in new.items() if old.get(rel_path) != state)
+    removed = sorted(set(old) - set(new))
+    return changed, removed
+
+
+class Watcher():
+
+    def __init__(
+        self,
+        dir_path_content,
+        dir_path_static,
+        template_path,
+        dest_dir_path,
+        manifest,
+        interval=0.5,
+        debounce=0.2,
+        copy_workers=8,
+        link_index=None,
+        site_index=None,
+        base_url="",
+        lenient=False,
+        assets=None,
+        save_interval=5.0,
+    ) -> None:
+        self.dir_path_content = dir_path_content
+        self.dir_path_static = dir_path_static
+        self.template_path = template_path
+        self.dest_dir_path = dest_dir_path
+        self.manifest = manifest
+        self.interval = interval
+        self.debounce = debounce
+        self.copy_workers = copy_workers
+        self.link_index = link_index
+        self.site_index = site_index
+        self.base_url = base_url
+        self.lenient = lenient
+        self.assets = assets
+        # The indexes are written out once the tree has been quiet for
+        # save_interval seconds, rather than after every rebuild.
+        self.save_interval = save_interval
+        self.unsaved = False
+        self.last_change = time.monotonic()
+        self.snapshot = self.take_snapshot()
+
+    def take_snapshot(self) -> Snapshot:
+        return Snapshot(
+            scan_files(self.dir_path_content, ".md"),
+            scan_files(self.dir_path_static),
+            file_state(self.template_path),
+        )
+
+    def run(self) -> None:
+        print(f"Watching {self.dir_path_content}, {self.dir_path_static} and {self.template_path}...")
+        try:
+            while True:
+                time.sleep(self.interval)
+                self.poll()
+        finally:
+            if self.unsaved:
+                self.save()
+
+    def poll(self) -> bool:
+        current = self.take_snapshot()
+        if current == self.snapshot:
+            if self.unsaved and time.monotonic() - self.last_change >= self.save_interval:
+                self.save()
+            return False
+        # Editors often write a file in several steps: wait until the
+        # tree stops changing before rebuilding.
+        while True:
+            time.sleep(self.debounce)
+            latest = self.take_snapshot()
+            if latest == current:
+                break
+            current = latest
+        previous, self.snapshot = self.snapshot, current
+        self.rebuild(previous, current)
+        self.unsaved = True
+        self.last_change = time.monotonic()
+        return True
+
+    def save(self) -> None:
+        # A stale manifest or link index only makes the next build render
+        # more pages, so losing the last few seconds of it is harmless.
+        self.manifest.save()
+        if self.link_index is not None:
+            self.link_index.save()
+        if self.site_index is not None:
+            self.site_index.save()
+        if self.assets is not None:
+            self.assets.save()
+        self.unsaved = False
+
+    def rebuild(self, previous, current) -> None:
+        start = time.perf_counter()
+        diagnostics = [] if self.lenient else None
+        # Source keys of the pages whose listings and links may have
+        # changed; None after a rebuild of every page.
+        keys = None
+        try:
+            # Every page embeds the template, and links to assets through it.
+            render_all = previous.template != current.template
+            if previous.static != current.static:
+                stats = sync_files(
+                    self.dir_path_static,
+                    self.dest_dir_path,
+                    self.manifest,
+                    workers=self.copy_workers,
+                    assets=self.assets,
+                )
+                print(f"Synced static files: {stats.copied_files} copied, {stats.removed_files} removed")
+                if self.assets is not None:
+                    render_all = render_all or self.publish_assets()
+
+            if render_all:
+                generated = generate_pages_incremental(
+                    self.dir_path_content,
+                    self.template_path,
+                    self.dest_dir_path,
+                    self.manifest,
+                    link_index=self.link_index,
+                    diagnostics=diagnostics,
+                )
+            else:
+                changed, removed = diff_files(previous.content, current.content)
+                dependents = self.dependents(previous, current)
+                keys = sorted(set(changed) | set(removed) | dependents)
+                pages = []
+                for rel_path in sorted(set(changed) | dependents):
+                    from_path = os.path.join(self.dir_path_content, rel_path)
+                    dest_path = page_dest_path(from_path, self.dir_path_content, self.dest_dir_path)
+                    pages.append((from_path, dest_path))
+                generated = update_pages(
+                    pages,
+                    removed,
+                    self.dir_path_content,
+                    self.template_path,
+                    self.dest_dir_path,
+                    self.manifest,
+                    link_index=self.link_index,
+                    forced={from_path for from_path, _ in pages},
+                    diagnostics=diagnostics,
+                )
+
+            listings = []
+            if self.site_index is not None:
+                self.site_index.refresh(
+                    self.dir_path_content,
+                    self.dest_dir_path,
+                    self.template_path,
+                    None if keys is None else [key.replace(os.sep, "/") for key in keys],
+                )
+                listings = self.site_index.write_listings(
+                    self.template_path, self.dest_dir_path, self.base_url
+                )
+        except PageErrors as e:
+            print(f"Rebuild failed: {e}")
+            for from_path, error in e.errors:
+                print(f" ! {from_path}: {error}")
+            return
+        except OSError as e:
+            print(f"Rebuild failed: {e}")
+            return
+
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"Rebuilt {len(generated)} page(s) in {elapsed:.0f} ms")
+        if listings:
+            print(f"Rewrote {len(listings)} listing page(s)")
+        for from_path, line, column, message in diagnostics or ():
+            print(f" ? {from_path}:{line}:{column}: {message}")
+        if self.link_index is not None:
+            if keys is None:
+                urls = {page_url(dest_path, self.dest_dir_path) for dest_path in generated}
+                keys = [key for key, entry in self.link_index.pages.items() if entry["url"] in urls]
+            for key, target in self.link_index.broken_links(self.dest_dir_path, keys):
+                print(f" ! {key}: broken link {target}")
+
+    def publish_assets(self) -> bool:
+        # Returns whether any fingerprint changed.
+        old = get_asset_map()
+        set_asset_map(self.assets.asset_map())
+        self.assets.write_manifest(os.path.join(self.dest_dir_path, "assets.json"))
+        return old is None or old.digest != get_asset_map().digest
+
+    def dependents(self, previous, current) -> set:
+        # Pages linking to a page or asset that appeared, moved or changed
+        # are re-rendered along with the pages that were edited.
+        if self.link_index is None:
+            return set()
+        targets = set()
+        changed, removed = diff_files(previous.static, current.static)
+        targets.update("/" + rel_path.replace(os.sep, "/") for rel_path in changed + removed)
+
+        changed, removed = diff_files(previous.content, current.content)
+        for rel_path in removed:
+            entry = self.link_index.pages.get(rel_path)
+            if entry is not None:
+                targets.add(entry["url"])
+        for rel_path in changed:
+            if rel_path not in previous.content:
+                from_path = os.path.join(self.dir_path_content, rel_path)
+                dest_path = page_dest_path(from_path, self.dir_path_content, self.dest_dir_path)
+                targets.add(page_url(dest_path, self.dest_dir_path))
+        if not targets:
+            return set()
+        return {key for key in self.link_index.referrers(*targets) if key in current.content}
@@ -0,0 +1,5 @@
+python src/main.py --incremental
+python src/main.py --watch &
+watcher=$!
+trap 'kill $watcher' EXIT
+python server.py --dir public